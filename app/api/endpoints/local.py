@@ -2,7 +2,7 @@ import shutil
 from pathlib import Path
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Header
 from starlette.responses import FileResponse, Response
 
 from app import schemas
@@ -10,6 +10,7 @@ from app.chain.transfer import TransferChain
 from app.core.config import settings
 from app.core.metainfo import MetaInfoPath
 from app.core.security import verify_token, verify_uri_token
+from app.helper.imagecache import ImageCacheHelper
 from app.helper.progress import ProgressHelper
 from app.log import logger
 from app.schemas.types import ProgressKey
@@ -256,9 +257,11 @@ def rename_local(fileitem: schemas.FileItem,
 
 
 @router.get("/image", summary="读取图片（本地）")
-def image_local(path: str, _: schemas.TokenPayload = Depends(verify_uri_token)) -> Any:
+def image_local(path: str, width: int = None,
+                if_none_match: str = Header(None), if_modified_since: str = Header(None),
+                _: schemas.TokenPayload = Depends(verify_uri_token)) -> Any:
     """
-    读取图片
+    读取图片，width 缩略图宽度
     """
     if not path:
         return None
@@ -270,4 +273,13 @@ def image_local(path: str, _: schemas.TokenPayload = Depends(verify_uri_token))
     # 判断是否图片文件
     if path_obj.suffix.lower() not in IMAGE_TYPES:
         raise HTTPException(status_code=500, detail="图片读取出错")
-    return Response(content=path_obj.read_bytes(), media_type="image/jpeg")
+    if width:
+        image = ImageCacheHelper().local(path=path_obj, width=width)
+        return image.response(if_none_match=if_none_match, if_modified_since=if_modified_since)
+    stat = path_obj.stat()
+    response = FileResponse(path_obj, media_type="image/jpeg", stat_result=stat)
+    if ImageCacheHelper.not_modified(response.headers.get("etag"), stat.st_mtime,
+                                     if_none_match, if_modified_since):
+        return Response(status_code=304, headers={"ETag": response.headers.get("etag"),
+                                                  "Last-Modified": response.headers.get("last-modified")})
+    return response
@@ -1,6 +1,9 @@
-from typing import List, Any
+import json
+from typing import List, Any, Tuple, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
 from app import schemas
 from app.chain.media import MediaChain
@@ -13,12 +16,13 @@ router = APIRouter()
 
 
 @router.get("/last", summary="查询搜索结果", response_model=List[schemas.Context])
-def search_latest(_: schemas.TokenPayload = Depends(verify_token)) -> Any:
+def search_latest(page: int = 1,
+                  count: int = 0,
+                  userinfo: schemas.TokenPayload = Depends(verify_token)) -> Any:
     """
-    查询搜索结果
+    查询当前用户最近一次的搜索结果，count为0时返回全部
     """
-    torrents = SearchChain().last_search_results()
-    return [torrent.to_dict() for torrent in torrents]
+    return SearchChain().last_search_results(userid=userinfo.sub, page=page, count=count)
 
 
 @router.get("/media/{mediaid}", summary="精确搜索资源", response_model=schemas.Response)
@@ -26,10 +30,85 @@ def search_by_id(mediaid: str,
                  mtype: str = None,
                  area: str = "title",
                  season: str = None,
-                 _: schemas.TokenPayload = Depends(verify_token)) -> Any:
+                 userinfo: schemas.TokenPayload = Depends(verify_token)) -> Any:
     """
     根据TMDBID/豆瓣ID精确搜索站点资源 tmdb:/douban:/bangumi:
     """
+    search_args, errmsg = __get_search_args(mediaid=mediaid, mtype=mtype, season=season)
+    if not search_args:
+        return schemas.Response(success=False, message=errmsg)
+    searchchain = SearchChain()
+    torrents = searchchain.search_by_id(area=area, userid=userinfo.sub, **search_args)
+    if not torrents:
+        return schemas.Response(success=False, message="未搜索到任何资源")
+    else:
+        return schemas.Response(success=True, data=[torrent.to_dict() for torrent in torrents],
+                                message="部分站点搜索超时，结果可能不完整" if searchchain.partial else None)
+
+
+@router.get("/media/{mediaid}/stream", summary="流式精确搜索资源")
+def search_by_id_stream(mediaid: str,
+                        token: str,
+                        mtype: str = None,
+                        area: str = "title",
+                        season: str = None) -> Any:
+    """
+    根据TMDBID/豆瓣ID精确搜索站点资源 tmdb:/douban:/bangumi:，返回格式为SSE，
+    每个站点搜索完成后推送当前已匹配过滤并排序的全部结果，最后推送done为true的完成事件
+    """
+    userinfo = verify_token(token) if token else None
+    if not userinfo:
+        raise HTTPException(
+            status_code=403,
+            detail="认证失败！",
+        )
+
+    def event_generator():
+        search_args, errmsg = __get_search_args(mediaid=mediaid, mtype=mtype, season=season)
+        if not search_args:
+            yield 'data: %s\n\n' % json.dumps({"done": True, "success": False, "message": errmsg})
+            return
+        contexts = []
+        searchchain = SearchChain()
+        for progress in searchchain.search_by_id_stream(area=area, userid=userinfo.sub, **search_args):
+            contexts = progress.pop("contexts")
+            yield 'data: %s\n\n' % json.dumps(jsonable_encoder({
+                **progress,
+                "done": False,
+                "data": [context.to_dict() for context in contexts]
+            }))
+        yield 'data: %s\n\n' % json.dumps({
+            "done": True,
+            "success": bool(contexts),
+            # 最后的站点超时后不会再有进度事件，以搜索结束时的状态为准
+            "partial": searchchain.partial,
+            "message": None if contexts else "未搜索到任何资源"
+        })
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+@router.get("/title", summary="模糊搜索资源", response_model=schemas.Response)
+def search_by_title(keyword: str = None,
+                    page: int = 0,
+                    site: int = None,
+                    userinfo: schemas.TokenPayload = Depends(verify_token)) -> Any:
+    """
+    根据名称模糊搜索站点资源，支持分页，关键词为空是返回首页资源
+    """
+    searchchain = SearchChain()
+    torrents = searchchain.search_by_title(title=keyword, page=page, site=site, userid=userinfo.sub)
+    if not torrents:
+        return schemas.Response(success=False, message="未搜索到任何资源")
+    return schemas.Response(success=True, data=[torrent.to_dict() for torrent in torrents],
+                            message="部分站点搜索超时，结果可能不完整" if searchchain.partial else None)
+
+
+def __get_search_args(mediaid: str, mtype: str = None, season: str = None) -> Tuple[Optional[dict], str]:
+    """
+    将媒体ID转换为当前识别来源的搜索参数
+    :return: 搜索参数、错误信息
+    """
     if mtype:
         mtype = MediaType(mtype)
     if season:
@@ -40,12 +119,9 @@ def search_by_id(mediaid: str,
             # 通过TMDBID识别豆瓣ID
             doubaninfo = MediaChain().get_doubaninfo_by_tmdbid(tmdbid=tmdbid, mtype=mtype)
             if doubaninfo:
-                torrents = SearchChain().search_by_id(doubanid=doubaninfo.get("id"),
-                                                      mtype=mtype, area=area, season=season)
-            else:
-                return schemas.Response(success=False, message="未识别到豆瓣媒体信息")
-        else:
-            torrents = SearchChain().search_by_id(tmdbid=tmdbid, mtype=mtype, area=area, season=season)
+                return {"doubanid": doubaninfo.get("id"), "mtype": mtype, "season": season}, ""
+            return None, "未识别到豆瓣媒体信息"
+        return {"tmdbid": tmdbid, "mtype": mtype, "season": season}, ""
     elif mediaid.startswith("douban:"):
         doubanid = mediaid.replace("douban:", "")
         if settings.RECOGNIZE_SOURCE == "themoviedb":
@@ -54,48 +130,20 @@ def search_by_id(mediaid: str,
             if tmdbinfo:
                 if tmdbinfo.get('season') and not season:
                     season = tmdbinfo.get('season')
-                torrents = SearchChain().search_by_id(tmdbid=tmdbinfo.get("id"),
-                                                      mtype=mtype, area=area, season=season)
-            else:
-                return schemas.Response(success=False, message="未识别到TMDB媒体信息")
-        else:
-            torrents = SearchChain().search_by_id(doubanid=doubanid, mtype=mtype, area=area, season=season)
+                return {"tmdbid": tmdbinfo.get("id"), "mtype": mtype, "season": season}, ""
+            return None, "未识别到TMDB媒体信息"
+        return {"doubanid": doubanid, "mtype": mtype, "season": season}, ""
     elif mediaid.startswith("bangumi:"):
         bangumiid = int(mediaid.replace("bangumi:", ""))
         if settings.RECOGNIZE_SOURCE == "themoviedb":
             # 通过BangumiID识别TMDBID
             tmdbinfo = MediaChain().get_tmdbinfo_by_bangumiid(bangumiid=bangumiid)
             if tmdbinfo:
-                torrents = SearchChain().search_by_id(tmdbid=tmdbinfo.get("id"),
-                                                      mtype=mtype, area=area, season=season)
-            else:
-                return schemas.Response(success=False, message="未识别到TMDB媒体信息")
-        else:
-            # 通过BangumiID识别豆瓣ID
-            doubaninfo = MediaChain().get_doubaninfo_by_bangumiid(bangumiid=bangumiid)
-            if doubaninfo:
-                torrents = SearchChain().search_by_id(doubanid=doubaninfo.get("id"),
-                                                      mtype=mtype, area=area, season=season)
-            else:
-                return schemas.Response(success=False, message="未识别到豆瓣媒体信息")
-    else:
-        return schemas.Response(success=False, message="未知的媒体ID")
-
-    if not torrents:
-        return schemas.Response(success=False, message="未搜索到任何资源")
-    else:
-        return schemas.Response(success=True, data=[torrent.to_dict() for torrent in torrents])
-
-
-@router.get("/title", summary="模糊搜索资源", response_model=schemas.Response)
-def search_by_title(keyword: str = None,
-                    page: int = 0,
-                    site: int = None,
-                    _: schemas.TokenPayload = Depends(verify_token)) -> Any:
-    """
-    根据名称模糊搜索站点资源，支持分页，关键词为空是返回首页资源
-    """
-    torrents = SearchChain().search_by_title(title=keyword, page=page, site=site)
-    if not torrents:
-        return schemas.Response(success=False, message="未搜索到任何资源")
-    return schemas.Response(success=True, data=[torrent.to_dict() for torrent in torrents])
+                return {"tmdbid": tmdbinfo.get("id"), "mtype": mtype, "season": season}, ""
+            return None, "未识别到TMDB媒体信息"
+        # 通过BangumiID识别豆瓣ID
+        doubaninfo = MediaChain().get_doubaninfo_by_bangumiid(bangumiid=bangumiid)
+        if doubaninfo:
+            return {"doubanid": doubaninfo.get("id"), "mtype": mtype, "season": season}, ""
+        return None, "未识别到豆瓣媒体信息"
+    return None, "未知的媒体ID"
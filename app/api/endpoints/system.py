@@ -1,11 +1,9 @@
 import json
-import time
 from datetime import datetime
 from typing import Union, Any
 
-import tailer
 from dotenv import set_key
-from fastapi import APIRouter, HTTPException, Depends, Response
+from fastapi import APIRouter, HTTPException, Depends, Response, Header
 from fastapi.responses import StreamingResponse
 
 from app import schemas
@@ -17,6 +15,8 @@ from app.core.security import verify_token
 from app.db.models import User
 from app.db.systemconfig_oper import SystemConfigOper
 from app.db.userauth import get_current_active_superuser
+from app.helper.imagecache import ImageCacheHelper
+from app.helper.logtail import LogTailHelper
 from app.helper.message import MessageHelper
 from app.helper.progress import ProgressHelper
 from app.helper.sites import SitesHelper
@@ -30,18 +30,17 @@ router = APIRouter()
 
 
 @router.get("/img/{proxy}", summary="图片代理")
-def get_img(imgurl: str, proxy: bool = False) -> Any:
+def get_img(imgurl: str, proxy: bool = False, width: int = None,
+            if_none_match: str = Header(None), if_modified_since: str = Header(None)) -> Any:
     """
-    通过图片代理（使用代理服务器）
+    通过图片代理（使用代理服务器），图片缓存在本地，width 缩略图宽度
     """
     if not imgurl:
         return None
-    if proxy:
-        response = RequestUtils(ua=settings.USER_AGENT, proxies=settings.PROXY).get_res(url=imgurl)
-    else:
-        response = RequestUtils(ua=settings.USER_AGENT).get_res(url=imgurl)
-    if response:
-        return Response(content=response.content, media_type="image/jpeg")
+    image = ImageCacheHelper().fetch(url=imgurl, proxy=proxy, width=width)
+    if image:
+        return image.response(if_none_match=if_none_match, if_modified_since=if_modified_since,
+                              max_age=24 * 3600)
     return None
 
 
@@ -97,13 +96,14 @@ def get_progress(process_type: str, token: str):
 
     progress = ProgressHelper()
 
-    def event_generator():
-        while True:
-            if global_vars.is_system_stopped():
-                break
+    async def event_generator():
+        # 只需要最新的进度，超时未变化时重发当前进度保持连接
+        with progress.hub.subscribe(process_type, maxlen=1) as subscription:
             detail = progress.get(process_type)
-            yield 'data: %s\n\n' % json.dumps(detail)
-            time.sleep(0.2)
+            while not global_vars.is_system_stopped():
+                yield 'data: %s\n\n' % json.dumps(detail)
+                details = await subscription.get(timeout=15)
+                detail = details[-1] if details else progress.get(process_type)
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
@@ -156,23 +156,27 @@ def get_message(token: str, role: str = "system"):
 
     message = MessageHelper()
 
-    def event_generator():
-        while True:
-            if global_vars.is_system_stopped():
-                break
-            detail = message.get(role)
-            yield 'data: %s\n\n' % (detail or '')
-            time.sleep(3)
+    async def event_generator():
+        with message.hub.subscribe(message.channel(role)) as subscription:
+            while not global_vars.is_system_stopped():
+                details = await subscription.get(timeout=15)
+                if not details:
+                    # 保持连接
+                    yield 'data: \n\n'
+                for detail in details:
+                    yield 'data: %s\n\n' % detail
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 
 @router.get("/logging", summary="实时日志")
-def get_logging(token: str, length: int = 50, logfile: str = "moviepilot.log"):
+def get_logging(token: str, length: int = 50, logfile: str = "moviepilot.log",
+                level: str = None, plugin: str = None):
     """
     实时获取系统日志
     length = -1 时, 返回text/plain
     否则 返回格式SSE
+    level 最低日志级别，plugin 插件ID，指定时读取插件日志
     """
     if not token or not verify_token(token):
         raise HTTPException(
@@ -180,30 +184,35 @@ def get_logging(token: str, length: int = 50, logfile: str = "moviepilot.log"):
             detail="认证失败！",
         )
 
+    if plugin:
+        logfile = f"plugins/{plugin}.log"
     log_path = settings.LOG_PATH / logfile
+    # 只允许读取日志目录下的文件
+    if settings.LOG_PATH.resolve() not in log_path.resolve().parents:
+        raise HTTPException(
+            status_code=400,
+            detail="日志文件不存在！",
+        )
+    log_tail = LogTailHelper(log_path, level=level)
 
     def log_generator():
-        # 读取文件末尾50行，不使用tailer模块
-        with open(log_path, 'r', encoding='utf-8') as f:
-            for line in f.readlines()[-max(length, 50):]:
-                yield 'data: %s\n\n' % line
-        while True:
-            if global_vars.is_system_stopped():
-                break
-            for t in tailer.follow(open(log_path, 'r', encoding='utf-8')):
-                yield 'data: %s\n\n' % (t or '')
-            time.sleep(1)
+        # 读取文件末尾的行，再跟踪新增内容
+        for line in log_tail.tail(max(length, 50)):
+            yield 'data: %s\n\n' % line
+        for line in log_tail.follow(global_vars.is_system_stopped):
+            yield 'data: %s\n\n' % line
+
+    def text_generator():
+        # 倒序输出
+        for line in log_tail.reverse():
+            yield f"{line}\n"
 
     # 根据length参数返回不同的响应
     if length == -1:
         # 返回全部日志作为文本响应
         if not log_path.exists():
             return Response(content="日志文件不存在！", media_type="text/plain")
-        with open(log_path, 'r', encoding='utf-8') as file:
-            text = file.read()
-        # 倒序输出
-        text = '\n'.join(text.split('\n')[::-1])
-        return Response(content=text, media_type="text/plain")
+        return StreamingResponse(text_generator(), media_type="text/plain")
     else:
         # 返回SSE流响应
         return StreamingResponse(log_generator(), media_type="text/event-stream")
@@ -21,6 +21,7 @@ from app.schemas import TransferInfo, TransferTorrent, ExistMediaInfo, Downloadi
     WebhookEventInfo, TmdbEpisode, MediaPerson
 from app.schemas.types import TorrentStatus, MediaType, MediaImageType, EventType
 from app.utils.object import ObjectUtils
+from app.utils.singleflight import SingleFlight
 
 
 class ChainBase(metaclass=ABCMeta):
@@ -28,6 +29,9 @@ class ChainBase(metaclass=ABCMeta):
     处理链基类
     """
 
+    # 合并并发的相同媒体识别请求
+    _recognize_flight = SingleFlight()
+
     def __init__(self):
         """
         公共初始化
@@ -164,8 +168,29 @@ class ChainBase(metaclass=ABCMeta):
         if tmdbid:
             doubanid = None
             bangumiid = None
-        return self.run_module("recognize_media", meta=meta, mtype=mtype,
-                               tmdbid=tmdbid, doubanid=doubanid, bangumiid=bangumiid, cache=cache)
+        # 相同的识别请求正在进行时等待其结果，不再重复查询
+        key = (settings.RECOGNIZE_SOURCE, mtype, tmdbid, doubanid, bangumiid, cache,
+               (meta.name, meta.cn_name, meta.en_name, meta.year, meta.begin_season, meta.type) if meta else None)
+        mediainfo, shared = self._recognize_flight.do(key, self.run_module, "recognize_media", meta=meta,
+                                                      mtype=mtype, tmdbid=tmdbid, doubanid=doubanid,
+                                                      bangumiid=bangumiid, cache=cache)
+        if shared and meta and meta.name:
+            # 与识别模块对元数据的更新保持一致
+            if mtype:
+                meta.type = mtype
+            if tmdbid:
+                meta.tmdbid = tmdbid
+            if doubanid:
+                meta.doubanid = doubanid
+        return mediainfo
+
+    @classmethod
+    def recognize_stats(cls) -> dict:
+        """
+        媒体识别请求的合并统计
+        :return: total：识别请求总数，coalesced：等待其它相同请求结果的次数，inflight：进行中的识别数
+        """
+        return cls._recognize_flight.stats()
 
     def match_doubaninfo(self, name: str, imdbid: str = None,
                          mtype: MediaType = None, year: str = None, season: int = None,
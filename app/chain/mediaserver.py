@@ -72,45 +72,57 @@ class MediaServerChain(ChainBase):
         # 同步黑名单
         sync_blacklist = settings.MEDIASERVER_SYNC_BLACKLIST.split(
             ",") if settings.MEDIASERVER_SYNC_BLACKLIST else []
-        mediaservers = settings.MEDIASERVER.split(",")
+        mediaservers = [mediaserver for mediaserver in settings.MEDIASERVER.split(",") if mediaserver]
         with lock:
             # 汇总统计
             total_count = 0
-            # 清空登记薄
-            self.dboper.empty()
-            # 遍历媒体服务器
+            # 清理已不再使用的媒体服务器数据
+            self.dboper.empty_others(mediaservers)
+            # 遍历媒体服务器，先读取全部数据，再与登记薄比对后一次性更新，同步期间原有数据仍可查询
             for mediaserver in mediaservers:
-                if not mediaserver:
-                    continue
                 logger.info(f"开始同步媒体库 {mediaserver} 的数据 ...")
-                for library in self.librarys(mediaserver):
-                    # 同步黑名单 跳过
-                    if library.name in sync_blacklist:
-                        continue
-                    logger.info(f"正在同步 {mediaserver} 媒体库 {library.name} ...")
-                    library_count = 0
-                    for item in self.items(mediaserver, library.id):
-                        if not item:
-                            continue
-                        if not item.item_id:
+                librarys = self.librarys(mediaserver)
+                if not librarys:
+                    logger.warn(f"媒体服务器 {mediaserver} 未获取到媒体库，保留原有数据")
+                    continue
+                server_items = []
+                try:
+                    for library in librarys:
+                        # 同步黑名单 跳过
+                        if library.name in sync_blacklist:
                             continue
-                        logger.debug(f"正在同步 {item.title} ...")
-                        # 计数
-                        library_count += 1
-                        seasoninfo = {}
-                        # 类型
-                        item_type = "电视剧" if item.item_type in ['Series', 'show'] else "电影"
-                        if item_type == "电视剧":
-                            # 查询剧集信息
-                            espisodes_info = self.episodes(mediaserver, item.item_id) or []
-                            for episode in espisodes_info:
-                                seasoninfo[episode.season] = episode.episodes
-                        # 插入数据
-                        item_dict = item.dict()
-                        item_dict['seasoninfo'] = json.dumps(seasoninfo)
-                        item_dict['item_type'] = item_type
-                        self.dboper.add(**item_dict)
-                    logger.info(f"{mediaserver} 媒体库 {library.name} 同步完成，共同步数量：{library_count}")
-                    # 总数累加
-                    total_count += library_count
+                        logger.info(f"正在同步 {mediaserver} 媒体库 {library.name} ...")
+                        library_count = 0
+                        for item in self.items(mediaserver, library.id) or []:
+                            if not item:
+                                continue
+                            if not item.item_id:
+                                continue
+                            logger.debug(f"正在同步 {item.title} ...")
+                            # 计数
+                            library_count += 1
+                            # 类型
+                            item_type = "电视剧" if item.item_type in ['Series', 'show'] else "电影"
+                            # 媒体服务器已随条目返回季集信息时不再单独查询
+                            seasoninfo = item.seasoninfo
+                            if seasoninfo is None:
+                                seasoninfo = {}
+                                if item_type == "电视剧":
+                                    # 查询剧集信息
+                                    espisodes_info = self.episodes(mediaserver, item.item_id) or []
+                                    for episode in espisodes_info:
+                                        seasoninfo[episode.season] = episode.episodes
+                            item_dict = item.dict()
+                            item_dict['seasoninfo'] = json.dumps(seasoninfo)
+                            item_dict['item_type'] = item_type
+                            server_items.append(item_dict)
+                        logger.info(f"{mediaserver} 媒体库 {library.name} 读取完成，共读取数量：{library_count}")
+                        # 总数累加
+                        total_count += library_count
+                except Exception as err:
+                    logger.error(f"读取媒体服务器 {mediaserver} 数据出错，保留原有数据：{str(err)}")
+                    continue
+                # 比对并更新登记薄
+                add_count, update_count, delete_count = self.dboper.sync(server=mediaserver, items=server_items)
+                logger.info(f"{mediaserver} 媒体库数据已更新，新增：{add_count}，更新：{update_count}，删除：{delete_count}")
             logger.info("【MediaServer】媒体库数据同步完成，同步数量：%s" % total_count)
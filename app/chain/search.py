@@ -1,22 +1,26 @@
-import pickle
-import traceback
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import copy
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Tuple, Generator, Union
 from typing import List, Optional
 
 from app.chain import ChainBase
+from app.core.config import settings
 from app.core.context import Context
 from app.core.context import MediaInfo, TorrentInfo
 from app.core.event import eventmanager, Event
 from app.core.metainfo import MetaInfo
 from app.db.systemconfig_oper import SystemConfigOper
 from app.helper.progress import ProgressHelper
+from app.helper.searchpool import SearchPoolHelper
+from app.helper.searchresult import SearchResultHelper
 from app.helper.sites import SitesHelper
 from app.helper.torrent import TorrentHelper
 from app.log import logger
 from app.schemas import NotExistMediaInfo
 from app.schemas.types import MediaType, ProgressKey, SystemConfigKey, EventType
+from app.utils.string import StringUtils
 
 
 class SearchChain(ChainBase):
@@ -30,9 +34,14 @@ class SearchChain(ChainBase):
         self.progress = ProgressHelper()
         self.systemconfig = SystemConfigOper()
         self.torrenthelper = TorrentHelper()
+        self.searchpool = SearchPoolHelper()
+        self.searchresult = SearchResultHelper()
+        # 最近一次搜索是否有站点超时，结果不完整
+        self.partial = False
 
     def search_by_id(self, tmdbid: int = None, doubanid: str = None,
-                     mtype: MediaType = None, area: str = "title", season: int = None) -> List[Context]:
+                     mtype: MediaType = None, area: str = "title", season: int = None,
+                     userid: Union[str, int] = None) -> List[Context]:
         """
         根据TMDBID/豆瓣ID搜索资源，精确匹配，但不不过滤本地存在的资源
         :param tmdbid: TMDB ID
@@ -40,11 +49,46 @@ class SearchChain(ChainBase):
         :param mtype: 媒体，电影 or 电视剧
         :param area: 搜索范围，title or imdbid
         :param season: 季数
+        :param userid: 用户ID，用于保存搜索结果
+        """
+        mediainfo, no_exists = self.__get_search_media(tmdbid=tmdbid, doubanid=doubanid, mtype=mtype, season=season)
+        if not mediainfo:
+            return []
+        results = self.process(mediainfo=mediainfo, area=area, no_exists=no_exists)
+        # 保存结果
+        self.searchresult.save(contexts=results, userid=userid, keyword=mediainfo.title)
+        return results
+
+    def search_by_id_stream(self, tmdbid: int = None, doubanid: str = None,
+                            mtype: MediaType = None, area: str = "title",
+                            season: int = None, userid: Union[str, int] = None) -> Generator[dict, None, None]:
+        """
+        根据TMDBID/豆瓣ID流式搜索资源，每个站点返回后即产出当前已排序的全部结果，参数同search_by_id
+        :return: 生成器，每个站点完成后产出 {site: 站点名称, finished: 已完成站点数, total: 站点总数,
+                 partial: 是否有站点超时, contexts: 已排序的上下文列表}
+        """
+        mediainfo, no_exists = self.__get_search_media(tmdbid=tmdbid, doubanid=doubanid, mtype=mtype, season=season)
+        if not mediainfo:
+            return
+        results = []
+        try:
+            for progress in self.process_stream(mediainfo=mediainfo, area=area, no_exists=no_exists):
+                results = progress.get("contexts")
+                yield progress
+        finally:
+            # 保存结果，客户端提前断开时保存已完成站点的结果
+            self.searchresult.save(contexts=results, userid=userid, keyword=mediainfo.title)
+
+    def __get_search_media(self, tmdbid: int = None, doubanid: str = None, mtype: MediaType = None,
+                           season: int = None) \
+            -> Tuple[Optional[MediaInfo], Optional[Dict[int, Dict[int, NotExistMediaInfo]]]]:
+        """
+        识别搜索的媒体信息，指定季时生成对应的缺失季集
         """
         mediainfo = self.recognize_media(tmdbid=tmdbid, doubanid=doubanid, mtype=mtype)
         if not mediainfo:
             logger.error(f'{tmdbid} 媒体信息识别失败！')
-            return []
+            return None, None
         no_exists = None
         if season:
             no_exists = {
@@ -52,18 +96,16 @@ class SearchChain(ChainBase):
                     season: NotExistMediaInfo(episodes=[])
                 }
             }
-        results = self.process(mediainfo=mediainfo, area=area, no_exists=no_exists)
-        # 保存结果
-        bytes_results = pickle.dumps(results)
-        self.systemconfig.set(SystemConfigKey.SearchResults, bytes_results)
-        return results
+        return mediainfo, no_exists
 
-    def search_by_title(self, title: str, page: int = 0, site: int = None) -> List[Context]:
+    def search_by_title(self, title: str, page: int = 0, site: int = None,
+                        userid: Union[str, int] = None) -> List[Context]:
         """
         根据标题搜索资源，不识别不过滤，直接返回站点内容
         :param title: 标题，为空时返回所有站点首页内容
         :param page: 页码
         :param site: 站点ID
+        :param userid: 用户ID，用于保存搜索结果
         """
         if title:
             logger.info(f'开始搜索资源，关键词：{title} ...')
@@ -78,22 +120,18 @@ class SearchChain(ChainBase):
         contexts = [Context(meta_info=MetaInfo(title=torrent.title, subtitle=torrent.description),
                             torrent_info=torrent) for torrent in torrents]
         # 保存结果
-        bytes_results = pickle.dumps(contexts)
-        self.systemconfig.set(SystemConfigKey.SearchResults, bytes_results)
+        self.searchresult.save(contexts=contexts, userid=userid, keyword=title)
         return contexts
 
-    def last_search_results(self) -> List[Context]:
+    def last_search_results(self, userid: Union[str, int] = None, page: int = 1, count: int = 0) -> List[dict]:
         """
         获取上次搜索结果
+        :param userid: 用户ID，为空时获取所有用户中最近一次的搜索结果
+        :param page: 页码，从1开始
+        :param count: 每页数量，为0时返回全部
+        :return: 与Context.to_dict()格式相同的字典列表
         """
-        results = self.systemconfig.get(SystemConfigKey.SearchResults)
-        if not results:
-            return []
-        try:
-            return pickle.loads(results)
-        except Exception as e:
-            logger.error(f'加载搜索结果失败：{str(e)} - {traceback.format_exc()}')
-            return []
+        return self.searchresult.get(userid=userid, page=page, count=count)
 
     def process(self, mediainfo: MediaInfo,
                 keyword: str = None,
@@ -101,7 +139,8 @@ class SearchChain(ChainBase):
                 sites: List[int] = None,
                 priority_rule: str = None,
                 filter_rule: Dict[str, str] = None,
-                area: str = "title") -> List[Context]:
+                area: str = "title",
+                background: bool = False) -> List[Context]:
         """
         根据媒体信息搜索种子资源，精确匹配，应用过滤规则，同时根据no_exists过滤本地已存在的资源
         :param mediainfo: 媒体信息
@@ -111,61 +150,22 @@ class SearchChain(ChainBase):
         :param priority_rule: 优先级规则，为空时使用搜索优先级规则
         :param filter_rule: 过滤规则，为空是使用默认过滤规则
         :param area: 搜索范围，title or imdbid
+        :param background: 是否为后台搜索（如订阅），与前台交互搜索共用站点搜索线程池时让出优先级
         """
-
-        def __do_filter(torrent_list: List[TorrentInfo]) -> List[TorrentInfo]:
-            """
-            执行优先级过滤
-            """
-            return self.filter_torrents(rule_string=priority_rule,
-                                        torrent_list=torrent_list,
-                                        season_episodes=season_episodes,
-                                        mediainfo=mediainfo) or []
-
-        # 豆瓣标题处理
-        if not mediainfo.tmdb_id:
-            meta = MetaInfo(title=mediainfo.title)
-            mediainfo.title = meta.name
-            mediainfo.season = meta.begin_season
-        logger.info(f'开始搜索资源，关键词：{keyword or mediainfo.title} ...')
-
-        # 补充媒体信息
-        if not mediainfo.names:
-            mediainfo: MediaInfo = self.recognize_media(mtype=mediainfo.type,
-                                                        tmdbid=mediainfo.tmdb_id,
-                                                        doubanid=mediainfo.douban_id)
-            if not mediainfo:
-                logger.error(f'媒体信息识别失败！')
-                return []
-
-        # 缺失的季集
-        mediakey = mediainfo.tmdb_id or mediainfo.douban_id
-        if no_exists and no_exists.get(mediakey):
-            # 过滤剧集
-            season_episodes = {sea: info.episodes
-                               for sea, info in no_exists[mediakey].items()}
-        elif mediainfo.season:
-            # 豆瓣只搜索当前季
-            season_episodes = {mediainfo.season: []}
-        else:
-            season_episodes = None
-
-        # 搜索关键词
-        if keyword:
-            keywords = [keyword]
-        else:
-            # 去重去空，但要保持顺序
-            keywords = list(dict.fromkeys([k for k in [mediainfo.title,
-                                                       mediainfo.original_title,
-                                                       mediainfo.en_title,
-                                                       mediainfo.sg_title] if k]))
+        # 补充媒体信息，生成搜索关键词及缺失季集
+        mediainfo, keywords, season_episodes = self.__prepare_search(mediainfo=mediainfo,
+                                                                     keyword=keyword,
+                                                                     no_exists=no_exists)
+        if not mediainfo:
+            return []
 
         # 执行搜索
         torrents: List[TorrentInfo] = self.__search_all_sites(
             mediainfo=mediainfo,
             keywords=keywords,
             sites=sites,
-            area=area
+            area=area,
+            background=background
         )
         if not torrents:
             logger.warn(f'{keyword or mediainfo.title} 未搜索到资源')
@@ -175,47 +175,15 @@ class SearchChain(ChainBase):
         self.progress.start(ProgressKey.Search)
 
         # 开始匹配
-        _match_torrents = []
-        # 总数
-        _total = len(torrents)
-        # 已处理数
-        _count = 0
-        if mediainfo:
-            # 英文标题应该在别名/原标题中，不需要再匹配
-            logger.info(f"开始匹配结果 标题：{mediainfo.title}，原标题：{mediainfo.original_title}，别名：{mediainfo.names}")
-            self.progress.update(value=0, text=f'开始匹配，总 {_total} 个资源 ...', key=ProgressKey.Search)
-            for torrent in torrents:
-                _count += 1
-                self.progress.update(value=(_count / _total) * 96,
-                                     text=f'正在匹配 {torrent.site_name}，已完成 {_count} / {_total} ...',
-                                     key=ProgressKey.Search)
-                if not torrent.title:
-                    continue
-                # 比对IMDBID
-                if torrent.imdbid \
-                        and mediainfo.imdb_id \
-                        and torrent.imdbid == mediainfo.imdb_id:
-                    logger.info(f'{mediainfo.title} 通过IMDBID匹配到资源：{torrent.site_name} - {torrent.title}')
-                    _match_torrents.append(torrent)
-                    continue
-                # 识别
-                torrent_meta = MetaInfo(title=torrent.title, subtitle=torrent.description)
-                if torrent.title != torrent_meta.org_string:
-                    logger.info(f"种子名称应用识别词后发生改变：{torrent.title} => {torrent_meta.org_string}")
-                # 比对种子
-                if self.torrenthelper.match_torrent(mediainfo=mediainfo,
-                                                    torrent_meta=torrent_meta,
-                                                    torrent=torrent):
-                    # 匹配成功
-                    _match_torrents.append(torrent)
-                    continue
-            # 匹配完成
-            logger.info(f"匹配完成，共匹配到 {len(_match_torrents)} 个资源")
-            self.progress.update(value=97,
-                                 text=f'匹配完成，共匹配到 {len(_match_torrents)} 个资源',
-                                 key=ProgressKey.Search)
-        else:
-            _match_torrents = torrents
+        # 英文标题应该在别名/原标题中，不需要再匹配
+        logger.info(f"开始匹配结果 标题：{mediainfo.title}，原标题：{mediainfo.original_title}，别名：{mediainfo.names}")
+        self.progress.update(value=0, text=f'开始匹配，总 {len(torrents)} 个资源 ...', key=ProgressKey.Search)
+        _match_torrents = self.__match_torrents(mediainfo=mediainfo, torrents=torrents, progress=True)
+        # 匹配完成
+        logger.info(f"匹配完成，共匹配到 {len(_match_torrents)} 个资源")
+        self.progress.update(value=97,
+                             text=f'匹配完成，共匹配到 {len(_match_torrents)} 个资源',
+                             key=ProgressKey.Search)
 
         # 开始过滤
         self.progress.update(value=98, text=f'开始过滤，总 {len(_match_torrents)} 个资源，请稍候...',
@@ -238,7 +206,10 @@ class SearchChain(ChainBase):
             priority_rule = self.systemconfig.get(SystemConfigKey.SearchFilterRules)
         if priority_rule:
             logger.info(f'开始优先级规则/剧集过滤，当前规则：{priority_rule} ...')
-            _match_torrents = __do_filter(_match_torrents)
+            _match_torrents = self.filter_torrents(rule_string=priority_rule,
+                                                   torrent_list=_match_torrents,
+                                                   season_episodes=season_episodes,
+                                                   mediainfo=mediainfo) or []
             if not _match_torrents:
                 logger.warn(f'{keyword or mediainfo.title} 没有符合优先级规则的资源')
                 return []
@@ -270,22 +241,189 @@ class SearchChain(ChainBase):
         # 返回
         return contexts
 
+    def process_stream(self, mediainfo: MediaInfo,
+                       keyword: str = None,
+                       no_exists: Dict[int, Dict[int, NotExistMediaInfo]] = None,
+                       sites: List[int] = None,
+                       priority_rule: str = None,
+                       filter_rule: Dict[str, str] = None,
+                       area: str = "title") -> Generator[dict, None, None]:
+        """
+        流式搜索种子资源，每个站点返回后即进行匹配、过滤和排序，不必等待最慢的站点，参数同process
+        :return: 生成器，每个站点完成后产出 {site: 站点名称, finished: 已完成站点数, total: 站点总数,
+                 partial: 是否有站点超时, contexts: 已排序的上下文列表}
+        """
+        # 补充媒体信息，生成搜索关键词及缺失季集
+        mediainfo, keywords, season_episodes = self.__prepare_search(mediainfo=mediainfo,
+                                                                     keyword=keyword,
+                                                                     no_exists=no_exists)
+        if not mediainfo:
+            return
+        if priority_rule is None:
+            # 取搜索优先级规则
+            priority_rule = self.systemconfig.get(SystemConfigKey.SearchFilterRules)
+
+        # 上下文中使用去掉多余数据的媒体信息，匹配仍使用完整的媒体信息
+        context_mediainfo = copy.copy(mediainfo)
+        context_mediainfo.clear()
+
+        contexts: List[Context] = []
+        for site, finished, total, torrents in self.__search_sites(mediainfo=mediainfo,
+                                                                   keywords=keywords,
+                                                                   sites=sites,
+                                                                   area=area):
+            # 匹配
+            torrents = self.__match_torrents(mediainfo=mediainfo, torrents=torrents or [])
+            # 过滤规则过滤
+            if torrents:
+                torrents = self.filter_torrents_by_rule(torrents=torrents,
+                                                        mediainfo=mediainfo,
+                                                        filter_rule=filter_rule)
+            # 优先级规则/剧集过滤
+            if torrents and priority_rule:
+                torrents = self.filter_torrents(rule_string=priority_rule,
+                                                torrent_list=torrents,
+                                                season_episodes=season_episodes,
+                                                mediainfo=mediainfo) or []
+            # 合并后重新排序
+            if torrents:
+                contexts = self.torrenthelper.sort_torrents(
+                    contexts + [Context(meta_info=MetaInfo(title=torrent.title, subtitle=torrent.description),
+                                        media_info=context_mediainfo,
+                                        torrent_info=torrent) for torrent in torrents])
+            yield {
+                "site": site.get("name"),
+                "finished": finished,
+                "total": total,
+                "partial": self.partial,
+                "contexts": contexts
+            }
+        logger.info(f'{keyword or mediainfo.title} 搜索完成，共 {len(contexts)} 个资源')
+
+    def __prepare_search(self, mediainfo: MediaInfo,
+                         keyword: str = None,
+                         no_exists: Dict[int, Dict[int, NotExistMediaInfo]] = None) \
+            -> Tuple[Optional[MediaInfo], List[str], Optional[Dict[int, list]]]:
+        """
+        补充媒体信息，生成搜索关键词及需要过滤的季集
+        :return: 媒体信息、搜索关键词、缺失季集 {season:[episodes]}，识别失败时媒体信息为None
+        """
+        # 豆瓣标题处理
+        if not mediainfo.tmdb_id:
+            meta = MetaInfo(title=mediainfo.title)
+            mediainfo.title = meta.name
+            mediainfo.season = meta.begin_season
+        logger.info(f'开始搜索资源，关键词：{keyword or mediainfo.title} ...')
+
+        # 补充媒体信息
+        if not mediainfo.names:
+            mediainfo: MediaInfo = self.recognize_media(mtype=mediainfo.type,
+                                                        tmdbid=mediainfo.tmdb_id,
+                                                        doubanid=mediainfo.douban_id)
+            if not mediainfo:
+                logger.error(f'媒体信息识别失败！')
+                return None, [], None
+
+        # 缺失的季集
+        mediakey = mediainfo.tmdb_id or mediainfo.douban_id
+        if no_exists and no_exists.get(mediakey):
+            # 过滤剧集
+            season_episodes = {sea: info.episodes
+                               for sea, info in no_exists[mediakey].items()}
+        elif mediainfo.season:
+            # 豆瓣只搜索当前季
+            season_episodes = {mediainfo.season: []}
+        else:
+            season_episodes = None
+
+        # 搜索关键词
+        if keyword:
+            keywords = [keyword]
+        else:
+            # 去重去空，但要保持顺序
+            keywords = list(dict.fromkeys([k for k in [mediainfo.title,
+                                                       mediainfo.original_title,
+                                                       mediainfo.en_title,
+                                                       mediainfo.sg_title] if k]))
+        return mediainfo, keywords, season_episodes
+
+    def __match_torrents(self, mediainfo: MediaInfo, torrents: List[TorrentInfo],
+                         progress: bool = False) -> List[TorrentInfo]:
+        """
+        将搜索结果与媒体信息进行匹配
+        :param mediainfo: 媒体信息
+        :param torrents: 种子列表
+        :param progress: 是否更新匹配进度
+        """
+        _match_torrents = []
+        # 总数
+        _total = len(torrents)
+        # 已处理数
+        _count = 0
+        for torrent in torrents:
+            _count += 1
+            if progress:
+                self.progress.update(value=(_count / _total) * 96,
+                                     text=f'正在匹配 {torrent.site_name}，已完成 {_count} / {_total} ...',
+                                     key=ProgressKey.Search)
+            if not torrent.title:
+                continue
+            # 比对IMDBID
+            if torrent.imdbid \
+                    and mediainfo.imdb_id \
+                    and torrent.imdbid == mediainfo.imdb_id:
+                logger.info(f'{mediainfo.title} 通过IMDBID匹配到资源：{torrent.site_name} - {torrent.title}')
+                _match_torrents.append(torrent)
+                continue
+            # 识别
+            torrent_meta = MetaInfo(title=torrent.title, subtitle=torrent.description)
+            if torrent.title != torrent_meta.org_string:
+                logger.info(f"种子名称应用识别词后发生改变：{torrent.title} => {torrent_meta.org_string}")
+            # 比对种子
+            if self.torrenthelper.match_torrent(mediainfo=mediainfo,
+                                                torrent_meta=torrent_meta,
+                                                torrent=torrent):
+                # 匹配成功
+                _match_torrents.append(torrent)
+                continue
+        return _match_torrents
+
     def __search_all_sites(self, keywords: List[str],
                            mediainfo: Optional[MediaInfo] = None,
                            sites: List[int] = None,
                            page: int = 0,
-                           area: str = "title") -> Optional[List[TorrentInfo]]:
+                           area: str = "title",
+                           background: bool = False) -> Optional[List[TorrentInfo]]:
         """
-        多线程搜索多个站点
+        多线程搜索多个站点，超时未完成的站点被放弃，此时partial标识为True
         :param mediainfo:  识别的媒体信息
         :param keywords:  搜索关键词列表
         :param sites:  指定站点ID列表，如有则只搜索指定站点，否则搜索所有站点
         :param page:  搜索页码
         :param area:  搜索区域 title or imdbid
+        :param background:  是否为后台搜索
         :reutrn: 资源列表
         """
+        results = []
+        for _, _, _, result in self.__search_sites(keywords=keywords, mediainfo=mediainfo, sites=sites,
+                                                   page=page, area=area, background=background):
+            if result:
+                results.extend(result)
+        return results
+
+    def __search_sites(self, keywords: List[str],
+                       mediainfo: Optional[MediaInfo] = None,
+                       sites: List[int] = None,
+                       page: int = 0,
+                       area: str = "title",
+                       background: bool = False) -> Generator[Tuple[dict, int, int, List[TorrentInfo]], None, None]:
+        """
+        多线程搜索多个站点，按完成顺序逐个产出站点结果，参数同__search_all_sites
+        :return: 生成器，产出 (站点, 已完成站点数, 站点总数, 站点资源列表)
+        """
         # 未开启的站点不搜索
         indexer_sites = []
+        self.partial = False
 
         # 配置的索引站点
         if not sites:
@@ -302,7 +440,7 @@ class SearchChain(ChainBase):
                 indexer_sites.append(indexer)
         if not indexer_sites:
             logger.warn('未开启任何有效站点，无法搜索资源')
-            return []
+            return
 
         # 开始进度
         self.progress.start(ProgressKey.Search)
@@ -316,45 +454,71 @@ class SearchChain(ChainBase):
         self.progress.update(value=0,
                              text=f"开始搜索，共 {total_num} 个站点 ...",
                              key=ProgressKey.Search)
-        # 多线程
-        executor = ThreadPoolExecutor(max_workers=len(indexer_sites))
-        all_task = []
+        # 提交到共用的站点搜索线程池
+        all_task = {}
         for site in indexer_sites:
             if area == "imdbid":
                 # 搜索IMDBID
-                task = executor.submit(self.search_torrents, site=site,
-                                       keywords=[mediainfo.imdb_id] if mediainfo else None,
-                                       mtype=mediainfo.type if mediainfo else None,
-                                       page=page)
+                task = self.searchpool.submit(StringUtils.get_url_domain(site.get("domain")), background,
+                                              self.search_torrents, site=site,
+                                              keywords=[mediainfo.imdb_id] if mediainfo else None,
+                                              mtype=mediainfo.type if mediainfo else None,
+                                              page=page)
             else:
                 # 搜索标题
-                task = executor.submit(self.search_torrents, site=site,
-                                       keywords=keywords,
-                                       mtype=mediainfo.type if mediainfo else None,
-                                       page=page)
-            all_task.append(task)
-        # 结果集
-        results = []
-        for future in as_completed(all_task):
-            finish_count += 1
-            result = future.result()
-            if result:
-                results.extend(result)
-            logger.info(f"站点搜索进度：{finish_count} / {total_num}")
-            self.progress.update(value=finish_count / total_num * 100,
-                                 text=f"正在搜索{keywords or ''}，已完成 {finish_count} / {total_num} 个站点 ...",
+                task = self.searchpool.submit(StringUtils.get_url_domain(site.get("domain")), background,
+                                              self.search_torrents, site=site,
+                                              keywords=keywords,
+                                              mtype=mediainfo.type if mediainfo else None,
+                                              page=page)
+            all_task[task] = site
+        # 有效资源数
+        result_count = 0
+        # 未完成的站点
+        pending = set(all_task)
+        try:
+            while pending:
+                # 每个站点从开始执行时计时，在线程池中排队的时间不计入超时
+                now = time.monotonic()
+                timeout_tasks = [future for future in pending
+                                 if future.start_time and now - future.start_time >= settings.SEARCH_TIMEOUT
+                                 and not future.done()]
+                if timeout_tasks:
+                    # 放弃超时的站点，站点请求结束后才会释放线程
+                    pending.difference_update(timeout_tasks)
+                    self.partial = True
+                    logger.warn(f"站点搜索超时：{'、'.join(all_task[future].get('name') for future in timeout_tasks)}，"
+                                f"仅返回已完成站点的结果")
+                    if not pending:
+                        break
+                # 等待到最早超时的站点，排队中的站点每秒检查一次是否已开始
+                wait_time = min([future.start_time + settings.SEARCH_TIMEOUT - now
+                                 for future in pending if future.start_time] + [1])
+                done, _ = wait(pending, timeout=max(wait_time, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    finish_count += 1
+                    result = future.result()
+                    if result:
+                        result_count += len(result)
+                    logger.info(f"站点搜索进度：{finish_count} / {total_num}")
+                    self.progress.update(value=finish_count / total_num * 100,
+                                         text=f"正在搜索{keywords or ''}，已完成 {finish_count} / {total_num} 个站点 ...",
+                                         key=ProgressKey.Search)
+                    yield all_task[future], finish_count, total_num, result
+            # 计算耗时
+            end_time = datetime.now()
+            # 更新进度
+            self.progress.update(value=100,
+                                 text=f"站点搜索完成，有效资源数：{result_count}，总耗时 {(end_time - start_time).seconds} 秒",
                                  key=ProgressKey.Search)
-        # 计算耗时
-        end_time = datetime.now()
-        # 更新进度
-        self.progress.update(value=100,
-                             text=f"站点搜索完成，有效资源数：{len(results)}，总耗时 {(end_time - start_time).seconds} 秒",
-                             key=ProgressKey.Search)
-        logger.info(f"站点搜索完成，有效资源数：{len(results)}，总耗时 {(end_time - start_time).seconds} 秒")
-        # 结束进度
-        self.progress.end(ProgressKey.Search)
-        # 返回
-        return results
+            logger.info(f"站点搜索完成，有效资源数：{result_count}，总耗时 {(end_time - start_time).seconds} 秒")
+        finally:
+            # 调用方提前结束（如客户端断开）时，取消还未开始的站点
+            for future in pending:
+                future.cancel()
+            # 结束进度
+            self.progress.end(ProgressKey.Search)
 
     def filter_torrents_by_rule(self,
                                 torrents: List[TorrentInfo],
@@ -340,7 +340,8 @@ class SubscribeChain(ChainBase):
                                                 sites=sites,
                                                 priority_rule=priority_rule,
                                                 filter_rule=filter_rule,
-                                                area="imdbid" if subscribe.search_imdbid else "title")
+                                                area="imdbid" if subscribe.search_imdbid else "title",
+                                                background=True)
             if not contexts:
                 logger.warn(f'订阅 {subscribe.keyword or subscribe.name} 未搜索到资源')
                 self.finish_subscribe_or_not(subscribe=subscribe, meta=meta,
@@ -537,10 +538,14 @@ class SubscribeChain(ChainBase):
         if not torrents:
             logger.warn('没有缓存资源，无法匹配订阅')
             return
-        # 记录重新识别过的种子
-        _recognize_cached = []
         # 所有订阅
         subscribes = self.subscribeoper.list('R')
+        if not subscribes:
+            return
+        # 未识别的种子统一重新识别一次
+        self.__recognize_torrents(torrents)
+        # 按媒体ID、类型、季建立种子索引，仍未识别的种子单独记录
+        torrents_index, unknown_torrents = self.__build_torrents_index(torrents)
         # 遍历订阅
         for subscribe in subscribes:
             logger.info(f'开始匹配订阅，标题：{subscribe.name} ...')
@@ -623,132 +628,99 @@ class SubscribeChain(ChainBase):
 
             # 过滤规则
             filter_rule = self.get_filter_rule(subscribe)
+            # 优先级过滤规则
+            if subscribe.best_version:
+                priority_rule = self.systemconfig.get(SystemConfigKey.BestVersionFilterRules)
+            else:
+                priority_rule = self.systemconfig.get(SystemConfigKey.SubscribeFilterRules)
+            # 订阅站点范围
+            sub_sites = self.get_sub_sites(subscribe)
 
-            # 遍历缓存种子
+            # 只遍历可能匹配的缓存种子
+            candidates = self.__get_candidate_torrents(torrents_index=torrents_index,
+                                                       unknown_torrents=unknown_torrents,
+                                                       mediainfo=mediainfo,
+                                                       season=meta.begin_season,
+                                                       domains=domains)
+            logger.debug(f'{mediainfo.title_year} 共有 {len(candidates)} 个候选种子...')
             _match_context = []
-            for domain, contexts in torrents.items():
-                if domains and domain not in domains:
-                    continue
-                logger.debug(f'开始匹配站点：{domain}，共缓存了 {len(contexts)} 个种子...')
-                for context in contexts:
-                    # 检查是否匹配
-                    torrent_meta = context.meta_info
-                    torrent_mediainfo = context.media_info
-                    torrent_info = context.torrent_info
+            for context, matched_by in candidates:
+                torrent_meta = context.meta_info
+                torrent_mediainfo = context.media_info
+                torrent_info = context.torrent_info
 
-                    # 先判断是否有没识别的种子
-                    if not torrent_mediainfo or (not torrent_mediainfo.tmdb_id and not torrent_mediainfo.douban_id):
-                        _cache_key = f"{torrent_info.title}_{torrent_info.description}"
-                        if _cache_key not in _recognize_cached:
-                            _recognize_cached.append(_cache_key)
-                            logger.info(
-                                f'{torrent_info.site_name} - {torrent_info.title} 订阅缓存为未识别状态，尝试重新识别...')
-                            # 重新识别（不使用缓存）
-                            torrent_mediainfo = self.recognize_media(meta=torrent_meta, cache=False)
-                            if not torrent_mediainfo:
-                                logger.warn(
-                                    f'{torrent_info.site_name} - {torrent_info.title} 重新识别失败，尝试通过标题匹配...')
-                                if self.torrenthelper.match_torrent(mediainfo=mediainfo,
-                                                                    torrent_meta=torrent_meta,
-                                                                    torrent=torrent_info):
-                                    # 匹配成功
-                                    logger.info(
-                                        f'{mediainfo.title_year} 通过标题匹配到资源：{torrent_info.site_name} - {torrent_info.title}')
-                                    # 更新缓存
-                                    torrent_mediainfo = mediainfo
-                                    context.media_info = mediainfo
-                                else:
-                                    continue
+                logger.info(
+                    f'{mediainfo.title_year} 通过{matched_by}匹配到资源：{torrent_info.site_name} - {torrent_info.title}')
 
-                    # 直接比对媒体信息
-                    if torrent_mediainfo and (torrent_mediainfo.tmdb_id or torrent_mediainfo.douban_id):
-                        if torrent_mediainfo.type != mediainfo.type:
-                            continue
-                        if torrent_mediainfo.tmdb_id \
-                                and torrent_mediainfo.tmdb_id != mediainfo.tmdb_id:
-                            continue
-                        if torrent_mediainfo.douban_id \
-                                and torrent_mediainfo.douban_id != mediainfo.douban_id:
-                            continue
-                        logger.info(
-                            f'{mediainfo.title_year} 通过媒体信ID匹配到资源：{torrent_info.site_name} - {torrent_info.title}')
-                    else:
-                        continue
+                # 优先级过滤规则
+                result: List[TorrentInfo] = self.filter_torrents(
+                    rule_string=priority_rule,
+                    torrent_list=[torrent_info],
+                    mediainfo=torrent_mediainfo)
+                if result is not None and not result:
+                    # 不符合过滤规则
+                    logger.debug(f"{torrent_info.title} 不匹配当前过滤规则")
+                    continue
 
-                    # 优先级过滤规则
-                    if subscribe.best_version:
-                        priority_rule = self.systemconfig.get(SystemConfigKey.BestVersionFilterRules)
-                    else:
-                        priority_rule = self.systemconfig.get(SystemConfigKey.SubscribeFilterRules)
-                    result: List[TorrentInfo] = self.filter_torrents(
-                        rule_string=priority_rule,
-                        torrent_list=[torrent_info],
-                        mediainfo=torrent_mediainfo)
-                    if result is not None and not result:
-                        # 不符合过滤规则
-                        logger.debug(f"{torrent_info.title} 不匹配当前过滤规则")
-                        continue
+                # 不在订阅站点范围的不处理
+                if sub_sites and torrent_info.site not in sub_sites:
+                    logger.debug(f"{torrent_info.site_name} - {torrent_info.title} 不符合订阅站点要求")
+                    continue
 
-                    # 不在订阅站点范围的不处理
-                    sub_sites = self.get_sub_sites(subscribe)
-                    if sub_sites and torrent_info.site not in sub_sites:
-                        logger.debug(f"{torrent_info.site_name} - {torrent_info.title} 不符合订阅站点要求")
+                # 如果是电视剧
+                if torrent_mediainfo.type == MediaType.TV:
+                    # 有多季的不要
+                    if len(torrent_meta.season_list) > 1:
+                        logger.debug(f'{torrent_info.title} 有多季，不处理')
                         continue
-
-                    # 如果是电视剧
-                    if torrent_mediainfo.type == MediaType.TV:
-                        # 有多季的不要
-                        if len(torrent_meta.season_list) > 1:
-                            logger.debug(f'{torrent_info.title} 有多季，不处理')
-                            continue
-                        # 比对季
-                        if torrent_meta.begin_season:
-                            if meta.begin_season != torrent_meta.begin_season:
-                                logger.debug(f'{torrent_info.title} 季不匹配')
-                                continue
-                        elif meta.begin_season != 1:
+                    # 比对季
+                    if torrent_meta.begin_season:
+                        if meta.begin_season != torrent_meta.begin_season:
                             logger.debug(f'{torrent_info.title} 季不匹配')
                             continue
-                        # 非洗版
-                        if not subscribe.best_version:
-                            # 不是缺失的剧集不要
-                            if no_exists and no_exists.get(mediakey):
-                                # 缺失集
-                                no_exists_info = no_exists.get(mediakey).get(subscribe.season)
-                                if no_exists_info:
-                                    # 是否有交集
-                                    if no_exists_info.episodes and \
-                                            torrent_meta.episode_list and \
-                                            not set(no_exists_info.episodes).intersection(
-                                                set(torrent_meta.episode_list)
-                                            ):
-                                        logger.debug(
-                                            f'{torrent_info.title} 对应剧集 {torrent_meta.episode_list} 未包含缺失的剧集'
-                                        )
-                                        continue
-                        else:
-                            # 洗版时，非整季不要
-                            if meta.type == MediaType.TV:
-                                if torrent_meta.episode_list:
-                                    logger.debug(f'{subscribe.name} 正在洗版，{torrent_info.title} 不是整季')
+                    elif meta.begin_season != 1:
+                        logger.debug(f'{torrent_info.title} 季不匹配')
+                        continue
+                    # 非洗版
+                    if not subscribe.best_version:
+                        # 不是缺失的剧集不要
+                        if no_exists and no_exists.get(mediakey):
+                            # 缺失集
+                            no_exists_info = no_exists.get(mediakey).get(subscribe.season)
+                            if no_exists_info:
+                                # 是否有交集
+                                if no_exists_info.episodes and \
+                                        torrent_meta.episode_list and \
+                                        not set(no_exists_info.episodes).intersection(
+                                            set(torrent_meta.episode_list)
+                                        ):
+                                    logger.debug(
+                                        f'{torrent_info.title} 对应剧集 {torrent_meta.episode_list} 未包含缺失的剧集'
+                                    )
                                     continue
+                    else:
+                        # 洗版时，非整季不要
+                        if meta.type == MediaType.TV:
+                            if torrent_meta.episode_list:
+                                logger.debug(f'{subscribe.name} 正在洗版，{torrent_info.title} 不是整季')
+                                continue
 
-                    # 过滤规则
-                    if not self.torrenthelper.filter_torrent(torrent_info=torrent_info,
-                                                             filter_rule=filter_rule,
-                                                             mediainfo=torrent_mediainfo):
-                        continue
+                # 过滤规则
+                if not self.torrenthelper.filter_torrent(torrent_info=torrent_info,
+                                                         filter_rule=filter_rule,
+                                                         mediainfo=torrent_mediainfo):
+                    continue
 
-                    # 洗版时，优先级小于已下载优先级的不要
-                    if subscribe.best_version:
-                        if subscribe.current_priority \
-                                and torrent_info.pri_order <= subscribe.current_priority:
-                            logger.info(f'{subscribe.name} 正在洗版，{torrent_info.title} 优先级低于或等于已下载优先级')
-                            continue
+                # 洗版时，优先级小于已下载优先级的不要
+                if subscribe.best_version:
+                    if subscribe.current_priority \
+                            and torrent_info.pri_order <= subscribe.current_priority:
+                        logger.info(f'{subscribe.name} 正在洗版，{torrent_info.title} 优先级低于或等于已下载优先级')
+                        continue
 
-                    # 匹配成功
-                    logger.info(f'{mediainfo.title_year} 匹配成功：{torrent_info.title}')
-                    _match_context.append(context)
+                # 匹配成功
+                logger.info(f'{mediainfo.title_year} 匹配成功：{torrent_info.title}')
+                _match_context.append(context)
 
             if not _match_context:
                 # 未匹配到资源
@@ -768,6 +740,124 @@ class SubscribeChain(ChainBase):
             self.finish_subscribe_or_not(subscribe=subscribe, meta=meta, mediainfo=mediainfo,
                                          downloads=downloads, lefts=lefts)
 
+    def __recognize_torrents(self, torrents: Dict[str, List[Context]]):
+        """
+        对缓存中未识别的种子重新识别一次（不使用缓存），相同标题的种子只识别一次
+        """
+        # 按标题归集未识别的种子
+        unknown_contexts: Dict[str, List[Context]] = {}
+        for contexts in torrents.values():
+            for context in contexts:
+                if self.__is_recognized(context):
+                    continue
+                torrent_info = context.torrent_info
+                unknown_contexts.setdefault(f"{torrent_info.title}_{torrent_info.description}", []).append(context)
+        if not unknown_contexts:
+            return
+        logger.info(f'订阅缓存中有 {len(unknown_contexts)} 个未识别的种子，尝试重新识别...')
+        for contexts in unknown_contexts.values():
+            torrent_info = contexts[0].torrent_info
+            logger.info(f'{torrent_info.site_name} - {torrent_info.title} 订阅缓存为未识别状态，尝试重新识别...')
+            # 重新识别（不使用缓存）
+            torrent_mediainfo = self.recognize_media(meta=contexts[0].meta_info, cache=False)
+            if not torrent_mediainfo:
+                logger.warn(f'{torrent_info.site_name} - {torrent_info.title} 重新识别失败，将尝试通过标题匹配...')
+                continue
+            # 清理多余数据
+            torrent_mediainfo.clear()
+            for context in contexts:
+                context.media_info = torrent_mediainfo
+
+    @staticmethod
+    def __is_recognized(context: Context) -> bool:
+        """
+        种子是否已识别到媒体信息
+        """
+        torrent_mediainfo = context.media_info
+        return bool(torrent_mediainfo and (torrent_mediainfo.tmdb_id or torrent_mediainfo.douban_id))
+
+    def __build_torrents_index(self, torrents: Dict[str, List[Context]]) \
+            -> Tuple[Dict[tuple, Dict[Optional[int], list]], list]:
+        """
+        建立缓存种子索引
+        :return: 已识别种子索引 {(ID类型, 媒体类型, 媒体ID): {季: [(序号, 站点域名, 上下文)]}}，未识别种子列表 [(序号, 站点域名, 上下文)]
+        """
+        torrents_index: Dict[tuple, Dict[Optional[int], list]] = {}
+        unknown_torrents = []
+        seq = 0
+        for domain, contexts in torrents.items():
+            for context in contexts:
+                seq += 1
+                if self.__is_recognized(context):
+                    self.__add_torrents_index(torrents_index, (seq, domain, context))
+                else:
+                    unknown_torrents.append((seq, domain, context))
+        return torrents_index, unknown_torrents
+
+    @staticmethod
+    def __add_torrents_index(torrents_index: Dict[tuple, Dict[Optional[int], list]], item: tuple):
+        """
+        添加种子到索引，有TMDBID的按TMDBID索引，否则按豆瓣ID索引；电视剧按季索引，多季的种子不会被订阅匹配，不入索引
+        """
+        context: Context = item[2]
+        torrent_mediainfo = context.media_info
+        if torrent_mediainfo.type == MediaType.TV:
+            if len(context.meta_info.season_list) > 1:
+                return
+            season = context.meta_info.begin_season or 1
+        else:
+            season = None
+        if torrent_mediainfo.tmdb_id:
+            key = ("tmdb", torrent_mediainfo.type, torrent_mediainfo.tmdb_id)
+        else:
+            key = ("douban", torrent_mediainfo.type, torrent_mediainfo.douban_id)
+        torrents_index.setdefault(key, {}).setdefault(season, []).append(item)
+
+    def __get_candidate_torrents(self, torrents_index: Dict[tuple, Dict[Optional[int], list]],
+                                 unknown_torrents: list,
+                                 mediainfo: MediaInfo,
+                                 season: Optional[int],
+                                 domains: List[str]) -> List[Tuple[Context, str]]:
+        """
+        从索引中查询与订阅媒体匹配的种子，未识别的种子通过标题匹配，按缓存顺序返回种子及匹配方式
+        :param torrents_index: 已识别种子索引
+        :param unknown_torrents: 未识别种子列表，标题匹配成功的会移入索引
+        :param mediainfo: 订阅的媒体信息
+        :param season: 订阅的季
+        :param domains: 订阅的站点域名列表，为空时不限制
+        """
+        if mediainfo.type != MediaType.TV:
+            season = None
+        candidates = []
+        if mediainfo.tmdb_id:
+            for item in torrents_index.get(("tmdb", mediainfo.type, mediainfo.tmdb_id), {}).get(season) or []:
+                # 同时有豆瓣ID的需要一致
+                douban_id = item[2].media_info.douban_id
+                if douban_id and douban_id != mediainfo.douban_id:
+                    continue
+                candidates.append((item, "媒体信息ID"))
+        if mediainfo.douban_id:
+            candidates.extend((item, "媒体信息ID") for item in
+                              torrents_index.get(("douban", mediainfo.type, mediainfo.douban_id), {}).get(season) or [])
+        # 未识别的种子尝试通过标题匹配
+        for item in list(unknown_torrents):
+            _, domain, context = item
+            if domains and domain not in domains:
+                continue
+            torrent_info = context.torrent_info
+            if self.torrenthelper.match_torrent(mediainfo=mediainfo,
+                                                torrent_meta=context.meta_info,
+                                                torrent=torrent_info):
+                # 匹配成功，更新缓存
+                context.media_info = mediainfo
+                unknown_torrents.remove(item)
+                self.__add_torrents_index(torrents_index, item)
+                candidates.append((item, "标题"))
+        # 过滤站点，保持缓存中的顺序
+        return [(context, matched_by)
+                for (_, domain, context), matched_by in sorted(candidates, key=lambda x: x[0][0])
+                if not domains or domain in domains]
+
     def check(self):
         """
         定时检查订阅，更新订阅信息
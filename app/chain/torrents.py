@@ -1,6 +1,8 @@
 import re
+import threading
 import traceback
-from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Union, Optional
 
 from cachetools import cached, TTLCache
 
@@ -8,12 +10,14 @@ from app.chain import ChainBase
 from app.chain.media import MediaChain
 from app.core.config import settings
 from app.core.context import TorrentInfo, Context, MediaInfo
-from app.core.metainfo import MetaInfo
+from app.core.meta import MetaBase
+from app.core.metainfo import MetaInfoBatch
 from app.db.site_oper import SiteOper
 from app.db.systemconfig_oper import SystemConfigOper
 from app.helper.rss import RssHelper
 from app.helper.sites import SitesHelper
 from app.helper.torrent import TorrentHelper
+from app.helper.torrentcache import TorrentCacheHelper
 from app.log import logger
 from app.schemas import Notification
 from app.schemas.types import SystemConfigKey, MessageChannel, NotificationType, MediaType
@@ -26,8 +30,9 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
     站点首页或RSS种子处理链，服务于订阅、刷流等
     """
 
-    _spider_file = "__torrents_cache__"
-    _rss_file = "__rss_cache__"
+    # 站点并发控制 {domain: 信号量}
+    _site_semaphores: Dict[str, threading.BoundedSemaphore] = {}
+    _site_semaphores_lock = threading.Lock()
 
     def __init__(self):
         super().__init__()
@@ -37,6 +42,7 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
         self.systemconfig = SystemConfigOper()
         self.mediachain = MediaChain()
         self.torrenthelper = TorrentHelper()
+        self.torrentcache = TorrentCacheHelper()
 
     def remote_refresh(self, channel: MessageChannel, userid: Union[str, int] = None):
         """
@@ -48,31 +54,33 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
         self.post_message(Notification(channel=channel,
                                        title=f"种子刷新完成！", userid=userid))
 
-    def get_torrents(self, stype: str = None) -> Dict[str, List[Context]]:
+    def get_torrents(self, stype: str = None, domains: List[str] = None) -> Dict[str, List[Context]]:
         """
         获取当前缓存的种子
         :param stype: 强制指定缓存类型，spider:爬虫缓存，rss:rss缓存
+        :param domains: 只读取指定站点域名的缓存，为空则读取全部站点
         """
 
         if not stype:
             stype = settings.SUBSCRIBE_MODE
 
-        # 读取缓存
-        if stype == 'spider':
-            return self.load_cache(self._spider_file) or {}
-        else:
-            return self.load_cache(self._rss_file) or {}
+        # 读取缓存，过滤掉无效种子
+        torrents_cache = self.torrentcache.get(stype="spider" if stype == "spider" else "rss",
+                                               domains=domains)
+        for _domain, _contexts in torrents_cache.items():
+            torrents_cache[_domain] = [_context for _context in _contexts
+                                       if not self.torrenthelper.is_invalid(_context.torrent_info.enclosure)]
+        return torrents_cache
 
     def clear_torrents(self):
         """
         清理种子缓存数据
         """
         logger.info(f'开始清理种子缓存数据 ...')
-        self.remove_cache(self._spider_file)
-        self.remove_cache(self._rss_file)
+        self.torrentcache.clear()
         logger.info(f'种子缓存数据清理完成')
 
-    @cached(cache=TTLCache(maxsize=128, ttl=595))
+    @cached(cache=TTLCache(maxsize=128, ttl=595), lock=threading.Lock())
     def browse(self, domain: str) -> List[TorrentInfo]:
         """
         浏览站点首页内容，返回种子清单，TTL缓存10分钟
@@ -85,12 +93,20 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
             return []
         return self.refresh_torrents(site=site)
 
-    @cached(cache=TTLCache(maxsize=128, ttl=295))
+    @cached(cache=TTLCache(maxsize=128, ttl=295), lock=threading.Lock())
     def rss(self, domain: str) -> List[TorrentInfo]:
         """
         获取站点RSS内容，返回种子清单，TTL缓存5分钟
         :param domain: 站点域名
         """
+        return self.__rss(domain)
+
+    def __rss(self, domain: str, cached_keys: Dict[str, Optional[str]] = None) -> List[TorrentInfo]:
+        """
+        获取站点RSS内容，返回种子清单
+        :param domain: 站点域名
+        :param cached_keys: 站点已缓存种子的标识，RSS中连续出现已缓存的种子时不再解析后续的种子
+        """
         logger.info(f'开始获取站点 {domain} RSS ...')
         site = self.siteshelper.get_indexer(domain)
         if not site:
@@ -99,8 +115,16 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
         if not site.get("rss"):
             logger.error(f'站点 {domain} 未配置RSS地址！')
             return []
+
+        def __known(_item: dict) -> bool:
+            """
+            种子是否已缓存
+            """
+            return self.torrentcache.get_key(self.__rss_torrent(site, _item)) in cached_keys
+
         rss_items = self.rsshelper.parse(site.get("rss"), True if site.get("proxy") else False,
-                                         timeout=int(site.get("timeout") or 30))
+                                         timeout=int(site.get("timeout") or 30),
+                                         known=__known if cached_keys else None)
         if rss_items is None:
             # rss过期，尝试保留原配置生成新的rss
             self.__renew_rss_url(domain=domain, site=site)
@@ -113,23 +137,31 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
         for item in rss_items:
             if not item.get("title"):
                 continue
-            torrentinfo = TorrentInfo(
-                site=site.get("id"),
-                site_name=site.get("name"),
-                site_cookie=site.get("cookie"),
-                site_ua=site.get("ua") or settings.USER_AGENT,
-                site_proxy=site.get("proxy"),
-                site_order=site.get("pri"),
-                title=item.get("title"),
-                enclosure=item.get("enclosure"),
-                page_url=item.get("link"),
-                size=item.get("size"),
-                pubdate=item["pubdate"].strftime("%Y-%m-%d %H:%M:%S") if item.get("pubdate") else None,
-            )
-            ret_torrents.append(torrentinfo)
+            ret_torrents.append(self.__rss_torrent(site, item))
 
         return ret_torrents
 
+    @staticmethod
+    def __rss_torrent(site: dict, item: dict) -> TorrentInfo:
+        """
+        RSS条目转换为种子信息
+        :param site: 站点
+        :param item: RSS条目
+        """
+        return TorrentInfo(
+            site=site.get("id"),
+            site_name=site.get("name"),
+            site_cookie=site.get("cookie"),
+            site_ua=site.get("ua") or settings.USER_AGENT,
+            site_proxy=site.get("proxy"),
+            site_order=site.get("pri"),
+            title=item.get("title"),
+            enclosure=item.get("enclosure"),
+            page_url=item.get("link"),
+            size=item.get("size"),
+            pubdate=item["pubdate"].strftime("%Y-%m-%d %H:%M:%S") if item.get("pubdate") else None,
+        )
+
     def refresh(self, stype: str = None, sites: List[int] = None) -> Dict[str, List[Context]]:
         """
         刷新站点最新资源，识别并缓存起来
@@ -144,89 +176,189 @@ class TorrentsChain(ChainBase, metaclass=Singleton):
         if not sites:
             sites = self.systemconfig.get(SystemConfigKey.RssSites) or []
 
-        # 读取缓存
-        torrents_cache = self.get_torrents()
-
-        # 缓存过滤掉无效种子
-        for _domain, _torrents in torrents_cache.items():
-            torrents_cache[_domain] = [_torrent for _torrent in _torrents
-                                       if not self.torrenthelper.is_invalid(_torrent.torrent_info.enclosure)]
+        # 缓存类型
+        stype = "spider" if stype == "spider" else "rss"
 
-        # 所有站点索引
-        indexers = self.siteshelper.get_indexers()
-        # 需要刷新的站点domain
-        domains = []
-        # 遍历站点缓存资源
-        for indexer in indexers:
+        # 需要刷新的站点 {domain: indexer}
+        refresh_indexers: Dict[str, dict] = {}
+        for indexer in self.siteshelper.get_indexers():
             # 未开启的站点不刷新
             if sites and indexer.get("id") not in sites:
                 continue
-            domain = StringUtils.get_url_domain(indexer.get("domain"))
-            domains.append(domain)
-            if stype == "spider":
-                # 刷新首页种子
-                torrents: List[TorrentInfo] = self.browse(domain=domain)
-            else:
-                # 刷新RSS种子
-                torrents: List[TorrentInfo] = self.rss(domain=domain)
-            # 按pubdate降序排列
-            torrents.sort(key=lambda x: x.pubdate or '', reverse=True)
-            # 取前N条
-            torrents = torrents[:settings.CACHE_CONF.get('refresh')]
-            if torrents:
-                # 过滤出没有处理过的种子
-                torrents = [torrent for torrent in torrents
-                            if f'{torrent.title}{torrent.description}'
-                            not in [f'{t.torrent_info.title}{t.torrent_info.description}'
-                                    for t in torrents_cache.get(domain) or []]]
-                if torrents:
-                    logger.info(f'{indexer.get("name")} 有 {len(torrents)} 个新种子')
+            refresh_indexers[StringUtils.get_url_domain(indexer.get("domain"))] = indexer
+        domains = list(refresh_indexers)
+
+        # 读取站点已缓存种子的标识，移除无效种子
+        cached_keys: Dict[str, Dict[str, Optional[str]]] = {}
+        for domain in domains:
+            keys = self.torrentcache.keys(stype=stype, domain=domain)
+            invalid_keys = {key for key, enclosure in keys.items() if self.torrenthelper.is_invalid(enclosure)}
+            if invalid_keys:
+                self.torrentcache.delete(stype=stype, domain=domain, keys=invalid_keys)
+                for key in invalid_keys:
+                    keys.pop(key)
+            cached_keys[domain] = keys
+
+        # 多站点并发获取，新种子交由识别线程池处理
+        if refresh_indexers:
+            fetch_workers = max(min(settings.SUBSCRIBE_REFRESH_THREADS, len(refresh_indexers)), 1)
+            recognize_workers = max(settings.SUBSCRIBE_RECOGNIZE_THREADS, 1)
+            with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_executor, \
+                    ThreadPoolExecutor(max_workers=recognize_workers) as recognize_executor:
+                self.__refresh_sites(indexers=refresh_indexers,
+                                     stype=stype,
+                                     cached_keys=cached_keys,
+                                     fetch_executor=fetch_executor,
+                                     recognize_executor=recognize_executor)
+
+        # 只返回站点范围内的缓存种子
+        if sites:
+            return self.get_torrents(stype=stype, domains=domains) if domains else {}
+        return self.get_torrents(stype=stype)
+
+    def __refresh_sites(self, indexers: Dict[str, dict], stype: str,
+                        cached_keys: Dict[str, Dict[str, Optional[str]]],
+                        fetch_executor: ThreadPoolExecutor,
+                        recognize_executor: ThreadPoolExecutor):
+        """
+        并发获取多个站点的最新种子，新种子识别完成后按站点追加写入缓存，慢站点不阻塞其它站点的处理
+        :param indexers: 需要刷新的站点 {domain: indexer}
+        :param stype: 缓存类型，spider:爬虫缓存，rss:rss缓存
+        :param cached_keys: 站点已缓存种子的标识 {domain: {种子标识: 种子链接}}
+        :param fetch_executor: 站点获取线程池
+        :param recognize_executor: 种子识别线程池
+        """
+        # 站点获取任务 {future: domain}
+        fetch_tasks = {fetch_executor.submit(self.__fetch_torrents, domain, stype, cached_keys.get(domain)): domain
+                       for domain in indexers}
+        # 种子识别任务 {future: (domain, 序号)}
+        recognize_tasks = {}
+        # 各站点识别完成的上下文，按种子顺序存放
+        site_contexts: Dict[str, List[Optional[Context]]] = {}
+        # 各站点未完成识别的种子数
+        site_remains: Dict[str, int] = {}
+
+        pending = set(fetch_tasks)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in fetch_tasks:
+                    # 站点获取完成
+                    domain = fetch_tasks.pop(future)
+                    site_name = indexers[domain].get("name")
+                    torrents = self.__filter_new_torrents(torrents=future.result(),
+                                                          cached_keys=cached_keys.get(domain))
+                    if torrents is None:
+                        logger.info(f'{site_name} 没有获取到种子')
+                        continue
+                    if not torrents:
+                        logger.info(f'{site_name} 没有新种子')
+                        continue
+                    logger.info(f'{site_name} 有 {len(torrents)} 个新种子')
+                    site_contexts[domain] = [None] * len(torrents)
+                    site_remains[domain] = len(torrents)
+                    # 批量识别元数据
+                    metas = MetaInfoBatch([(torrent.title, torrent.description) for torrent in torrents])
+                    for index, (torrent, meta) in enumerate(zip(torrents, metas)):
+                        task = recognize_executor.submit(self.__recognize_torrent, torrent, meta)
+                        recognize_tasks[task] = (domain, index)
+                        pending.add(task)
                 else:
-                    logger.info(f'{indexer.get("name")} 没有新种子')
-                    continue
-                for torrent in torrents:
-                    logger.info(f'处理资源：{torrent.title} ...')
-                    # 识别
-                    meta = MetaInfo(title=torrent.title, subtitle=torrent.description)
-                    if torrent.title != meta.org_string:
-                        logger.info(f'种子名称应用识别词后发生改变：{torrent.title} => {meta.org_string}')
-                    # 使用站点种子分类，校正类型识别
-                    if meta.type != MediaType.TV \
-                            and torrent.category == MediaType.TV.value:
-                        meta.type = MediaType.TV
-                    # 识别媒体信息
-                    mediainfo: MediaInfo = self.mediachain.recognize_by_meta(meta)
-                    if not mediainfo:
-                        logger.warn(f'{torrent.title} 未识别到媒体信息')
-                        # 存储空的媒体信息
-                        mediainfo = MediaInfo()
-                    # 清理多余数据
-                    mediainfo.clear()
-                    # 上下文
-                    context = Context(meta_info=meta, media_info=mediainfo, torrent_info=torrent)
-                    # 添加到缓存
-                    if not torrents_cache.get(domain):
-                        torrents_cache[domain] = [context]
-                    else:
-                        torrents_cache[domain].append(context)
-                    # 如果超过了限制条数则移除掉前面的
-                    if len(torrents_cache[domain]) > settings.CACHE_CONF.get('torrents'):
-                        torrents_cache[domain] = torrents_cache[domain][-settings.CACHE_CONF.get('torrents'):]
-                # 回收资源
-                del torrents
-            else:
-                logger.info(f'{indexer.get("name")} 没有获取到种子')
+                    # 种子识别完成
+                    domain, index = recognize_tasks.pop(future)
+                    site_contexts[domain][index] = future.result()
+                    site_remains[domain] -= 1
+                    if site_remains[domain]:
+                        continue
+                    # 站点所有新种子识别完成，按顺序追加到缓存，超过限制条数时移除最早缓存的
+                    self.torrentcache.append(stype=stype,
+                                             domain=domain,
+                                             contexts=site_contexts.pop(domain),
+                                             limit=settings.CACHE_CONF.get('torrents'))
 
-        # 保存缓存到本地
-        if stype == "spider":
-            self.save_cache(torrents_cache, self._spider_file)
-        else:
-            self.save_cache(torrents_cache, self._rss_file)
+    def __fetch_torrents(self, domain: str, stype: str,
+                         cached_keys: Dict[str, Optional[str]] = None) -> List[TorrentInfo]:
+        """
+        获取单个站点的最新种子，同一站点的并发获取数受限
+        :param domain: 站点域名
+        :param stype: 缓存类型，spider:爬虫缓存，rss:rss缓存
+        :param cached_keys: 站点已缓存种子的标识
+        """
+        with self.__get_site_semaphore(domain):
+            try:
+                if stype == "spider":
+                    # 刷新首页种子
+                    return self.browse(domain=domain)
+                else:
+                    # 刷新RSS种子，读取到已缓存的种子时提前结束解析
+                    # 提前结束时只有部分种子，不使用也不写入rss()的完整结果缓存
+                    return self.__rss(domain=domain, cached_keys=cached_keys)
+            except Exception as err:
+                logger.error(f'站点 {domain} 获取种子出错：{str(err)} - {traceback.format_exc()}')
+                return []
 
-        # 去除不在站点范围内的缓存种子
-        if sites and torrents_cache:
-            torrents_cache = {k: v for k, v in torrents_cache.items() if k in domains}
-        return torrents_cache
+    def __get_site_semaphore(self, domain: str) -> threading.BoundedSemaphore:
+        """
+        获取站点的并发控制信号量
+        """
+        with self._site_semaphores_lock:
+            semaphore = self._site_semaphores.get(domain)
+            if not semaphore:
+                semaphore = threading.BoundedSemaphore(max(settings.SUBSCRIBE_REFRESH_SITE_THREADS, 1))
+                self._site_semaphores[domain] = semaphore
+            return semaphore
+
+    def __filter_new_torrents(self, torrents: List[TorrentInfo],
+                              cached_keys: Dict[str, Optional[str]]) -> Optional[List[TorrentInfo]]:
+        """
+        过滤出没有处理过的种子，没有获取到种子时返回None
+        :param torrents: 站点最新种子
+        :param cached_keys: 站点已缓存种子的标识
+        """
+        if not torrents:
+            return None
+        # 按pubdate降序排列
+        torrents.sort(key=lambda x: x.pubdate or '', reverse=True)
+        # 取前N条
+        torrents = torrents[:settings.CACHE_CONF.get('refresh')]
+        # 过滤出没有处理过的种子，同一批次中重复的种子只保留一个
+        new_torrents = []
+        new_keys = set()
+        for torrent in torrents:
+            key = self.torrentcache.get_key(torrent)
+            if (cached_keys and key in cached_keys) or key in new_keys:
+                continue
+            new_keys.add(key)
+            new_torrents.append(torrent)
+        return new_torrents
+
+    def __recognize_torrent(self, torrent: TorrentInfo, meta: MetaBase) -> Context:
+        """
+        识别种子媒体信息，生成上下文
+        :param torrent: 种子
+        :param meta: 种子的元数据
+        """
+        logger.info(f'处理资源：{torrent.title} ...')
+        if torrent.title != meta.org_string:
+            logger.info(f'种子名称应用识别词后发生改变：{torrent.title} => {meta.org_string}')
+        # 使用站点种子分类，校正类型识别
+        if meta.type != MediaType.TV \
+                and torrent.category == MediaType.TV.value:
+            meta.type = MediaType.TV
+        # 识别媒体信息
+        try:
+            mediainfo: MediaInfo = self.mediachain.recognize_by_meta(meta)
+        except Exception as err:
+            logger.error(f'{torrent.title} 识别媒体信息出错：{str(err)} - {traceback.format_exc()}')
+            mediainfo = None
+        if not mediainfo:
+            logger.warn(f'{torrent.title} 未识别到媒体信息')
+            # 存储空的媒体信息
+            mediainfo = MediaInfo()
+        # 清理多余数据
+        mediainfo.clear()
+        # 上下文
+        return Context(meta_info=meta, media_info=mediainfo, torrent_info=torrent)
 
     def __renew_rss_url(self, domain: str, site: dict):
         """
@@ -11,7 +11,7 @@ from app.chain.tmdb import TmdbChain
 from app.core.config import settings
 from app.core.context import MediaInfo
 from app.core.meta import MetaBase
-from app.core.metainfo import MetaInfoPath, MetaInfo
+from app.core.metainfo import MetaInfoPath, MetaInfo, MetaInfoPathBatch
 from app.db.downloadhistory_oper import DownloadHistoryOper
 from app.db.models.downloadhistory import DownloadHistory
 from app.db.models.transferhistory import TransferHistory
@@ -246,6 +246,9 @@ class TransferChain(ChainBase):
                 # 有集自定义格式，过滤文件
                 file_paths = [f for f in file_paths if formaterHandler.match(f.name)]
 
+            # 未指定元数据时批量识别所有文件的元数据
+            file_metas = dict(zip(file_paths, MetaInfoPathBatch(file_paths))) if not meta else {}
+
             # 转移所有文件
             for file_path in file_paths:
                 # 回收站及隐藏的文件不处理
@@ -294,7 +297,7 @@ class TransferChain(ChainBase):
 
                 if not meta:
                     # 文件元数据
-                    file_meta = MetaInfoPath(file_path)
+                    file_meta = file_metas.get(file_path) or MetaInfoPath(file_path)
                 else:
                     file_meta = meta
 
@@ -91,6 +91,12 @@ class Settings(BaseSettings):
     SUBSCRIBE_RSS_INTERVAL: int = 30
     # 订阅搜索开关
     SUBSCRIBE_SEARCH: bool = False
+    # 订阅刷新时同时获取的站点数
+    SUBSCRIBE_REFRESH_THREADS: int = 10
+    # 订阅刷新时单个站点的最大并发获取数
+    SUBSCRIBE_REFRESH_SITE_THREADS: int = 1
+    # 订阅刷新时同时识别的种子数
+    SUBSCRIBE_RECOGNIZE_THREADS: int = 5
     # 用户认证站点
     AUTH_SITE: str = ""
     # 交互搜索自动下载用户ID，使用,分割
@@ -234,6 +240,12 @@ class Settings(BaseSettings):
     DOH_ENABLE: bool = True
     # 搜索多个名称
     SEARCH_MULTIPLE_NAME: bool = False
+    # 同时搜索的站点数（所有搜索共用）
+    SEARCH_THREADS: int = 20
+    # 单个站点的最大并发搜索数
+    SEARCH_SITE_THREADS: int = 2
+    # 搜索等待站点返回结果的超时时间（秒），超时后返回已完成站点的结果
+    SEARCH_TIMEOUT: int = 60
     # 订阅数据共享
     SUBSCRIBE_STATISTIC_SHARE: bool = True
     # 插件安装数据共享
@@ -320,7 +332,10 @@ class Settings(BaseSettings):
                 "torrents": 100,
                 "douban": 512,
                 "fanart": 512,
-                "meta": (self.META_CACHE_EXPIRE or 168) * 3600
+                "meta": (self.META_CACHE_EXPIRE or 168) * 3600,
+                "metainfo": 8192,
+                "tmdb_detail": 10000,
+                "image": 2048 * 1024 * 1024
             }
         return {
             "tmdb": 256,
@@ -328,7 +343,10 @@ class Settings(BaseSettings):
             "torrents": 50,
             "douban": 256,
             "fanart": 128,
-            "meta": (self.META_CACHE_EXPIRE or 72) * 3600
+            "meta": (self.META_CACHE_EXPIRE or 72) * 3600,
+            "metainfo": 2048,
+            "tmdb_detail": 2000,
+            "image": 512 * 1024 * 1024
         }
 
     @property
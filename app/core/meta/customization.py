@@ -11,11 +11,14 @@ class CustomizationMatcher(metaclass=Singleton):
     """
     customization = None
     custom_separator = None
+    # 已加载的自定义占位符版本号
+    _version = None
 
     def __init__(self):
         self.systemconfig = SystemConfigOper()
         self.customization = None
         self.custom_separator = None
+        self._version = None
 
     def match(self, title=None):
         """
@@ -24,6 +27,11 @@ class CustomizationMatcher(metaclass=Singleton):
         """
         if not title:
             return ""
+        # 自定义占位符变更后重新加载
+        version = self.systemconfig.version(SystemConfigKey.Customization)
+        if version != self._version:
+            self.customization = None
+            self._version = version
         if not self.customization:
             # 自定义占位符
             customization = self.systemconfig.get(SystemConfigKey.Customization)
@@ -17,6 +17,20 @@ class MetaAnime(MetaBase):
     """
     _anime_no_words = ['CHS&CHT', 'MP4', 'GB MP4', 'WEB-DL']
     _name_nostring_re = r"S\d{2}\s*-\s*S\d{2}|S\d{2}|\s+S\d{1,2}|EP?\d{2,4}\s*-\s*EP?\d{2,4}|EP?\d{2,4}|\s+EP?\d{1,4}|\s+GB"
+    # 预编译正则式
+    _name_nostring_pattern = re.compile(_name_nostring_re, re.IGNORECASE)
+    _bracket_name_pattern = re.compile(r'\[(.+?)]')
+    _resource_pix_split_pattern = re.compile(r'[Xx]')
+    _anime_words_pattern = re.compile(r"新番|月?番|[日美国][漫剧]")
+    _anime_words_prefix_pattern = re.compile(".*番.|.*[日美国][漫剧].")
+    _category_pattern = re.compile(r"[动漫画纪录片电影视连续剧集日美韩中港台海外亚洲华语大陆综艺原盘高清]{2,}"
+                                   r"|TV|Animation|Movie|Documentar|Anime", re.IGNORECASE)
+    _first_item_pattern = re.compile(r"^[^]]*]")
+    _size_pattern = re.compile(r'[0-9.]+\s*[MGT]i?B(?![A-Z]+)', re.IGNORECASE)
+    _tv_episode_pattern = re.compile(r"\[TV\s+(\d{1,4})", re.IGNORECASE)
+    _4k_pattern = re.compile(r'\[4k]', re.IGNORECASE)
+    _bracket_digit_pattern = re.compile(r"\[\d+")
+    _name_nochinese_pattern = re.compile(r'[\d|#:：\-()（）\u4e00-\u9fff]')
 
     def __init__(self, title: str, subtitle: str = None, isfile: bool = False):
         super().__init__(title, subtitle, isfile)
@@ -25,8 +39,6 @@ class MetaAnime(MetaBase):
         # 调用第三方模块识别动漫
         try:
             original_title = title
-            # 字幕组信息会被预处理掉
-            anitopy_info_origin = anitopy.parse(title)
             title = self.__prepare_title(title)
             anitopy_info = anitopy.parse(title)
             if anitopy_info:
@@ -37,7 +49,7 @@ class MetaAnime(MetaBase):
                     if anitopy_info:
                         name = anitopy_info.get("anime_title")
                 if not name or name in self._anime_no_words or (len(name) < 5 and not StringUtils.is_chinese(name)):
-                    name_match = re.search(r'\[(.+?)]', title)
+                    name_match = self._bracket_name_pattern.search(title)
                     if name_match and name_match.group(1):
                         name = name_match.group(1).strip()
                 # 拆份中英文名称
@@ -80,10 +92,10 @@ class MetaAnime(MetaBase):
                 if self.cn_name:
                     _, self.cn_name, _, _, _, _ = StringUtils.get_keyword(self.cn_name)
                     if self.cn_name:
-                        self.cn_name = re.sub(r'%s' % self._name_nostring_re, '', self.cn_name, flags=re.IGNORECASE).strip()
+                        self.cn_name = self._name_nostring_pattern.sub('', self.cn_name).strip()
                         self.cn_name = zhconv.convert(self.cn_name, "zh-hans")
                 if self.en_name:
-                    self.en_name = re.sub(r'%s' % self._name_nostring_re, '', self.en_name, flags=re.IGNORECASE).strip().title()
+                    self.en_name = self._name_nostring_pattern.sub('', self.en_name).strip().title()
                     self._name = StringUtils.str_title(self.en_name)
                 # 年份
                 year = anitopy_info.get("anime_year")
@@ -154,16 +166,16 @@ class MetaAnime(MetaBase):
                 if isinstance(self.resource_pix, list):
                     self.resource_pix = self.resource_pix[0]
                 if self.resource_pix:
-                    if re.search(r'x', self.resource_pix, re.IGNORECASE):
-                        self.resource_pix = re.split(r'[Xx]', self.resource_pix)[-1] + "p"
+                    if 'x' in self.resource_pix.lower():
+                        self.resource_pix = self._resource_pix_split_pattern.split(self.resource_pix)[-1] + "p"
                     else:
                         self.resource_pix = self.resource_pix.lower()
                     if str(self.resource_pix).isdigit():
                         self.resource_pix = str(self.resource_pix) + "p"
-                # 制作组/字幕组
+                # 制作组/字幕组，字幕组信息会被预处理掉，未匹配到时才按原始标题解析
                 self.resource_team = \
                     ReleaseGroupsMatcher().match(title=original_title) or \
-                    anitopy_info_origin.get("release_group") or None
+                    anitopy.parse(original_title).get("release_group") or None
                 # 自定义占位符
                 self.customization = CustomizationMatcher().match(title=original_title) or None
                 # 视频编码
@@ -183,8 +195,8 @@ class MetaAnime(MetaBase):
         except Exception as e:
             logger.error(f"解析动漫信息失败：{str(e)} - {traceback.format_exc()}")
 
-    @staticmethod
-    def __prepare_title(title: str):
+    @classmethod
+    def __prepare_title(cls, title: str):
         """
         对命名进行预处理
         """
@@ -193,23 +205,21 @@ class MetaAnime(MetaBase):
         # 所有【】换成[]
         title = title.replace("【", "[").replace("】", "]").strip()
         # 截掉xx番剧漫
-        match = re.search(r"新番|月?番|[日美国][漫剧]", title)
+        match = cls._anime_words_pattern.search(title)
         if match and match.span()[1] < len(title) - 1:
-            title = re.sub(".*番.|.*[日美国][漫剧].", "", title)
+            title = cls._anime_words_prefix_pattern.sub("", title)
         elif match:
             title = title[:title.rfind('[')]
         # 截掉分类
         first_item = title.split(']')[0]
-        if first_item and re.search(r"[动漫画纪录片电影视连续剧集日美韩中港台海外亚洲华语大陆综艺原盘高清]{2,}|TV|Animation|Movie|Documentar|Anime",
-                                    zhconv.convert(first_item, "zh-hans"),
-                                    re.IGNORECASE):
-            title = re.sub(r"^[^]]*]", "", title).strip()
+        if first_item and cls._category_pattern.search(zhconv.convert(first_item, "zh-hans")):
+            title = cls._first_item_pattern.sub("", title).strip()
         # 去掉大小
-        title = re.sub(r'[0-9.]+\s*[MGT]i?B(?![A-Z]+)', "", title, flags=re.IGNORECASE)
+        title = cls._size_pattern.sub("", title)
         # 将TVxx改为xx
-        title = re.sub(r"\[TV\s+(\d{1,4})", r"[\1", title, flags=re.IGNORECASE)
+        title = cls._tv_episode_pattern.sub(r"[\1", title)
         # 将4K转为2160p
-        title = re.sub(r'\[4k]', '2160p', title, flags=re.IGNORECASE)
+        title = cls._4k_pattern.sub('2160p', title)
         # 处理/分隔的中英文标题
         names = title.split("]")
         if len(names) > 1 and title.find("- ") == -1:
@@ -228,8 +238,8 @@ class MetaAnime(MetaBase):
                         titles.append("%s%s" % (left_char, name.split("/")[0].strip()))
                 elif name:
                     if StringUtils.is_chinese(name) and not StringUtils.is_all_chinese(name):
-                        if not re.search(r"\[\d+", name, re.IGNORECASE):
-                            name = re.sub(r'[\d|#:：\-()（）\u4e00-\u9fff]', '', name).strip()
+                        if not cls._bracket_digit_pattern.search(name):
+                            name = cls._name_nochinese_pattern.sub('', name).strip()
                         if not name or name.strip().isdigit():
                             continue
                     if name == '[':
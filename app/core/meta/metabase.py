@@ -73,6 +73,14 @@ class MetaBase(object):
     _subtitle_episode_re = r"(?<![全共]\s*)[第\s]+([0-9一二三四五六七八九十百零EP]+)\s*[集话話期幕](?!\s*[全共])"
     _subtitle_episode_between_re = r"[第]*\s*([0-9一二三四五六七八九十百零]+)\s*[集话話期幕]?\s*-\s*第*\s*([0-9一二三四五六七八九十百零]+)\s*[集话話期幕]"
     _subtitle_episode_all_re = r"([0-9一二三四五六七八九十百零]+)\s*集\s*全|[全共]\s*([0-9一二三四五六七八九十百零]+)\s*[集话話期幕]"
+    # 预编译正则式
+    _title_episodel_pattern = re.compile(_title_episodel_re, re.IGNORECASE)
+    _subtitle_keyword_pattern = re.compile(r'[全第季集话話期幕]', re.IGNORECASE)
+    _subtitle_season_pattern = re.compile(_subtitle_season_re, re.IGNORECASE)
+    _subtitle_season_all_pattern = re.compile(_subtitle_season_all_re, re.IGNORECASE)
+    _subtitle_episode_pattern = re.compile(_subtitle_episode_re, re.IGNORECASE)
+    _subtitle_episode_between_pattern = re.compile(_subtitle_episode_between_re, re.IGNORECASE)
+    _subtitle_episode_all_pattern = re.compile(_subtitle_episode_all_re, re.IGNORECASE)
 
     def __init__(self, title: str, subtitle: str = None, isfile: bool = False):
         if not title:
@@ -112,24 +120,23 @@ class MetaBase(object):
         if not title_text:
             return
         title_text = f" {title_text} "
-        if re.search(r"%s" % self._title_episodel_re, title_text, re.IGNORECASE):
-            episode_str = re.search(r'%s' % self._title_episodel_re, title_text, re.IGNORECASE)
-            if episode_str:
-                try:
-                    episode = int(episode_str.group(1))
-                except Exception as err:
-                    logger.debug(f'识别集失败：{str(err)} - {traceback.format_exc()}')
-                    return
-                if episode >= 10000:
-                    return
-                if self.begin_episode is None:
-                    self.begin_episode = episode
-                    self.total_episode = 1
-                self.type = MediaType.TV
-                self._subtitle_flag = True
-        elif re.search(r'[全第季集话話期幕]', title_text, re.IGNORECASE):
+        episode_str = self._title_episodel_pattern.search(title_text)
+        if episode_str:
+            try:
+                episode = int(episode_str.group(1))
+            except Exception as err:
+                logger.debug(f'识别集失败：{str(err)} - {traceback.format_exc()}')
+                return
+            if episode >= 10000:
+                return
+            if self.begin_episode is None:
+                self.begin_episode = episode
+                self.total_episode = 1
+            self.type = MediaType.TV
+            self._subtitle_flag = True
+        elif self._subtitle_keyword_pattern.search(title_text):
             # 全x季 x季全
-            season_all_str = re.search(r"%s" % self._subtitle_season_all_re, title_text, re.IGNORECASE)
+            season_all_str = self._subtitle_season_all_pattern.search(title_text)
             if season_all_str:
                 season_all = season_all_str.group(1)
                 if not season_all:
@@ -146,7 +153,7 @@ class MetaBase(object):
                     self._subtitle_flag = True
                 return
             # 第x季
-            season_str = re.search(r'%s' % self._subtitle_season_re, title_text, re.IGNORECASE)
+            season_str = self._subtitle_season_pattern.search(title_text)
             if season_str:
                 seasons = season_str.group(1)
                 if seasons:
@@ -181,7 +188,7 @@ class MetaBase(object):
                 self.type = MediaType.TV
                 self._subtitle_flag = True
             # 第x-x集 第x集-x集
-            episode_between_str = re.search(r'%s' % self._subtitle_episode_between_re, title_text, re.IGNORECASE)
+            episode_between_str = self._subtitle_episode_between_pattern.search(title_text)
             if episode_between_str:
                 episodes = episode_between_str.groups()
                 if episodes:
@@ -212,7 +219,7 @@ class MetaBase(object):
                 self._subtitle_flag = True
                 return
             # 第x集
-            episode_str = re.search(r'%s' % self._subtitle_episode_re, title_text, re.IGNORECASE)
+            episode_str = self._subtitle_episode_pattern.search(title_text)
             if episode_str:
                 episodes = episode_str.group(1)
                 if episodes:
@@ -248,7 +255,7 @@ class MetaBase(object):
                 self._subtitle_flag = True
                 return
             # x集全
-            episode_all_str = re.search(r'%s' % self._subtitle_episode_all_re, title_text, re.IGNORECASE)
+            episode_all_str = self._subtitle_episode_all_pattern.search(title_text)
             if episode_all_str:
                 episode_all = episode_all_str.group(1)
                 if not episode_all:
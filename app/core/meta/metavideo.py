@@ -52,6 +52,39 @@ class MetaVideo(MetaBase):
     _resources_pix_re2 = r"(^[248]+K)"
     _video_encode_re = r"^[HX]26[45]$|^AVC$|^HEVC$|^VC\d?$|^MPEG\d?$|^Xvid$|^DivX$|^HDR\d*$"
     _audio_encode_re = r"^DTS\d?$|^DTSHD$|^DTSHDMA$|^Atmos$|^TrueHD\d?$|^AC3$|^\dAudios?$|^DDP\d?$|^DD\d?$|^LPCM\d?$|^AAC\d?$|^FLAC\d?$|^HD\d?$|^MA\d?$"
+    # 预编译正则式
+    _season_full_pattern = re.compile(r"^Season\s+(\d{1,3})$|^S(\d{1,3})$")
+    _name_no_begin_pattern = re.compile(_name_no_begin_re)
+    _year_range_pattern = re.compile(r'([\s.]+)(\d{4})-(\d{4})')
+    _size_pattern = re.compile(r'[0-9.]+\s*[MGT]i?B(?![A-Z]+)', re.IGNORECASE)
+    _date_pattern = re.compile(r'\d{4}[\s._-]\d{1,2}[\s._-]\d{1,2}')
+    _diy_pattern = re.compile(r'D[Ii]Y')
+    _diy_title_pattern = re.compile(r'-D[Ii]Y@')
+    _description_split_pattern = re.compile(r'[\s/|]+')
+    _name_nostring_pattern = re.compile(_name_nostring_re, re.IGNORECASE)
+    _spaces_pattern = re.compile(r'\s+')
+    _name_movie_words_pattern = re.compile("%s" % _name_movie_words, re.IGNORECASE)
+    _name_no_chinese_pattern = re.compile(_name_no_chinese_re, re.IGNORECASE)
+    _name_se_words_pattern = re.compile("%s" % _name_se_words, re.IGNORECASE)
+    _season_suffix_pattern = re.compile(r"SEASON$", re.IGNORECASE)
+    _roman_numerals_pattern = re.compile(_roman_numerals)
+    _season_pattern = re.compile(_season_re, re.IGNORECASE)
+    _episode_pattern = re.compile(_episode_re, re.IGNORECASE)
+    _part_pattern = re.compile(_part_re, re.IGNORECASE)
+    _resources_type_pattern = re.compile(r"(%s)" % _resources_type_re, re.IGNORECASE)
+    _resources_pix_pattern = re.compile(_resources_pix_re, re.IGNORECASE)
+    _resources_pix_pattern2 = re.compile(_resources_pix_re2, re.IGNORECASE)
+    _source_pattern = re.compile(r"(%s)" % _source_re, re.IGNORECASE)
+    _effect_pattern = re.compile(r"(%s)" % _effect_re, re.IGNORECASE)
+    _video_encode_pattern = re.compile(r"(%s)" % _video_encode_re, re.IGNORECASE)
+    _audio_encode_pattern = re.compile(r"(%s)" % _audio_encode_re, re.IGNORECASE)
+    # 以上逐个token识别的正则式合并为一个，token不匹配时跳过各项识别中的正则匹配
+    _token_pattern = re.compile("|".join("(?:%s)" % _re for _re in (
+        _part_re, _roman_numerals, _season_re, _episode_re, _resources_type_re,
+        _resources_pix_re, _resources_pix_re2, _video_encode_re, _audio_encode_re
+    )), re.IGNORECASE)
+    # 当前token是否可能被正则式匹配
+    _token_matched = False
 
     def __init__(self, title: str, subtitle: str = None, isfile: bool = False):
         """
@@ -74,7 +107,7 @@ class MetaVideo(MetaBase):
             self.type = MediaType.TV
             return
         # 全名为Season xx 及 Sxx 直接返回
-        season_full_res = re.search(r"^Season\s+(\d{1,3})$|^S(\d{1,3})$", title)
+        season_full_res = self._season_full_pattern.search(title)
         if season_full_res:
             self.type = MediaType.TV
             season = season_full_res.group(1)
@@ -83,19 +116,21 @@ class MetaVideo(MetaBase):
                 self.total_season = 1
             return
         # 去掉名称中第1个[]的内容
-        title = re.sub(r'%s' % self._name_no_begin_re, "", title, count=1)
+        title = self._name_no_begin_pattern.sub("", title, count=1)
         # 把xxxx-xxxx年份换成前一个年份，常出现在季集上
-        title = re.sub(r'([\s.]+)(\d{4})-(\d{4})', r'\1\2', title)
+        title = self._year_range_pattern.sub(r'\1\2', title)
         # 把大小去掉
-        title = re.sub(r'[0-9.]+\s*[MGT]i?B(?![A-Z]+)', "", title, flags=re.IGNORECASE)
+        title = self._size_pattern.sub("", title)
         # 把年月日去掉
-        title = re.sub(r'\d{4}[\s._-]\d{1,2}[\s._-]\d{1,2}', "", title)
+        title = self._date_pattern.sub("", title)
         # 拆分tokens
         tokens = Tokens(title)
         self.tokens = tokens
         # 解析名称、年份、季、集、资源类型、分辨率等
         token = tokens.get_next()
         while token:
+            # 一次合并匹配判断token是否可能是季、集、分辨率、编码等
+            self._token_matched = self._token_pattern.search(token) is not None
             # Part
             self.__init_part(token)
             # 标题
@@ -133,8 +168,8 @@ class MetaVideo(MetaBase):
             self.resource_type = self._source.strip()
         # 提取原盘DIY
         if self.resource_type and "BluRay" in self.resource_type:
-            if (self.subtitle and re.findall(r'D[Ii]Y', self.subtitle)) \
-                    or re.findall(r'-D[Ii]Y@', original_title):
+            if (self.subtitle and self._diy_pattern.search(self.subtitle)) \
+                    or self._diy_title_pattern.search(original_title):
                 self.resource_type = f"{self.resource_type} DIY"
         # 解析副标题，只要季和集
         self.init_subtitle(self.org_string)
@@ -159,14 +194,14 @@ class MetaVideo(MetaBase):
         # 自定义占位符
         self.customization = CustomizationMatcher().match(title=original_title) or None
 
-    @staticmethod
-    def __get_title_from_description(description: str) -> Optional[str]:
+    @classmethod
+    def __get_title_from_description(cls, description: str) -> Optional[str]:
         """
         从描述中提取标题
         """
         if not description:
             return None
-        titles = re.split(r'[\s/|]+', description)
+        titles = cls._description_split_pattern.split(description)
         if StringUtils.is_chinese(titles[0]):
             return titles[0]
         return None
@@ -189,9 +224,8 @@ class MetaVideo(MetaBase):
         """
         if not name:
             return name
-        name = re.sub(r'%s' % self._name_nostring_re, '', name,
-                      flags=re.IGNORECASE).strip()
-        name = re.sub(r'\s+', ' ', name)
+        name = self._name_nostring_pattern.sub('', name).strip()
+        name = self._spaces_pattern.sub(' ', name)
         if name.isdigit() \
                 and int(name) < 1800 \
                 and not self.year \
@@ -237,13 +271,13 @@ class MetaVideo(MetaBase):
             if not self.cn_name:
                 self.cn_name = token
             elif not self._stop_cnname_flag:
-                if re.search("%s" % self._name_movie_words, token, flags=re.IGNORECASE) \
-                        or (not re.search("%s" % self._name_no_chinese_re, token, flags=re.IGNORECASE)
-                            and not re.search("%s" % self._name_se_words, token, flags=re.IGNORECASE)):
+                if self._name_movie_words_pattern.search(token) \
+                        or (not self._name_no_chinese_pattern.search(token)
+                            and not self._name_se_words_pattern.search(token)):
                     self.cn_name = "%s %s" % (self.cn_name, token)
                 self._stop_cnname_flag = True
         else:
-            is_roman_digit = re.search(self._roman_numerals, token)
+            is_roman_digit = self._token_matched and self._roman_numerals_pattern.search(token)
             # 阿拉伯数字或者罗马数字
             if token.isdigit() or is_roman_digit:
                 # 第季集后面的不要
@@ -279,16 +313,17 @@ class MetaVideo(MetaBase):
                     # 名字未出现前的第一个数字，记下来
                     if not self._unknown_name_str:
                         self._unknown_name_str = token
-            elif re.search(r"%s" % self._season_re, token, re.IGNORECASE):
+            elif self._token_matched and self._season_pattern.search(token):
                 # 季的处理
-                if self.en_name and re.search(r"SEASON$", self.en_name, re.IGNORECASE):
+                if self.en_name and self._season_suffix_pattern.search(self.en_name):
                     # 如果匹配到季，英文名结尾为Season，说明Season属于标题，不应在后续作为干扰词去除
                     self.en_name += ' '
                 self._stop_name_flag = True
                 return
-            elif re.search(r"%s" % self._episode_re, token, re.IGNORECASE) \
-                    or re.search(r"(%s)" % self._resources_type_re, token, re.IGNORECASE) \
-                    or re.search(r"%s" % self._resources_pix_re, token, re.IGNORECASE):
+            elif self._token_matched \
+                    and (self._episode_pattern.search(token)
+                         or self._resources_type_pattern.search(token)
+                         or self._resources_pix_pattern.search(token)):
                 # 集、来源、版本等不要
                 self._stop_name_flag = True
                 return
@@ -315,7 +350,7 @@ class MetaVideo(MetaBase):
                 and not self.resource_pix \
                 and not self.resource_type:
             return
-        re_res = re.search(r"%s" % self._part_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._part_pattern.search(token)
         if re_res:
             if not self.part:
                 self.part = re_res.group(1)
@@ -346,7 +381,7 @@ class MetaVideo(MetaBase):
                 self.en_name = "%s %s" % (self.en_name.strip(), self.year)
             elif self.cn_name:
                 self.cn_name = "%s %s" % (self.cn_name, self.year)
-        elif self.en_name and re.search(r"SEASON$", self.en_name, re.IGNORECASE):
+        elif self.en_name and self._season_suffix_pattern.search(self.en_name):
             # 如果匹配到年，且英文名结尾为Season，说明Season属于标题，不应在后续作为干扰词去除
             self.en_name += ' '
         self.year = token
@@ -360,7 +395,7 @@ class MetaVideo(MetaBase):
         """
         if not self.name:
             return
-        re_res = re.findall(r"%s" % self._resources_pix_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._resources_pix_pattern.findall(token)
         if re_res:
             self._last_token_type = "pix"
             self._continue_flag = False
@@ -385,7 +420,7 @@ class MetaVideo(MetaBase):
                     and self.resource_pix[-1] not in 'kpi':
                 self.resource_pix = "%sp" % self.resource_pix
         else:
-            re_res = re.search(r"%s" % self._resources_pix_re2, token, re.IGNORECASE)
+            re_res = self._token_matched and self._resources_pix_pattern2.search(token)
             if re_res:
                 self._last_token_type = "pix"
                 self._continue_flag = False
@@ -397,7 +432,7 @@ class MetaVideo(MetaBase):
         """
         识别季
         """
-        re_res = re.findall(r"%s" % self._season_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._season_pattern.findall(token)
         if re_res:
             self._last_token_type = "season"
             self.type = MediaType.TV
@@ -449,7 +484,7 @@ class MetaVideo(MetaBase):
         """
         识别集
         """
-        re_res = re.findall(r"%s" % self._episode_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._episode_pattern.findall(token)
         if re_res:
             self._last_token_type = "episode"
             self._continue_flag = False
@@ -524,7 +559,7 @@ class MetaVideo(MetaBase):
         """
         if not self.name:
             return
-        source_res = re.search(r"(%s)" % self._source_re, token, re.IGNORECASE)
+        source_res = self._token_matched and self._source_pattern.search(token)
         if source_res:
             self._last_token_type = "source"
             self._continue_flag = False
@@ -549,7 +584,7 @@ class MetaVideo(MetaBase):
             self._source = "WEB-DL"
             self._continue_flag = False
             return
-        effect_res = re.search(r"(%s)" % self._effect_re, token, re.IGNORECASE)
+        effect_res = self._token_matched and self._effect_pattern.search(token)
         if effect_res:
             self._last_token_type = "effect"
             self._continue_flag = False
@@ -571,7 +606,7 @@ class MetaVideo(MetaBase):
                 and not self.begin_season \
                 and not self.begin_episode:
             return
-        re_res = re.search(r"(%s)" % self._video_encode_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._video_encode_pattern.search(token)
         if re_res:
             self._continue_flag = False
             self._stop_name_flag = True
@@ -614,7 +649,7 @@ class MetaVideo(MetaBase):
                 and not self.begin_season \
                 and not self.begin_episode:
             return
-        re_res = re.search(r"(%s)" % self._audio_encode_re, token, re.IGNORECASE)
+        re_res = self._token_matched and self._audio_encode_pattern.search(token)
         if re_res:
             self._continue_flag = False
             self._stop_name_flag = True
@@ -1,15 +1,137 @@
+import threading
+from functools import lru_cache
+from typing import List, Dict, Tuple, Optional
+
 import regex as re
 
 from app.db.systemconfig_oper import SystemConfigOper
+from app.log import logger
 from app.schemas.types import SystemConfigKey
 from app.utils.singleton import Singleton
 
+# 索引的制作组开头字面量最大长度
+_PREFIX_MAX_LENGTH = 8
+# 制作组数量达到该值时才使用预过滤，数量较少时直接匹配完整正则更快
+_PREFILTER_MIN_GROUPS = 300
+# 制作组可能的开始位置
+_GROUP_START_RE = re.compile(r"(?<=[-@\[￡【&])")
+# 制作组正则
+_GROUP_PATTERN = r"(?<=[-@\[￡【&])(?:%s)(?=[@.\s\]\[】&])"
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    提取正则表达式开头必定出现的字面量，已忽略大小写，无法确定时返回空字符串
+    """
+    if re.search(r'\(\?[a-zA-Z^-]', pattern):
+        return ""
+    # 顶层含分支时没有确定的开头
+    depth, i, length = 0, 0, len(pattern)
+    while i < length:
+        char = pattern[i]
+        if char == "\\":
+            i += 1
+        elif char == "[":
+            i += 1
+            if i < length and pattern[i] == "^":
+                i += 1
+            if i < length and pattern[i] == "]":
+                i += 1
+            while i < length and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return ""
+        i += 1
+    prefix, i = "", 0
+    while i < length:
+        char = pattern[i]
+        if char == "\\" and i + 1 < length and not pattern[i + 1].isalnum():
+            char = pattern[i + 1]
+            i += 2
+        elif char in "\\()[]{}.^$|*+?":
+            if char in "*?+{":
+                # 量词作用于前一个字符，该字符不一定出现
+                prefix = prefix[:-1]
+            break
+        else:
+            i += 1
+        folded = char.casefold()
+        if len(folded) != 1:
+            break
+        prefix += folded
+    return prefix
+
+
+class _GroupsPattern:
+    """
+    编译后的制作组正则，制作组较多时按开头字面量建立索引，
+    只用标题中分隔符后可能匹配的制作组组成正则，结果与完整正则一致
+    """
+
+    def __init__(self, groups: List[str]):
+        self.groups = groups
+        # 完整正则，制作组较少时使用
+        self.__pattern: Optional[re.Pattern] = None
+        # 按开头字面量索引的制作组序号
+        self.__index: Dict[str, List[int]] = {}
+        # 索引中的字面量长度，从短到长
+        self.__lengths: List[int] = []
+        # 开头不确定的制作组序号
+        self.__wildcard: List[int] = []
+        # 已编译的候选制作组正则
+        self.__compiled: Dict[Tuple[int, ...], re.Pattern] = {}
+        if len(groups) < _PREFILTER_MIN_GROUPS:
+            self.__pattern = re.compile(_GROUP_PATTERN % "|".join(groups), re.I)
+            return
+        for index, group in enumerate(groups):
+            prefix = _literal_prefix(group)[:_PREFIX_MAX_LENGTH]
+            if prefix:
+                self.__index.setdefault(prefix, []).append(index)
+            else:
+                self.__wildcard.append(index)
+        self.__lengths = sorted({len(prefix) for prefix in self.__index})
+
+    def findall(self, title: str) -> List[str]:
+        """
+        查找标题中的全部制作组
+        """
+        if self.__pattern:
+            return self.__pattern.findall(title)
+        candidates = set(self.__wildcard)
+        for match in _GROUP_START_RE.finditer(title):
+            pos = match.start()
+            for length in self.__lengths:
+                if pos + length > len(title):
+                    break
+                indexes = self.__index.get(title[pos:pos + length].casefold())
+                if indexes:
+                    candidates.update(indexes)
+        if not candidates:
+            return []
+        return self.__compile(tuple(sorted(candidates))).findall(title)
+
+    def __compile(self, indexes: Tuple[int, ...]) -> re.Pattern:
+        """
+        编译候选制作组的正则，保持原有顺序
+        """
+        pattern = self.__compiled.get(indexes)
+        if not pattern:
+            if len(self.__compiled) >= 1024:
+                self.__compiled.clear()
+            pattern = re.compile(_GROUP_PATTERN % "|".join(self.groups[index] for index in indexes), re.I)
+            self.__compiled[indexes] = pattern
+        return pattern
+
 
 class ReleaseGroupsMatcher(metaclass=Singleton):
     """
     识别制作组、字幕组
     """
-    __release_groups: str = None
+    __release_groups: List[str] = None
     # 内置组
     RELEASE_GROUPS: dict = {
         "0ff": ['FF(?:(?:A|WE)B|CD|E(?:DU|B)|TV)'],
@@ -76,11 +198,14 @@ class ReleaseGroupsMatcher(metaclass=Singleton):
 
     def __init__(self):
         self.systemconfig = SystemConfigOper()
+        self._lock = threading.Lock()
         release_groups = []
         for site_groups in self.RELEASE_GROUPS.values():
             for release_group in site_groups:
                 release_groups.append(release_group)
-        self.__release_groups = '|'.join(release_groups)
+        self.__release_groups = release_groups
+        # 编译后的制作组正则及对应的自定义组设置版本号
+        self._pattern: Tuple[Optional[int], Optional[_GroupsPattern]] = (None, None)
 
     def match(self, title: str = None, groups: str = None):
         """
@@ -90,19 +215,47 @@ class ReleaseGroupsMatcher(metaclass=Singleton):
         """
         if not title:
             return ""
-        if not groups:
-            # 自定义组
-            custom_release_groups = self.systemconfig.get(SystemConfigKey.CustomReleaseGroups)
-            if custom_release_groups:
-                custom_release_groups_str = '|'.join(custom_release_groups)
-                groups = f"{self.__release_groups}|{custom_release_groups_str}"
-            else:
-                groups = self.__release_groups
         title = f"{title} "
-        groups_re = re.compile(r"(?<=[-@\[￡【&])(?:%s)(?=[@.\s\]\[】&])" % groups, re.I)
+        if groups:
+            matches = self.__compile_groups(groups).findall(title)
+        else:
+            matches = self.__get_pattern().findall(title)
         # 处理一个制作组识别多次的情况，保留顺序
         unique_groups = []
-        for item in re.findall(groups_re, title):
+        for item in matches:
             if item not in unique_groups:
                 unique_groups.append(item)
         return "@".join(unique_groups)
+
+    def __get_pattern(self) -> _GroupsPattern:
+        """
+        获取内置组及自定义组编译后的正则，自定义组变更后重新编译
+        """
+        version = self.systemconfig.version(SystemConfigKey.CustomReleaseGroups)
+        pattern_version, pattern = self._pattern
+        if pattern_version == version:
+            return pattern
+        with self._lock:
+            pattern_version, pattern = self._pattern
+            if pattern_version != version:
+                release_groups = list(self.__release_groups)
+                for custom_group in self.systemconfig.get(SystemConfigKey.CustomReleaseGroups) or []:
+                    if not custom_group:
+                        continue
+                    try:
+                        re.compile(custom_group)
+                    except Exception as err:
+                        logger.warn(f"自定义制作组 {custom_group} 不是有效的正则表达式：{str(err)}")
+                        continue
+                    release_groups.append(custom_group)
+                pattern = _GroupsPattern(release_groups)
+                self._pattern = (version, pattern)
+            return pattern
+
+    @staticmethod
+    @lru_cache(maxsize=128)
+    def __compile_groups(groups: str) -> re.Pattern:
+        """
+        编译指定的制作组正则
+        """
+        return re.compile(_GROUP_PATTERN % groups, re.I)
@@ -1,4 +1,6 @@
-from typing import List, Tuple
+import threading
+from abc import ABCMeta, abstractmethod
+from typing import List, Tuple, Optional
 
 import cn2an
 import regex as re
@@ -9,98 +11,167 @@ from app.schemas.types import SystemConfigKey
 from app.utils.singleton import Singleton
 
 
-class WordsMatcher(metaclass=Singleton):
+def _literal_anchor(pattern: str) -> Optional[str]:
+    """
+    提取正则表达式匹配时必定出现的最长字面量，标题中不包含该字面量时正则必定不匹配
+    无法确定时返回None，不做预过滤
+    """
+    if not pattern or re.search(r'\(\?[a-zA-Z^-]', pattern):
+        # 含内联标志（如忽略大小写）时字面量不可靠
+        return None
+    runs, run = [], ""
+    depth, i, length = 0, 0, len(pattern)
+    while i < length:
+        char = pattern[i]
+        if char == "\\" and i + 1 < length:
+            start, escaped = i, pattern[i + 1]
+            i += 2
+            if depth == 0 and not escaped.isalnum() and escaped not in " \t":
+                run += escaped
+                continue
+            # 字母数字转义是字符类、编码转义或反向引用，跳过其参数
+            if escaped in "xuU" and i < length and pattern[i] != "{":
+                i += {"x": 2, "u": 4, "U": 8}[escaped]
+            elif escaped.isdigit():
+                while i < length and pattern[i].isdigit() and i - start < 4:
+                    i += 1
+            elif i < length and (escaped in "xuUNpP" and pattern[i] == "{" or escaped == "g" and pattern[i] == "<"):
+                i = pattern.find("}" if pattern[i] == "{" else ">", i) + 1 or length
+        elif char == "[":
+            # 跳过字符集
+            i += 1
+            if i < length and pattern[i] == "^":
+                i += 1
+            if i < length and pattern[i] == "]":
+                i += 1
+            while i < length and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif char == "(":
+            depth += 1
+            i += 1
+        elif char == ")":
+            depth -= 1
+            i += 1
+        elif char == "|":
+            if depth == 0:
+                # 顶层分支，没有必定出现的字面量
+                return None
+            i += 1
+        elif char in "*?+{":
+            # 量词作用于前一个字符，该字符不一定出现
+            run = run[:-1]
+            if char == "{":
+                i = pattern.find("}", i) + 1 or length
+            else:
+                i += 1
+        elif char in ".^$":
+            i += 1
+        else:
+            i += 1
+            if depth == 0:
+                run += char
+                continue
+        runs.append(run)
+        run = ""
+    runs.append(run)
+    return max(runs, key=len) or None
 
-    def __init__(self):
-        self.systemconfig = SystemConfigOper()
 
-    def prepare(self, title: str) -> Tuple[str, List[str]]:
+class _WordRule(metaclass=ABCMeta):
+    """
+    自定义识别词规则
+    """
+
+    def __init__(self, word: str):
+        self.word = word
+        # 标题中必须包含的字面量，任一不包含时规则不会生效
+        self.anchors: List[str] = []
+
+    def possible(self, title: str) -> bool:
         """
-        预处理标题，支持三种格式
-        1：屏蔽词
-        2：被替换词 => 替换词
-        3：前定位词 <> 后定位词 >> 偏移量（EP）
+        预过滤，判断规则是否可能生效
         """
-        appley_words = []
-        # 读取自定义识别词
-        words: List[str] = self.systemconfig.get(SystemConfigKey.CustomIdentifiers) or []
-        for word in words:
-            if not word or word.startswith("#"):
-                continue
-            try:
-                if word.count(" => ") and word.count(" && ") and word.count(" >> ") and word.count(" <> "):
-                    # 替换词
-                    thc = str(re.findall(r'(.*?)\s*=>', word)[0]).strip()
-                    # 被替换词
-                    bthc = str(re.findall(r'=>\s*(.*?)\s*&&', word)[0]).strip()
-                    # 集偏移前字段
-                    pyq = str(re.findall(r'&&\s*(.*?)\s*<>', word)[0]).strip()
-                    # 集偏移后字段
-                    pyh = str(re.findall(r'<>(.*?)\s*>>', word)[0]).strip()
-                    # 集偏移
-                    offsets = str(re.findall(r'>>\s*(.*?)$', word)[0]).strip()
-                    # 替换词
-                    title, message, state = self.__replace_regex(title, thc, bthc)
-                    if state:
-                        # 替换词成功再进行集偏移
-                        title, message, state = self.__episode_offset(title, pyq, pyh, offsets)
-                elif word.count(" => "):
-                    # 替换词
-                    strings = word.split(" => ")
-                    title, message, state = self.__replace_regex(title, strings[0], strings[1])
-                elif word.count(" >> ") and word.count(" <> "):
-                    # 集偏移
-                    strings = word.split(" <> ")
-                    offsets = strings[1].split(" >> ")
-                    strings[1] = offsets[0]
-                    title, message, state = self.__episode_offset(title, strings[0], strings[1], offsets[1])
-                else:
-                    # 屏蔽词
-                    if not word.strip():
-                        continue
-                    title, message, state = self.__replace_regex(title, word, "")
+        for anchor in self.anchors:
+            if anchor not in title:
+                return False
+        return True
 
-                if state:
-                    appley_words.append(word)
+    @abstractmethod
+    def apply(self, title: str) -> Tuple[str, bool]:
+        """
+        应用规则
+        :return: 处理后的标题、是否生效
+        """
+        pass
 
-            except Exception as err:
-                logger.warn(f"自定义识别词 {word} 预处理标题失败：{str(err)} - 标题：{title}")
 
-        return title, appley_words
+class _ReplaceRule(_WordRule):
+    """
+    替换词：被替换词 => 替换词
+    """
 
-    @staticmethod
-    def __replace_regex(title: str, replaced: str, replace: str) -> Tuple[str, str, bool]:
-        """
-        正则替换
-        """
+    def __init__(self, word: str, replaced: str, replace: str):
+        super().__init__(word)
+        self.replaced = replaced
+        self.replace = replace
+        self.pattern = re.compile(r'%s' % replaced)
+        anchor = _literal_anchor(replaced)
+        if anchor:
+            self.anchors.append(anchor)
+
+    def apply(self, title: str) -> Tuple[str, bool]:
         try:
-            if not re.findall(r'%s' % replaced, title):
-                return title, "", False
-            else:
-                return re.sub(r'%s' % replaced, r'%s' % replace, title), "", True
+            if not self.pattern.search(title):
+                return title, False
+            return self.pattern.sub(r'%s' % self.replace, title), True
         except Exception as err:
-            logger.warn(f"自定义识别词正则替换失败：{str(err)} - 标题：{title}，被替换词：{replaced}，替换词：{replace}")
-            return title, str(err), False
+            logger.warn(f"自定义识别词正则替换失败：{str(err)} - 标题：{title}，"
+                        f"被替换词：{self.replaced}，替换词：{self.replace}")
+            return title, False
 
-    @staticmethod
-    def __episode_offset(title: str, front: str, back: str, offset: str) -> Tuple[str, str, bool]:
-        """
-        集数偏移
-        """
+
+class _BlockRule(_ReplaceRule):
+    """
+    屏蔽词
+    """
+
+    def __init__(self, word: str):
+        super().__init__(word, word, "")
+
+
+class _OffsetRule(_WordRule):
+    """
+    集偏移：前定位词 <> 后定位词 >> 偏移量（EP）
+    """
+
+    def __init__(self, word: str, front: str, back: str, offset: str):
+        super().__init__(word)
+        self.front = front
+        self.back = back
+        self.offset = offset
+        self.front_pattern = re.compile(r'%s' % front) if front else None
+        self.back_pattern = re.compile(r'%s' % back) if back else None
+        self.episode_pattern = re.compile(r'(?<=%s.*?)[0-9一二三四五六七八九十]+(?=.*?%s)' % (front, back))
+        for part in (front, back):
+            anchor = _literal_anchor(part)
+            if anchor:
+                self.anchors.append(anchor)
+
+    def apply(self, title: str) -> Tuple[str, bool]:
         try:
-            if back and not re.findall(r'%s' % back, title):
-                return title, "", False
-            if front and not re.findall(r'%s' % front, title):
-                return title, "", False
-            offset_word_info_re = re.compile(r'(?<=%s.*?)[0-9一二三四五六七八九十]+(?=.*?%s)' % (front, back))
-            episode_nums_str = re.findall(offset_word_info_re, title)
+            if self.back_pattern and not self.back_pattern.search(title):
+                return title, False
+            if self.front_pattern and not self.front_pattern.search(title):
+                return title, False
+            episode_nums_str = self.episode_pattern.findall(title)
             if not episode_nums_str:
-                return title, "", False
+                return title, False
             episode_nums_offset_str = []
             offset_order_flag = False
             for episode_num_str in episode_nums_str:
                 episode_num_int = int(cn2an.cn2an(episode_num_str, "smart"))
-                offset_caculate = offset.replace("EP", str(episode_num_int))
+                offset_caculate = self.offset.replace("EP", str(episode_num_int))
                 episode_num_offset_int = int(eval(offset_caculate))
                 # 向前偏移
                 if episode_num_int > episode_num_offset_int:
@@ -127,9 +198,115 @@ class WordsMatcher(metaclass=Singleton):
                 episode_nums_list = sorted(episode_nums_dict.items(), key=lambda x: x[1], reverse=True)
             for episode_num in episode_nums_list:
                 episode_offset_re = re.compile(
-                    r'(?<=%s.*?)%s(?=.*?%s)' % (front, episode_num[0], back))
+                    r'(?<=%s.*?)%s(?=.*?%s)' % (self.front, episode_num[0], self.back))
                 title = re.sub(episode_offset_re, r'%s' % episode_num[1], title)
-            return title, "", True
+            return title, True
+        except Exception as err:
+            logger.warn(f"自定义识别词集数偏移失败：{str(err)} - 标题：{title}，前定位词：{self.front}，"
+                        f"后定位词：{self.back}，偏移量：{self.offset}")
+            return title, False
+
+
+class _ReplaceOffsetRule(_WordRule):
+    """
+    替换词并集偏移：被替换词 => 替换词 && 前定位词 <> 后定位词 >> 偏移量（EP）
+    """
+
+    def __init__(self, word: str, replace_rule: _ReplaceRule, offset_rule: Optional[_OffsetRule]):
+        super().__init__(word)
+        self.replace_rule = replace_rule
+        # 集偏移编译失败时只替换，不计为生效
+        self.offset_rule = offset_rule
+        self.anchors = replace_rule.anchors
+
+    def apply(self, title: str) -> Tuple[str, bool]:
+        title, state = self.replace_rule.apply(title)
+        if not state:
+            return title, False
+        if not self.offset_rule:
+            return title, False
+        # 替换词成功再进行集偏移
+        return self.offset_rule.apply(title)
+
+
+class WordsMatcher(metaclass=Singleton):
+
+    def __init__(self):
+        self.systemconfig = SystemConfigOper()
+        self._lock = threading.Lock()
+        # 已编译的识别词规则及对应的设置版本号
+        self._rules: Tuple[Optional[int], List[_WordRule]] = (None, [])
+
+    def prepare(self, title: str) -> Tuple[str, List[str]]:
+        """
+        预处理标题，支持三种格式
+        1：屏蔽词
+        2：被替换词 => 替换词
+        3：前定位词 <> 后定位词 >> 偏移量（EP）
+        """
+        appley_words = []
+        for rule in self.__get_rules():
+            if not rule.possible(title):
+                continue
+            title, state = rule.apply(title)
+            if state:
+                appley_words.append(rule.word)
+        return title, appley_words
+
+    def __get_rules(self) -> List[_WordRule]:
+        """
+        获取编译后的识别词规则，自定义识别词变更后重新编译
+        """
+        version = self.systemconfig.version(SystemConfigKey.CustomIdentifiers)
+        rules_version, rules = self._rules
+        if rules_version == version:
+            return rules
+        with self._lock:
+            rules_version, rules = self._rules
+            if rules_version != version:
+                words: List[str] = self.systemconfig.get(SystemConfigKey.CustomIdentifiers) or []
+                rules = [rule for rule in map(self.__compile, words) if rule]
+                self._rules = (version, rules)
+            return rules
+
+    @staticmethod
+    def __compile(word: str) -> Optional[_WordRule]:
+        """
+        解析并编译一条识别词，编译失败时返回None
+        """
+        if not word or word.startswith("#"):
+            return None
+        try:
+            if word.count(" => ") and word.count(" && ") and word.count(" >> ") and word.count(" <> "):
+                # 被替换词
+                thc = str(re.findall(r'(.*?)\s*=>', word)[0]).strip()
+                # 替换词
+                bthc = str(re.findall(r'=>\s*(.*?)\s*&&', word)[0]).strip()
+                # 集偏移前字段
+                pyq = str(re.findall(r'&&\s*(.*?)\s*<>', word)[0]).strip()
+                # 集偏移后字段
+                pyh = str(re.findall(r'<>(.*?)\s*>>', word)[0]).strip()
+                # 集偏移
+                offsets = str(re.findall(r'>>\s*(.*?)$', word)[0]).strip()
+                replace_rule = _ReplaceRule(word, thc, bthc)
+                try:
+                    offset_rule = _OffsetRule(word, pyq, pyh, offsets)
+                except Exception as err:
+                    logger.warn(f"自定义识别词 {word} 集数偏移编译失败：{str(err)}")
+                    offset_rule = None
+                return _ReplaceOffsetRule(word, replace_rule, offset_rule)
+            elif word.count(" => "):
+                # 替换词
+                strings = word.split(" => ")
+                return _ReplaceRule(word, strings[0], strings[1])
+            elif word.count(" >> ") and word.count(" <> "):
+                # 集偏移
+                strings = word.split(" <> ")
+                offsets = strings[1].split(" >> ")
+                return _OffsetRule(word, strings[0], offsets[0], offsets[1])
+            elif word.strip():
+                # 屏蔽词
+                return _BlockRule(word)
         except Exception as err:
-            logger.warn(f"自定义识别词集数偏移失败：{str(err)} - 标题：{title}，前定位词：{front}，后定位词：{back}，偏移量：{offset}")
-            return title, str(err), False
+            logger.warn(f"自定义识别词 {word} 编译失败：{str(err)}")
+        return None
@@ -1,13 +1,45 @@
+import copy
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Tuple
+from typing import Tuple, List, Union, Optional
 
 import regex as re
 
 from app.core.config import settings
 from app.core.meta import MetaAnime, MetaVideo, MetaBase
 from app.core.meta.words import WordsMatcher
+from app.db.systemconfig_oper import SystemConfigOper
 from app.log import logger
-from app.schemas.types import MediaType
+from app.schemas.types import MediaType, SystemConfigKey
+from app.utils.system import SystemUtils
+
+# 影响识别结果的系统设置，变更后识别缓存自动失效
+META_CONFIG_KEYS = (
+    SystemConfigKey.CustomIdentifiers,
+    SystemConfigKey.CustomReleaseGroups,
+    SystemConfigKey.Customization
+)
+
+# 批量识别时使用进程池的最小数量，数量较少时序列化的开销大于并行的收益
+BATCH_MIN_SIZE = 200
+
+# 批量识别进程池及其对应的识别设置版本号
+_batch_lock = threading.Lock()
+_batch_pool: Optional[ProcessPoolExecutor] = None
+_batch_version: Optional[Tuple[int, ...]] = None
+
+# 动漫判断正则式
+_anime_bracket_pattern = re.compile(r'【[+0-9XVPI-]+】\s*【', re.IGNORECASE)
+_anime_episode_pattern = re.compile(r'\s+-\s+[\dv]{1,4}\s+', re.IGNORECASE)
+_anime_season_episode_pattern = re.compile(r"S\d{2}\s*-\s*S\d{2}|S\d{2}|\s+S\d{1,2}|EP?\d{2,4}\s*-\s*EP?\d{2,4}"
+                                           r"|EP?\d{2,4}|\s+EP?\d{1,4}", re.IGNORECASE)
+_anime_square_bracket_pattern = re.compile(r'\[[+0-9XVPI-]+]\s*\[', re.IGNORECASE)
 
 
 def MetaInfo(title: str, subtitle: str = None) -> MetaBase:
@@ -17,6 +49,53 @@ def MetaInfo(title: str, subtitle: str = None) -> MetaBase:
     :param subtitle: 副标题、描述
     :return: MetaAnime、MetaVideo
     """
+    # 缓存中的识别结果不对外暴露，返回副本，调用方可自由修改
+    return copy.deepcopy(_cached_metainfo(title, subtitle, _meta_config_version()))
+
+
+def _meta_config_version() -> Tuple[int, ...]:
+    """
+    识别相关系统设置的版本号
+    """
+    systemconfig = SystemConfigOper()
+    return tuple(systemconfig.version(key) for key in META_CONFIG_KEYS)
+
+
+def meta_config_fingerprint() -> str:
+    """
+    识别相关系统设置内容的摘要，版本号只在当前进程内有效，持久保存的识别结果使用摘要判断设置是否变化
+    """
+    return _meta_config_fingerprint(_meta_config_version())
+
+
+@lru_cache(maxsize=1)
+def _meta_config_fingerprint(version: Tuple[int, ...]) -> str:
+    """
+    计算识别相关系统设置内容的摘要，按版本号缓存
+    """
+    systemconfig = SystemConfigOper()
+    content = json.dumps([systemconfig.get(key) for key in META_CONFIG_KEYS],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.md5(content.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=settings.CACHE_CONF.get('metainfo'))
+def _cached_metainfo(title: str, subtitle: str, version: Tuple[int, ...]) -> MetaBase:
+    """
+    带缓存的元数据识别，缓存按标题、副标题及识别相关设置版本号区分
+    :param title: 标题、种子名、文件名
+    :param subtitle: 副标题、描述
+    :param version: 识别相关系统设置的版本号，设置变更后旧缓存不再命中
+    """
+    return _parse_metainfo(title, subtitle)
+
+
+def _parse_metainfo(title: str, subtitle: str = None) -> MetaBase:
+    """
+    识别元数据（不使用缓存）
+    :param title: 标题、种子名、文件名
+    :param subtitle: 副标题、描述
+    """
     # 原标题
     org_title = title
     # 预处理标题
@@ -61,6 +140,80 @@ def MetaInfo(title: str, subtitle: str = None) -> MetaBase:
     return meta
 
 
+def MetaInfoBatch(titles: List[Union[str, Tuple[str, Optional[str]]]]) -> List[MetaBase]:
+    """
+    批量识别元数据，不重复的标题较多且有多个CPU时使用进程池并行识别，结果与逐个调用MetaInfo相同
+    :param titles: 标题列表，元素为标题或(标题, 副标题)
+    :return: 与titles顺序一致的元数据列表
+    """
+    items = [(title, None) if not isinstance(title, tuple) else title for title in titles]
+    # 相同的标题只识别一次
+    unique_items = list(dict.fromkeys(items))
+    workers = os.cpu_count() or 1
+    # 打包的二进制文件中子进程会重新执行程序入口，不使用进程池
+    if len(unique_items) < BATCH_MIN_SIZE or workers < 2 or SystemUtils.is_frozen():
+        return [MetaInfo(title, subtitle) for title, subtitle in items]
+    try:
+        pool = _get_batch_pool(workers)
+        results = dict(zip(unique_items, pool.map(_parse_batch_item, unique_items,
+                                                  chunksize=max(len(unique_items) // (workers * 4), 1))))
+    except Exception as err:
+        logger.warn(f"进程池批量识别失败，改为逐个识别：{str(err)}")
+        return [MetaInfo(title, subtitle) for title, subtitle in items]
+    # 重复的标题返回各自独立的副本
+    metas = []
+    returned = set()
+    for item in items:
+        meta = results[item]
+        metas.append(copy.deepcopy(meta) if item in returned else meta)
+        returned.add(item)
+    return metas
+
+
+def _get_batch_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    获取批量识别进程池，识别相关设置变更后重建，保证子进程使用最新的识别词等设置
+    """
+    global _batch_pool, _batch_version
+    version = _meta_config_version()
+    with _batch_lock:
+        if _batch_pool and _batch_version != version:
+            _batch_pool.shutdown(wait=False)
+            _batch_pool = None
+        if not _batch_pool:
+            # 主进程中有大量线程和数据库连接，子进程不能使用fork方式创建
+            _batch_pool = ProcessPoolExecutor(max_workers=workers,
+                                              mp_context=multiprocessing.get_context("spawn"))
+            _batch_version = version
+        return _batch_pool
+
+
+def _parse_batch_item(item: Tuple[str, Optional[str]]) -> MetaBase:
+    """
+    进程池中识别单个标题
+    """
+    return _parse_metainfo(*item)
+
+
+def MetaInfoPathBatch(paths: List[Path]) -> List[MetaBase]:
+    """
+    批量根据路径识别元数据，结果与逐个调用MetaInfoPath相同
+    :param paths: 路径列表
+    """
+    names = []
+    for path in paths:
+        names.extend([path.name, path.parent.name, path.parent.parent.name])
+    metas = MetaInfoBatch(names)
+    file_metas = []
+    for i in range(len(paths)):
+        file_meta, dir_meta, root_meta = metas[i * 3: i * 3 + 3]
+        # 合并元数据
+        file_meta.merge(dir_meta)
+        file_meta.merge(root_meta)
+        file_metas.append(file_meta)
+    return file_metas
+
+
 def MetaInfoPath(path: Path) -> MetaBase:
     """
     根据路径识别元数据
@@ -87,14 +240,13 @@ def is_anime(name: str) -> bool:
     """
     if not name:
         return False
-    if re.search(r'【[+0-9XVPI-]+】\s*【', name, re.IGNORECASE):
+    if _anime_bracket_pattern.search(name):
         return True
-    if re.search(r'\s+-\s+[\dv]{1,4}\s+', name, re.IGNORECASE):
+    if _anime_episode_pattern.search(name):
         return True
-    if re.search(r"S\d{2}\s*-\s*S\d{2}|S\d{2}|\s+S\d{1,2}|EP?\d{2,4}\s*-\s*EP?\d{2,4}|EP?\d{2,4}|\s+EP?\d{1,4}", name,
-                 re.IGNORECASE):
+    if _anime_season_episode_pattern.search(name):
         return False
-    if re.search(r'\[[+0-9XVPI-]+]\s*\[', name, re.IGNORECASE):
+    if _anime_square_bracket_pattern.search(name):
         return True
     return False
 
@@ -114,7 +266,7 @@ def find_metainfo(title: str) -> Tuple[str, dict]:
         'end_episode': None,
         'total_episode': None,
     }
-    if not title:
+    if not title or "{[" not in title:
         return title, metainfo
     # 从标题中提取媒体信息 格式为{[tmdbid=xxx;type=xxx;s=xxx;e=xxx]}
     results = re.findall(r'(?<={\[)[\W\w]+(?=]})', title)
@@ -1,5 +1,6 @@
 import json
-from typing import Optional
+from datetime import datetime
+from typing import Optional, List, Tuple
 
 from sqlalchemy.orm import Session
 
@@ -25,6 +26,61 @@ class MediaServerOper(DbOper):
             return True
         return False
 
+    def sync(self, server: str, items: List[dict]) -> Tuple[int, int, int]:
+        """
+        与本地数据比对后增量同步一个媒体服务器的全部数据，只写入有变化的条目，在一个事务中完成
+        :param server: 媒体服务器
+        :param items: 媒体服务器当前的全部条目
+        :return: 新增、更新、删除的数量
+        """
+        # 比对的字段
+        fields = [column.name for column in MediaServerItem.__table__.columns
+                  if column.name not in ("id", "lst_mod_date")]
+
+        def __normalize(_item: dict) -> dict:
+            """
+            按数据库中的存储格式转换字段值
+            """
+            values = {}
+            for field in fields:
+                value = _item.get(field)
+                if value is not None and field != "tmdbid":
+                    value = str(value)
+                values[field] = value
+            return values
+
+        # 本地已有的条目，重复的条目删除
+        existing, deletes = {}, []
+        for dbitem in MediaServerItem.list_by_server(self._db, server):
+            if dbitem.item_id in existing:
+                deletes.append(dbitem.id)
+            else:
+                existing[dbitem.item_id] = dbitem
+        sync_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        adds, updates, seen = [], [], set()
+        for item in items:
+            values = __normalize(item)
+            item_id = values.get("item_id")
+            if not item_id or item_id in seen:
+                continue
+            seen.add(item_id)
+            dbitem = existing.get(item_id)
+            if not dbitem:
+                adds.append({**values, "lst_mod_date": sync_time})
+            elif any(getattr(dbitem, field) != value for field, value in values.items()):
+                updates.append({**values, "id": dbitem.id, "lst_mod_date": sync_time})
+        # 媒体服务器中已不存在的条目
+        deletes.extend(dbitem.id for item_id, dbitem in existing.items() if item_id not in seen)
+        if adds or updates or deletes:
+            MediaServerItem.batch_update(self._db, adds=adds, updates=updates, deletes=deletes)
+        return len(adds), len(updates), len(deletes)
+
+    def empty_others(self, servers: List[str]):
+        """
+        清空不在列表中的媒体服务器数据
+        """
+        MediaServerItem.empty_others(self._db, servers)
+
     def empty(self, server: Optional[str] = None):
         """
         清空媒体服务器数据
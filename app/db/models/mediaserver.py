@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 
 from sqlalchemy import Column, Integer, String, Sequence
 from sqlalchemy.orm import Session
@@ -54,6 +54,30 @@ class MediaServerItem(Base):
         else:
             db.query(MediaServerItem).filter(MediaServerItem.server == server).delete()
 
+    @staticmethod
+    @db_query
+    def list_by_server(db: Session, server: str):
+        result = db.query(MediaServerItem).filter(MediaServerItem.server == server).all()
+        return list(result)
+
+    @staticmethod
+    @db_update
+    def batch_update(db: Session, adds: List[dict] = None, updates: List[dict] = None, deletes: List[int] = None):
+        if adds:
+            db.bulk_insert_mappings(MediaServerItem, adds)
+        if updates:
+            db.bulk_update_mappings(MediaServerItem, updates)
+        if deletes:
+            for i in range(0, len(deletes), 500):
+                db.query(MediaServerItem).filter(
+                    MediaServerItem.id.in_(deletes[i:i + 500])
+                ).delete(synchronize_session=False)
+
+    @staticmethod
+    @db_update
+    def empty_others(db: Session, servers: List[str]):
+        db.query(MediaServerItem).filter(MediaServerItem.server.notin_(servers)).delete(synchronize_session=False)
+
     @staticmethod
     @db_query
     def exist_by_tmdbid(db: Session, tmdbid: int, mtype: str):
@@ -11,6 +11,8 @@ from app.utils.singleton import Singleton
 class SystemConfigOper(DbOper, metaclass=Singleton):
     # 配置对象
     __SYSTEMCONF: dict = {}
+    # 配置版本号，每次变更时递增，用于依赖配置的缓存判断是否失效
+    __VERSIONS: dict = {}
 
     def __init__(self):
         """
@@ -31,6 +33,7 @@ class SystemConfigOper(DbOper, metaclass=Singleton):
             key = key.value
         # 更新内存
         self.__SYSTEMCONF[key] = value
+        self.__bump_version(key)
         # 写入数据库
         if ObjectUtils.is_obj(value):
             value = json.dumps(value)
@@ -56,6 +59,20 @@ class SystemConfigOper(DbOper, metaclass=Singleton):
             return self.__SYSTEMCONF
         return self.__SYSTEMCONF.get(key)
 
+    def version(self, key: Union[str, SystemConfigKey]) -> int:
+        """
+        获取系统设置的版本号，设置每变更一次版本号加1
+        """
+        if isinstance(key, SystemConfigKey):
+            key = key.value
+        return self.__VERSIONS.get(key, 0)
+
+    def __bump_version(self, key: str):
+        """
+        递增系统设置的版本号
+        """
+        self.__VERSIONS[key] = self.__VERSIONS.get(key, 0) + 1
+
     def all(self):
         """
         获取所有系统设置
@@ -70,6 +87,7 @@ class SystemConfigOper(DbOper, metaclass=Singleton):
             key = key.value
         # 更新内存
         self.__SYSTEMCONF.pop(key, None)
+        self.__bump_version(key)
         # 写入数据库
         conf = SystemConfig.get_by_key(self._db, key)
         if conf:
@@ -0,0 +1,371 @@
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Generator, Optional, Tuple
+
+from PIL import Image
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from app.core.config import settings
+from app.log import logger
+from app.utils.http import RequestUtils
+from app.utils.singleflight import SingleFlight
+from app.utils.singleton import Singleton
+from app.utils.sqlite import SqliteUtils
+
+
+class ImageCacheItem:
+    """
+    缓存的图片
+    """
+
+    def __init__(self, path: Path, content_type: str, digest: str, modified: int, file: BinaryIO = None):
+        # 图片文件
+        self.path = path
+        # 已打开的缓存图片文件，缓存被清理删除文件后仍可读取
+        self.file = file
+        # 图片类型
+        self.content_type = content_type
+        # 图片内容的SHA256，同时作为ETag
+        self.digest = digest
+        # 修改时间
+        self.modified = modified
+
+    def response(self, if_none_match: str = None, if_modified_since: str = None,
+                 max_age: int = 0) -> Response:
+        """
+        生成图片响应，客户端缓存仍有效时返回304
+        :param if_none_match: 请求头If-None-Match
+        :param if_modified_since: 请求头If-Modified-Since
+        :param max_age: 客户端缓存时间（秒）
+        """
+        headers = {
+            "ETag": f'"{self.digest}"',
+            "Last-Modified": formatdate(self.modified, usegmt=True),
+            "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache"
+        }
+        if ImageCacheHelper.not_modified(f'"{self.digest}"', self.modified,
+                                         if_none_match, if_modified_since):
+            self.close()
+            return Response(status_code=304, headers=headers)
+        if self.file:
+            self.file.seek(0)
+            headers["Content-Length"] = str(os.fstat(self.file.fileno()).st_size)
+            return StreamingResponse(self.__iter_file(), media_type=self.content_type, headers=headers)
+        return FileResponse(self.path, media_type=self.content_type, headers=headers)
+
+    def close(self):
+        """
+        关闭已打开的图片文件
+        """
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __iter_file(self) -> Generator[bytes, None, None]:
+        try:
+            while True:
+                chunk = self.file.read(64 * 1024)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            self.close()
+
+
+class ImageCacheHelper(metaclass=Singleton):
+    """
+    图片磁盘缓存，图片按内容的SHA256保存，相同内容只保存一份，
+    超出容量时删除最久未访问的图片，过期后携带ETag/Last-Modified向源站确认图片未变化时继续使用
+    """
+
+    # 数据库文件
+    _db_file = "__image_cache__.db"
+    # 图片目录
+    _image_dir = "images"
+    # 缓存有效期（秒），过期后需重新确认
+    _ttl = 7 * 24 * 3600
+    # 访问时间的更新间隔（秒），避免每次读取都写库
+    _touch_interval = 3600
+    # 单个图片最大大小
+    _max_image_size = 20 * 1024 * 1024
+    # 缩略图可用的宽度，请求的宽度向上取到其中之一，限制每张图片的缩略图数量
+    _thumb_widths = (160, 320, 480, 640, 960, 1280, 1920)
+    # 可直接缓存的响应类型
+    _cacheable_types = ("image/", "application/octet-stream")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._image_path = settings.TEMP_PATH / self._image_dir
+        self._image_path.mkdir(parents=True, exist_ok=True)
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS images ("
+                           "key TEXT PRIMARY KEY, "
+                           "digest TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "content_type TEXT, "
+                           "etag TEXT, "
+                           "last_modified TEXT, "
+                           "updated INTEGER NOT NULL, "
+                           "accessed INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_images_accessed ON images (accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_images_digest ON images (digest)")
+        # 当前缓存的图片总大小
+        self._size = self.__total_size()
+
+    def fetch(self, url: str, proxy: bool = False, width: int = None) -> Optional[ImageCacheItem]:
+        """
+        获取网络图片，优先使用缓存
+        :param url: 图片地址
+        :param proxy: 是否使用代理服务器
+        :param width: 缩略图宽度，为空时返回原图
+        """
+        key = self.__key("url", url, "proxy" if proxy else "")
+        item, _ = self._flight.do(key, self.__fetch, key, url, proxy)
+        if item and width:
+            return self.thumbnail(item, width)
+        return item
+
+    def local(self, path: Path, width: int) -> Optional[ImageCacheItem]:
+        """
+        获取本地图片的缩略图
+        :param path: 图片路径
+        :param width: 缩略图宽度
+        """
+        stat = path.stat()
+        source = ImageCacheItem(path=path, content_type=self.__guess_type(path),
+                                digest=self.__key("file", str(path), str(stat.st_mtime_ns), str(stat.st_size)),
+                                modified=int(stat.st_mtime))
+        return self.thumbnail(source, width)
+
+    def thumbnail(self, source: ImageCacheItem, width: int) -> ImageCacheItem:
+        """
+        按宽度等比缩小图片并缓存，宽度不小于原图时返回原图
+        :param source: 原图
+        :param width: 缩略图宽度，取不小于该宽度的可用宽度，超出时取最大可用宽度
+        """
+        width = next((w for w in self._thumb_widths if w >= int(width)), self._thumb_widths[-1])
+        key = self.__key("thumb", source.digest, str(width))
+        item = self.__get(key)
+        if item:
+            source.close()
+            return item
+        try:
+            if source.file:
+                source.file.seek(0)
+            with Image.open(source.file or source.path) as image:
+                if width >= image.width:
+                    return source
+                height = max(round(image.height * width / image.width), 1)
+                image_format = image.format or "JPEG"
+                thumb = image.resize((width, height), Image.LANCZOS)
+                if image_format == "JPEG" and thumb.mode not in ("RGB", "L"):
+                    thumb = thumb.convert("RGB")
+                buffer = BytesIO()
+                thumb.save(buffer, format=image_format)
+        except Exception as err:
+            logger.warn(f"生成缩略图失败：{source.path} - {str(err)}")
+            return source
+        source.close()
+        content_type = Image.MIME.get(image_format) or source.content_type
+        return self.__store(key, buffer.getvalue(), content_type=content_type)
+
+    @staticmethod
+    def not_modified(etag: str, modified: float, if_none_match: str = None, if_modified_since: str = None) -> bool:
+        """
+        判断客户端缓存是否仍有效
+        """
+        if if_none_match:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if if_modified_since:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except Exception:
+                return False
+        return False
+
+    def __fetch(self, key: str, url: str, proxy: bool) -> Optional[ImageCacheItem]:
+        """
+        读取缓存，无缓存或已过期时从源站下载
+        """
+        row = self.__row(key)
+        headers = {"User-Agent": settings.USER_AGENT}
+        if row:
+            digest, content_type, etag, last_modified, updated = row
+            item = self.__item(digest, content_type, updated)
+            if item and time.time() - updated < self._ttl:
+                self.__touch(key, refresh=False)
+                return item
+            if item:
+                # 过期后向源站确认
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+        else:
+            item = None
+        response = RequestUtils(headers=headers,
+                                proxies=settings.PROXY if proxy else None).get_res(url=url, stream=True)
+        if response is None:
+            # 源站不可用时继续使用过期的图片
+            return item
+        with response:
+            if response.status_code == 304 and item:
+                self.__touch(key, refresh=True)
+                return item
+            if not response.ok:
+                return item
+            content_type = response.headers.get("Content-Type") or "image/jpeg"
+            content = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                content.extend(chunk)
+                if len(content) > self._max_image_size:
+                    logger.warn(f"图片过大，不缓存：{url}")
+                    return item
+        if not content_type.startswith(self._cacheable_types):
+            # 不是图片，不缓存
+            logger.warn(f"图片地址返回的不是图片：{url} - {content_type}")
+            if item:
+                item.close()
+            return None
+        if content_type.startswith("application/octet-stream"):
+            content_type = "image/jpeg"
+        if item:
+            item.close()
+        return self.__store(key, bytes(content), content_type=content_type,
+                            etag=response.headers.get("ETag"),
+                            last_modified=response.headers.get("Last-Modified"))
+
+    def __get(self, key: str) -> Optional[ImageCacheItem]:
+        """
+        读取缓存，不检查有效期
+        """
+        row = self.__row(key)
+        if not row:
+            return None
+        digest, content_type, _, _, updated = row
+        item = self.__item(digest, content_type, updated)
+        if item:
+            self.__touch(key, refresh=False)
+        return item
+
+    def __row(self, key: str) -> Optional[Tuple[str, str, str, str, int]]:
+        with self._lock:
+            return self._conn.execute("SELECT digest, content_type, etag, last_modified, updated "
+                                      "FROM images WHERE key = ?", (key,)).fetchone()
+
+    def __item(self, digest: str, content_type: str, updated: int) -> Optional[ImageCacheItem]:
+        """
+        缓存记录对应的图片，图片文件已不存在时返回None，
+        在锁内打开文件，之后清理缓存删除该文件也不影响读取
+        """
+        path = self.__path(digest)
+        with self._lock:
+            try:
+                file = open(path, "rb")
+            except OSError:
+                return None
+        return ImageCacheItem(path=path, content_type=content_type, digest=digest, modified=updated, file=file)
+
+    def __touch(self, key: str, refresh: bool):
+        """
+        更新访问时间
+        :param refresh: 源站确认图片未变化，重新开始计算有效期
+        """
+        now = int(time.time())
+        with self._lock:
+            if refresh:
+                self._conn.execute("UPDATE images SET updated = ?, accessed = ? WHERE key = ?", (now, now, key))
+            else:
+                self._conn.execute("UPDATE images SET accessed = ? WHERE key = ? AND accessed < ?",
+                                   (now, key, now - self._touch_interval))
+
+    def __store(self, key: str, content: bytes, content_type: str,
+                etag: str = None, last_modified: str = None) -> ImageCacheItem:
+        """
+        保存图片，超出容量时删除最久未访问的图片
+        """
+        now = int(time.time())
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.__path(digest)
+        if not path.exists():
+            self.__write(path, content)
+        limit = settings.CACHE_CONF.get("image") or 0
+        removed = []
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                shared = self._conn.execute("SELECT 1 FROM images WHERE digest = ? LIMIT 1",
+                                            (digest,)).fetchone()
+                old = self._conn.execute("SELECT digest, size FROM images WHERE key = ?", (key,)).fetchone()
+                self._conn.execute("INSERT OR REPLACE INTO images "
+                                   "(key, digest, size, content_type, etag, last_modified, updated, accessed) "
+                                   "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (key, digest, len(content), content_type, etag, last_modified, now, now))
+                if not shared:
+                    self._size += len(content)
+                if old and old[0] != digest and not self.__referenced(old[0]):
+                    removed.append(old[0])
+                    self._size -= old[1]
+                # 超出容量时一次多删除一部分，避免频繁清理
+                if limit and self._size > limit:
+                    for old_key, old_digest, old_size in self._conn.execute(
+                            "SELECT key, digest, size FROM images WHERE key != ? ORDER BY accessed",
+                            (key,)).fetchall():
+                        self._conn.execute("DELETE FROM images WHERE key = ?", (old_key,))
+                        if old_digest != digest and not self.__referenced(old_digest):
+                            removed.append(old_digest)
+                            self._size -= old_size
+                        if self._size <= limit * 0.9:
+                            break
+            for old_digest in removed:
+                try:
+                    self.__path(old_digest).unlink(missing_ok=True)
+                except OSError as err:
+                    logger.warn(f"删除缓存图片失败：{old_digest} - {str(err)}")
+            # 写入文件后、登记前，相同内容的图片可能已被清理删除，需重新写入
+            if not path.exists():
+                self.__write(path, content)
+            file = open(path, "rb")
+        return ImageCacheItem(path=path, content_type=content_type, digest=digest, modified=now, file=file)
+
+    @staticmethod
+    def __write(path: Path, content: bytes):
+        """
+        写入图片文件，先写临时文件再替换，避免读取到不完整的文件
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+
+    def __referenced(self, digest: str) -> bool:
+        """
+        图片是否仍被缓存记录引用
+        """
+        return self._conn.execute("SELECT 1 FROM images WHERE digest = ? LIMIT 1", (digest,)).fetchone() is not None
+
+    def __total_size(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                                  "(SELECT digest, MAX(size) AS size FROM images GROUP BY digest)").fetchone()[0]
+
+    def __path(self, digest: str) -> Path:
+        return self._image_path / digest[:2] / digest
+
+    @staticmethod
+    def __key(*parts: str) -> str:
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def __guess_type(path: Path) -> str:
+        return {
+            ".png": "image/png",
+            ".gif": "image/gif",
+            ".webp": "image/webp",
+            ".bmp": "image/bmp"
+        }.get(path.suffix.lower(), "image/jpeg")
+
@@ -0,0 +1,357 @@
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Generator, List, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from app.core.config import settings
+from app.core.metainfo import MetaInfo, meta_config_fingerprint
+from app.db.systemconfig_oper import SystemConfigOper
+from app.helper.directory import DirectoryHelper
+from app.log import logger
+from app.schemas.types import SystemConfigKey
+from app.utils.singleton import Singleton
+from app.utils.sqlite import SqliteUtils
+from app.utils.system import SystemUtils
+
+
+@dataclass
+class LibraryFile:
+    """
+    媒体库中的媒体文件
+    """
+    # 文件路径
+    path: Path
+    # 文件大小
+    size: int = 0
+    # 文件名识别的开始季，未识别到时为空
+    season: Optional[int] = None
+    # 文件名识别的开始集，未识别到时为空
+    episode: Optional[int] = None
+
+
+class LibraryMonitorHandler(FileSystemEventHandler):
+    """
+    媒体库目录变化监听，同步更新媒体库索引
+    """
+
+    def __init__(self, helper: "LibraryHelper", root: str):
+        super().__init__()
+        self.helper = helper
+        self.root = root
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.helper.scan(self.root, event.src_path)
+        else:
+            self.helper.update(self.root, event.src_path)
+
+    def on_closed(self, event):
+        # 写入过程中的修改事件很多，只在文件关闭后更新
+        if not event.is_directory:
+            self.helper.update(self.root, event.src_path)
+
+    def on_deleted(self, event):
+        self.helper.remove(event.src_path)
+
+    def on_moved(self, event):
+        self.helper.remove(event.src_path)
+        if event.is_directory:
+            self.helper.scan(self.root, event.dest_path)
+        else:
+            self.helper.update(self.root, event.dest_path)
+
+
+class LibraryHelper(metaclass=Singleton):
+    """
+    媒体库文件索引，记录媒体库目录下所有媒体文件的大小、修改时间及识别的季集，
+    启动时与文件系统比对（只识别新增或变化的文件），之后通过目录监控实时更新并定期重新比对，
+    识别词等设置变化后重新识别所有文件，判断媒体是否存在时直接查询索引，
+    无法监控的目录（含网络及FUSE文件系统）仍直接遍历文件系统
+    """
+
+    # 索引数据库文件
+    _db_file = "__library_index__.db"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files ("
+                           "path TEXT PRIMARY KEY, "
+                           "root TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "mtime REAL NOT NULL, "
+                           "season INTEGER, "
+                           "episode INTEGER)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_files_root ON files (root)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # 索引中季集识别时的识别设置摘要
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'meta_config'").fetchone()
+        self._fingerprint: Optional[str] = row[0] if row else None
+        # 正在重新识别所有文件，期间查询直接遍历文件系统
+        self._recognizing = False
+        self._state_lock = threading.Lock()
+        self._observer: Optional[Observer] = None
+        # 已监控的媒体库目录 {目录: watch}
+        self._watches: Dict[str, object] = {}
+        # 已完成比对的媒体库目录，只有这些目录的查询使用索引
+        self._ready: Set[str] = set()
+        # 媒体库目录设置的版本号
+        self._version: Optional[int] = None
+
+    def start(self):
+        """
+        按媒体库目录设置启动监控，设置变化时调整监控的目录并在后台比对新增的目录，
+        识别设置变化时在后台重新识别所有文件
+        """
+        self.__check_fingerprint()
+        version = SystemConfigOper().version(SystemConfigKey.LibraryDirectories)
+        if version == self._version:
+            return
+        with self._state_lock:
+            if version == self._version:
+                return
+            self._version = version
+            roots = self.__get_roots()
+            # 不再是媒体库的目录取消监控并删除索引
+            for root in list(self._watches):
+                if root in roots:
+                    continue
+                watch = self._watches.pop(root)
+                self._ready.discard(root)
+                try:
+                    self._observer.unschedule(watch)
+                except Exception as err:
+                    logger.warn(f"媒体库目录 {root} 取消监控失败：{str(err)}")
+            with self._lock:
+                self._conn.execute(f"DELETE FROM files WHERE root NOT IN ({','.join('?' * len(roots))})",
+                                   roots)
+            # 新增的目录先开始监控，再比对，避免遗漏比对期间的变化
+            new_roots = []
+            for root in roots:
+                if root in self._watches:
+                    continue
+                if SystemUtils.is_network_fs(Path(root)):
+                    logger.info(f"媒体库目录 {root} 为网络或FUSE文件系统，无法监控变化，将直接检索文件")
+                    continue
+                try:
+                    if not self._observer:
+                        self._observer = Observer()
+                        self._observer.daemon = True
+                        self._observer.start()
+                    self._watches[root] = self._observer.schedule(LibraryMonitorHandler(self, root), root,
+                                                                  recursive=True)
+                    new_roots.append(root)
+                except Exception as err:
+                    # 无法监控的目录（如超出inotify数量限制）查询时直接遍历文件系统
+                    logger.warn(f"媒体库目录 {root} 监控启动失败，将直接检索文件：{str(err)}")
+            if new_roots:
+                threading.Thread(target=self.__index_roots, args=(new_roots,), daemon=True).start()
+
+    def stop(self):
+        """
+        停止监控
+        """
+        with self._state_lock:
+            if self._observer:
+                try:
+                    self._observer.stop()
+                    self._observer.join()
+                except Exception as err:
+                    logger.error(f"停止媒体库监控出错：{str(err)}")
+            self._observer = None
+            self._watches = {}
+            self._ready = set()
+            self._version = None
+
+    def reconcile(self):
+        """
+        重新比对已监控的媒体库目录，修正监控遗漏的变化（如监控事件队列溢出）
+        """
+        for root in tuple(self._ready):
+            try:
+                self.scan(root, root)
+            except Exception as err:
+                logger.error(f"媒体库索引 {root} 比对出错：{str(err)}")
+
+    def list_files(self, directory: Path) -> List[LibraryFile]:
+        """
+        获取媒体库目录下的所有媒体文件（包括子目录）
+        :param directory: 需要检索的目录或文件
+        """
+        self.start()
+        if self._recognizing or not any(directory.is_relative_to(root) for root in tuple(self._ready)):
+            return [LibraryFile(path=Path(path), size=stat.st_size, season=season, episode=episode)
+                    for path, stat, season, episode in self.__walk(directory, recognize=True)]
+        low, high = self.__range(str(directory))
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size, season, episode FROM files "
+                                      "WHERE path = ? OR (path >= ? AND path < ?) ORDER BY path",
+                                      (str(directory), low, high)).fetchall()
+        return [LibraryFile(path=Path(path), size=size, season=season, episode=episode)
+                for path, size, season, episode in rows]
+
+    def scan(self, root: str, directory: str):
+        """
+        比对目录下的文件与索引，只识别新增或变化的文件
+        :param root: 媒体库根目录
+        :param directory: 比对的目录
+        """
+        low, high = self.__range(directory)
+        with self._lock:
+            indexed = {path: (size, mtime) for path, size, mtime in
+                       self._conn.execute("SELECT path, size, mtime FROM files WHERE path >= ? AND path < ?",
+                                          (low, high))}
+        rows = []
+        exists = set()
+        for path, stat, _, _ in self.__walk(Path(directory)):
+            exists.add(path)
+            if indexed.get(path) == (stat.st_size, stat.st_mtime):
+                continue
+            season, episode = self.__recognize(path)
+            rows.append((path, root, stat.st_size, stat.st_mtime, season, episode))
+        deleted = [(path,) for path in indexed if path not in exists]
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                self._conn.executemany("INSERT OR REPLACE INTO files (path, root, size, mtime, season, episode) "
+                                       "VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self._conn.executemany("DELETE FROM files WHERE path = ?", deleted)
+        if rows or deleted:
+            logger.debug(f"媒体库索引 {directory} 新增或更新 {len(rows)} 个文件，删除 {len(deleted)} 个文件")
+
+    def update(self, root: str, path: str):
+        """
+        更新单个文件的索引
+        """
+        if not self.__is_media(path):
+            return
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.remove(path)
+            return
+        season, episode = self.__recognize(path)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (path, root, size, mtime, season, episode) "
+                               "VALUES (?, ?, ?, ?, ?, ?)",
+                               (path, root, stat.st_size, stat.st_mtime, season, episode))
+
+    def remove(self, path: str):
+        """
+        删除文件或目录下所有文件的索引
+        """
+        low, high = self.__range(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+                               (path, low, high))
+
+    def __check_fingerprint(self):
+        """
+        识别设置与索引中的不一致时，在后台重新识别所有文件
+        """
+        fingerprint = meta_config_fingerprint()
+        if fingerprint == self._fingerprint or self._recognizing:
+            return
+        with self._state_lock:
+            if fingerprint == self._fingerprint or self._recognizing:
+                return
+            self._recognizing = True
+        threading.Thread(target=self.__recognize_all, args=(fingerprint,), daemon=True).start()
+
+    def __recognize_all(self, fingerprint: str):
+        """
+        重新识别索引中所有文件的季集
+        """
+        try:
+            with self._lock:
+                paths = [path for path, in self._conn.execute("SELECT path FROM files")]
+            if paths:
+                logger.info(f"识别设置已变化，开始重新识别媒体库索引中的 {len(paths)} 个文件")
+            rows = [(*self.__recognize(path), path) for path in paths]
+            with self._lock:
+                with SqliteUtils.transaction(self._conn):
+                    self._conn.executemany("UPDATE files SET season = ?, episode = ? WHERE path = ?", rows)
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('meta_config', ?)",
+                                       (fingerprint,))
+            self._fingerprint = fingerprint
+        except Exception as err:
+            logger.error(f"重新识别媒体库索引出错：{str(err)}")
+        finally:
+            self._recognizing = False
+
+    def __index_roots(self, roots: List[str]):
+        """
+        比对媒体库目录，完成后查询使用索引
+        """
+        for root in roots:
+            try:
+                logger.info(f"开始比对媒体库索引：{root}")
+                self.scan(root, root)
+                with self._state_lock:
+                    if root in self._watches:
+                        self._ready.add(root)
+                logger.info(f"媒体库索引比对完成：{root}")
+            except Exception as err:
+                logger.error(f"媒体库索引 {root} 比对出错：{str(err)}")
+
+    @staticmethod
+    def __get_roots() -> List[str]:
+        """
+        获取存在的媒体库根目录，去除包含在其它媒体库目录中的目录
+        """
+        paths = sorted({Path(library_dir.path) for library_dir in DirectoryHelper().get_library_dirs()
+                        if library_dir.path and Path(library_dir.path).is_dir()})
+        roots = []
+        for path in paths:
+            if any(path.is_relative_to(root) for root in roots):
+                continue
+            roots.append(path)
+        return [str(root) for root in roots]
+
+    @staticmethod
+    def __range(directory: str) -> Tuple[str, str]:
+        """
+        目录下所有路径的范围，路径按字节序排列时均在[low, high)之间
+        """
+        directory = directory.rstrip(os.sep)
+        return directory + os.sep, directory + chr(ord(os.sep) + 1)
+
+    @staticmethod
+    def __is_media(path: str) -> bool:
+        return path.lower().endswith(tuple(ext.lower() for ext in settings.RMT_MEDIAEXT))
+
+    @staticmethod
+    def __recognize(path: str) -> Tuple[Optional[int], Optional[int]]:
+        """
+        识别文件名中的季集
+        """
+        meta = MetaInfo(Path(path).stem)
+        return meta.begin_season, meta.begin_episode
+
+    def __walk(self, directory: Path, recognize: bool = False) \
+            -> Generator[Tuple[str, os.stat_result, Optional[int], Optional[int]], None, None]:
+        """
+        遍历目录下的媒体文件
+        :param directory: 目录，也可以是单个文件
+        :param recognize: 是否识别季集
+        """
+        if directory.is_file():
+            entries = [(str(directory), os.stat(directory))]
+        else:
+            entries = []
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    if not self.__is_media(path):
+                        continue
+                    try:
+                        entries.append((path, os.stat(path)))
+                    except OSError:
+                        continue
+        for path, stat in entries:
+            season, episode = self.__recognize(path) if recognize else (None, None)
+            yield path, stat, season, episode
+
@@ -0,0 +1,263 @@
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Generator, List, Optional, Set
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from app.log import logger
+from app.utils.singleton import Singleton
+
+# 日志级别
+LOG_LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50
+}
+
+# 日志记录首行，格式：【INFO】2024-01-01 00:00:00,000 - xxx.py - 日志内容
+_record_head_re = re.compile(r"^【([A-Z]+)】")
+
+
+class LogMonitorHandler(FileSystemEventHandler):
+    """
+    日志目录变化监听，通知正在跟踪的日志文件
+    """
+
+    def __init__(self, monitor: "LogMonitor"):
+        super().__init__()
+        self.monitor = monitor
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        self.monitor.notify(event.src_path)
+        dest_path = getattr(event, "dest_path", None)
+        if dest_path:
+            self.monitor.notify(dest_path)
+
+
+class LogMonitor(metaclass=Singleton):
+    """
+    日志文件变化监测，所有跟踪日志的连接共用一个监测线程，按目录注册监听
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._observer: Optional[Observer] = None
+        # 已注册监听的目录 {目录: watch}
+        self._watches: Dict[str, object] = {}
+        # 等待文件变化的事件 {文件路径: 事件}
+        self._waiters: Dict[str, Set[threading.Event]] = {}
+
+    def subscribe(self, path: Path) -> threading.Event:
+        """
+        订阅文件变化，文件变化时设置返回的事件
+        """
+        event = threading.Event()
+        file_path = str(path.absolute())
+        directory = str(path.absolute().parent)
+        with self._lock:
+            self._waiters.setdefault(file_path, set()).add(event)
+            if directory not in self._watches:
+                try:
+                    if not self._observer:
+                        self._observer = Observer()
+                        self._observer.daemon = True
+                        self._observer.start()
+                    self._watches[directory] = self._observer.schedule(LogMonitorHandler(self), directory,
+                                                                       recursive=False)
+                except Exception as err:
+                    # 无法监听时由调用方超时后检查文件
+                    logger.warn(f"日志文件监测启动失败：{str(err)}")
+        return event
+
+    def unsubscribe(self, path: Path, event: threading.Event):
+        """
+        取消订阅，目录下没有订阅的文件时取消该目录的监听
+        """
+        file_path = str(path.absolute())
+        directory = str(path.absolute().parent)
+        with self._lock:
+            events = self._waiters.get(file_path)
+            if events:
+                events.discard(event)
+                if not events:
+                    self._waiters.pop(file_path, None)
+            if any(str(Path(waiter).parent) == directory for waiter in self._waiters):
+                return
+            watch = self._watches.pop(directory, None)
+            if watch and self._observer:
+                try:
+                    self._observer.unschedule(watch)
+                except Exception as err:
+                    logger.warn(f"日志文件监测取消失败：{str(err)}")
+
+    def notify(self, path: str):
+        """
+        文件变化，唤醒等待该文件的调用方
+        """
+        with self._lock:
+            events = list(self._waiters.get(str(Path(path).absolute()), ()))
+        for event in events:
+            event.set()
+
+
+class LogTailHelper:
+    """
+    日志文件读取，从文件末尾按块倒序读取需要的行，跟踪文件新增内容，支持按级别过滤
+    多行的日志记录（如异常堆栈）按首行的级别过滤
+    """
+
+    # 倒序读取时每次读取的块大小
+    _block_size = 64 * 1024
+    # 未收到文件变化通知时检查文件的间隔（秒）
+    _check_interval = 5
+
+    def __init__(self, path: Path, level: Optional[str] = None):
+        """
+        :param path: 日志文件路径
+        :param level: 最低日志级别，为空时不过滤
+        """
+        self.path = path
+        self.min_level = LOG_LEVELS.get(str(level).upper(), 0) if level else 0
+        # tail读取时的文件位置，follow从该位置继续读取
+        self._position = 0
+        self._inode = None
+
+    def __match(self, level: Optional[str]) -> bool:
+        """
+        判断日志级别是否需要输出
+        """
+        if not self.min_level:
+            return True
+        return LOG_LEVELS.get(level, 0) >= self.min_level
+
+    @staticmethod
+    def __decode(line: bytes) -> str:
+        return line.decode("utf-8", errors="replace").rstrip("\r")
+
+    def __reverse_lines(self, f, end: int) -> Generator[str, None, None]:
+        """
+        从指定位置往前倒序读取所有行
+        """
+        position = end
+        remainder = b""
+        while position > 0:
+            size = min(self._block_size, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size) + remainder
+            lines = block.split(b"\n")
+            # 第一行可能不完整，与前一块合并
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                yield self.__decode(line)
+        yield self.__decode(remainder)
+
+    def __reverse_records(self, f, end: int) -> Generator[List[str], None, None]:
+        """
+        倒序读取符合级别的日志记录，每条记录的行按正序排列
+        """
+        pending = []
+        for line in self.__reverse_lines(f, end):
+            pending.append(line)
+            match = _record_head_re.match(line)
+            if not match:
+                continue
+            if self.__match(match.group(1)):
+                yield pending[::-1]
+            pending = []
+        # 文件开头没有首行的内容
+        if pending and not self.min_level:
+            yield pending[::-1]
+
+    def tail(self, length: int) -> List[str]:
+        """
+        读取文件末尾符合条件的行
+        :param length: 行数
+        :return: 按正序排列的行
+        """
+        if not self.path.exists():
+            return []
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            end = stat.st_size
+            self._position, self._inode = end, stat.st_ino
+            # 文件以换行结尾时不计最后的空行
+            if end:
+                f.seek(end - 1)
+                if f.read(1) == b"\n":
+                    end -= 1
+            lines = []
+            for record in self.__reverse_records(f, end):
+                lines[:0] = record
+                if len(lines) >= length:
+                    break
+        return lines[-length:] if length else []
+
+    def reverse(self) -> Generator[str, None, None]:
+        """
+        倒序读取全部符合条件的行
+        """
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            for record in self.__reverse_records(f, os.fstat(f.fileno()).st_size):
+                for line in reversed(record):
+                    yield line
+
+    def follow(self, stopped: Callable[[], bool]) -> Generator[str, None, None]:
+        """
+        跟踪文件新增的行，通过文件变化通知唤醒，文件轮转后从新文件开头读取
+        :param stopped: 是否停止跟踪
+        """
+        monitor = LogMonitor()
+        changed = monitor.subscribe(self.path)
+        f = None
+        try:
+            buffer = b""
+            # 多行记录的续行沿用首行的级别
+            matched = True
+            while not stopped():
+                # 读取前清除通知，读取期间的变化会再次唤醒，只在没有读到数据时等待
+                changed.clear()
+                if f is None and self.path.exists():
+                    f = open(self.path, "rb")
+                    stat = os.fstat(f.fileno())
+                    if stat.st_ino == self._inode and stat.st_size >= self._position:
+                        f.seek(self._position)
+                    self._inode = stat.st_ino
+                if f:
+                    data = f.read()
+                    if data:
+                        lines = (buffer + data).split(b"\n")
+                        buffer = lines.pop()
+                        for line in lines:
+                            line = self.__decode(line)
+                            match = _record_head_re.match(line)
+                            if match:
+                                matched = self.__match(match.group(1))
+                            if matched:
+                                yield line
+                        continue
+                    # 文件已轮转或被截断，从新文件开头读取
+                    try:
+                        stat = os.stat(self.path)
+                        if stat.st_ino != self._inode or stat.st_size < f.tell():
+                            f.close()
+                            f = None
+                            buffer = b""
+                            self._position = 0
+                            continue
+                    except OSError:
+                        pass
+                changed.wait(self._check_interval)
+        finally:
+            if f:
+                f.close()
+            monitor.unsubscribe(self.path, changed)
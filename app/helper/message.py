@@ -1,19 +1,23 @@
 import json
-import queue
 import time
 from typing import Optional, Any, Union
 
+from app.utils.broadcast import BroadcastHub
 from app.utils.singleton import Singleton
 
 
 class MessageHelper(metaclass=Singleton):
     """
-    消息队列管理器，包括系统消息和用户消息
+    消息管理器，包括系统消息和用户消息，消息广播给所有订阅者，
+    没有订阅者时暂存，由之后的第一个订阅者接收
     """
 
+    # 没有订阅者时每个频道最多暂存的消息数量
+    _backlog = 100
+
     def __init__(self):
-        self.sys_queue = queue.Queue()
-        self.user_queue = queue.Queue()
+        # 频道为system：系统消息，user：用户消息
+        self.hub = BroadcastHub(backlog=self._backlog)
 
     def put(self, message: Any, role: str = "plugin", title: str = None, note: Union[list, dict] = None):
         """
@@ -28,7 +32,7 @@ class MessageHelper(metaclass=Singleton):
             if role == "plugin" and not title:
                 title = "插件通知"
             # 系统通知，默认
-            self.sys_queue.put(json.dumps({
+            self.hub.publish("system", json.dumps({
                 "type": role,
                 "title": title,
                 "text": message,
@@ -38,7 +42,7 @@ class MessageHelper(metaclass=Singleton):
         else:
             if isinstance(message, str):
                 # 非系统的文本通知
-                self.user_queue.put(json.dumps({
+                self.hub.publish("user", json.dumps({
                     "title": title,
                     "text": message,
                     "date": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
@@ -50,17 +54,18 @@ class MessageHelper(metaclass=Singleton):
                 content['title'] = title
                 content['date'] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
                 content['note'] = note
-                self.user_queue.put(json.dumps(content))
+                self.hub.publish("user", json.dumps(content))
 
     def get(self, role: str = "system") -> Optional[str]:
         """
-        取消息
+        取一条没有订阅者时暂存的消息
         :param role: 消息通道 systm：系统消息，plugin：插件消息，user：用户消息
         """
-        if role == "system":
-            if not self.sys_queue.empty():
-                return self.sys_queue.get(block=False)
-        else:
-            if not self.user_queue.empty():
-                return self.user_queue.get(block=False)
-        return None
+        return self.hub.pop(self.channel(role))
+
+    @staticmethod
+    def channel(role: str) -> str:
+        """
+        消息通道对应的广播频道
+        """
+        return "system" if role == "system" else "user"
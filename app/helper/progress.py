@@ -2,6 +2,7 @@ from enum import Enum
 from typing import Union, Dict
 
 from app.schemas.types import ProgressKey
+from app.utils.broadcast import BroadcastHub
 from app.utils.singleton import Singleton
 
 
@@ -10,6 +11,15 @@ class ProgressHelper(metaclass=Singleton):
 
     def __init__(self):
         self._process_detail = {}
+        # 进度变化广播，频道为进度KEY
+        self.hub = BroadcastHub()
+
+    def __publish(self, key: str):
+        """
+        广播进度变化
+        """
+        detail = self._process_detail.get(key)
+        self.hub.publish(key, dict(detail) if detail else detail)
 
     def init_config(self):
         pass
@@ -28,6 +38,7 @@ class ProgressHelper(metaclass=Singleton):
         if isinstance(key, Enum):
             key = key.value
         self._process_detail[key]['enable'] = True
+        self.__publish(key)
 
     def end(self, key: Union[ProgressKey, str]):
         if isinstance(key, Enum):
@@ -39,6 +50,7 @@ class ProgressHelper(metaclass=Singleton):
             "value": 100,
             "text": "正在处理..."
         }
+        self.__publish(key)
 
     def update(self, key: Union[ProgressKey, str], value: float = None, text: str = None):
         if isinstance(key, Enum):
@@ -49,6 +61,7 @@ class ProgressHelper(metaclass=Singleton):
             self._process_detail[key]['value'] = value
         if text:
             self._process_detail[key]['text'] = text
+        self.__publish(key)
 
     def get(self, key: Union[ProgressKey, str]) -> dict:
         if isinstance(key, Enum):
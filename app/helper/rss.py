@@ -1,7 +1,7 @@
 import re
 import traceback
-import xml.dom.minidom
-from typing import List, Tuple, Union
+from io import BytesIO
+from typing import Callable, List, Tuple, Union
 from urllib.parse import urljoin
 
 import chardet
@@ -10,7 +10,6 @@ from lxml import etree
 from app.core.config import settings
 from app.helper.browser import PlaywrightHelper
 from app.log import logger
-from app.utils.dom import DomUtils
 from app.utils.http import RequestUtils
 from app.utils.string import StringUtils
 
@@ -19,6 +18,12 @@ class RssHelper:
     """
     RSS帮助类，解析RSS报文、获取RSS地址等
     """
+    # 检测编码时读取的报文长度
+    _detect_size = 64 * 1024
+    # 连续出现该数量已处理过的种子时不再解析后续的种子
+    _known_stop_count = 3
+    # XML声明
+    _xml_declaration = re.compile(r"^\s*<\?xml[^>]*\?>")
     # 各站点RSS链接获取配置
     rss_link_conf = {
         "default": {
@@ -225,16 +230,16 @@ class RssHelper:
     }
 
     @staticmethod
-    def parse(url, proxy: bool = False, timeout: int = 15) -> Union[List[dict], None]:
+    def parse(url, proxy: bool = False, timeout: int = 15,
+              known: Callable[[dict], bool] = None) -> Union[List[dict], None]:
         """
         解析RSS订阅URL，获取RSS中的种子信息
         :param url: RSS地址
         :param proxy: 是否使用代理
         :param timeout: 请求超时
+        :param known: 判断种子是否已处理过，连续出现已处理过的种子时不再解析后续的种子
         :return: 种子信息列表，如为None代表Rss过期
         """
-        # 开始处理
-        ret_array: list = []
         if not url:
             return []
         try:
@@ -244,84 +249,116 @@ class RssHelper:
         except Exception as err:
             logger.error(f"获取RSS失败：{str(err)} - {traceback.format_exc()}")
             return []
-        if ret:
-            ret_xml = ""
+        raw_data = ret.content
+        if not raw_data:
+            return []
+        try:
             try:
-                # 使用chardet检测字符编码
-                raw_data = ret.content
-                if raw_data:
-                    try:
-                        result = chardet.detect(raw_data)
-                        encoding = result['encoding']
-                        # 解码为字符串
-                        ret_xml = raw_data.decode(encoding)
-                    except Exception as e:
-                        logger.debug(f"chardet解码失败：{str(e)}")
-                        # 探测utf-8解码
-                        match = re.search(r'encoding\s*=\s*["\']([^"\']+)["\']', ret.text)
-                        if match:
-                            encoding = match.group(1)
-                            if encoding:
-                                ret_xml = raw_data.decode(encoding)
-                        else:
-                            ret.encoding = ret.apparent_encoding
-                if not ret_xml:
-                    ret_xml = ret.text
-                # 解析XML
-                dom_tree = xml.dom.minidom.parseString(ret_xml)
-                rootNode = dom_tree.documentElement
-                items = rootNode.getElementsByTagName("item")
-                for item in items:
-                    try:
-                        # 标题
-                        title = DomUtils.tag_value(item, "title", default="")
-                        if not title:
-                            continue
-                        # 描述
-                        description = DomUtils.tag_value(item, "description", default="")
-                        # 种子页面
-                        link = DomUtils.tag_value(item, "link", default="")
-                        # 种子链接
-                        enclosure = DomUtils.tag_value(item, "enclosure", "url", default="")
-                        if not enclosure and not link:
-                            continue
-                        # 部分RSS只有link没有enclosure
-                        if not enclosure and link:
-                            enclosure = link
-                        # 大小
-                        size = DomUtils.tag_value(item, "enclosure", "length", default=0)
-                        if size and str(size).isdigit():
-                            size = int(size)
-                        else:
-                            size = 0
-                        # 发布日期
-                        pubdate = DomUtils.tag_value(item, "pubDate", default="")
-                        if pubdate:
-                            # 转换为时间
-                            pubdate = StringUtils.get_time(pubdate)
-                        # 返回对象
-                        tmp_dict = {'title': title,
-                                    'enclosure': enclosure,
-                                    'size': size,
-                                    'description': description,
-                                    'link': link,
-                                    'pubdate': pubdate}
-                        ret_array.append(tmp_dict)
-                    except Exception as e1:
-                        logger.debug(f"解析RSS失败：{str(e1)} - {traceback.format_exc()}")
-                        continue
-            except Exception as e2:
-                logger.error(f"解析RSS失败：{str(e2)} - {traceback.format_exc()}")
-                # RSS过期 观众RSS 链接已过期，您需要获得一个新的！  pthome RSS Link has expired, You need to get a new one!
-                _rss_expired_msg = [
-                    "RSS 链接已过期, 您需要获得一个新的!",
-                    "RSS Link has expired, You need to get a new one!",
-                    "RSS Link has expired, You need to get new!"
-                ]
-                if ret_xml in _rss_expired_msg:
-                    return None
+                # 按XML声明的编码解析，没有声明时为UTF-8
+                return RssHelper.parse_xml(raw_data, known=known)
+            except etree.XMLSyntaxError as err:
+                # 声明的编码不正确或没有声明编码，检测编码后重新解析
+                encoding = chardet.detect(raw_data[:RssHelper._detect_size]).get("encoding")
+                if not encoding:
+                    raise
+                logger.debug(f"RSS按声明的编码解析失败，使用检测到的编码 {encoding} 重新解析：{str(err)}")
+                content = raw_data.decode(encoding, errors="replace")
+                content = RssHelper._xml_declaration.sub("", content, count=1)
+                return RssHelper.parse_xml(content.encode("utf-8"), known=known)
+        except Exception as err:
+            logger.error(f"解析RSS失败：{str(err)} - {traceback.format_exc()}")
+            # RSS过期 观众RSS 链接已过期，您需要获得一个新的！  pthome RSS Link has expired, You need to get a new one!
+            _rss_expired_msg = [
+                "RSS 链接已过期, 您需要获得一个新的!",
+                "RSS Link has expired, You need to get a new one!",
+                "RSS Link has expired, You need to get new!"
+            ]
+            if ret.text.strip() in _rss_expired_msg:
+                return None
+        return []
+
+    @staticmethod
+    def parse_xml(content: bytes, known: Callable[[dict], bool] = None) -> List[dict]:
+        """
+        流式解析RSS报文，逐个处理item，已处理的item及时释放
+        :param content: RSS报文
+        :param known: 判断种子是否已处理过，连续出现已处理过的种子时不再解析后续的种子
+        :return: 种子信息列表
+        :raises: etree.XMLSyntaxError 报文格式错误
+        """
+        ret_array: list = []
+        # 连续出现已处理过的种子数
+        known_count = 0
+        # 按本地名称匹配，兼容使用默认命名空间的RSS 1.0（RDF）
+        for _, item in etree.iterparse(BytesIO(content), events=("end",), tag="{*}item",
+                                       resolve_entities=False, huge_tree=True):
+            try:
+                # 标题
+                title = RssHelper.__tag_value(item, "title", default="")
+                if not title:
+                    continue
+                # 描述
+                description = RssHelper.__tag_value(item, "description", default="")
+                # 种子页面
+                link = RssHelper.__tag_value(item, "link", default="")
+                # 种子链接
+                enclosure = RssHelper.__tag_value(item, "enclosure", "url", default="")
+                if not enclosure and not link:
+                    continue
+                # 部分RSS只有link没有enclosure
+                if not enclosure and link:
+                    enclosure = link
+                # 大小
+                size = RssHelper.__tag_value(item, "enclosure", "length", default=0)
+                if size and str(size).isdigit():
+                    size = int(size)
+                else:
+                    size = 0
+                # 发布日期
+                pubdate = RssHelper.__tag_value(item, "pubDate", default="")
+                if pubdate:
+                    # 转换为时间
+                    pubdate = StringUtils.get_time(pubdate)
+                # 返回对象
+                tmp_dict = {'title': title,
+                            'enclosure': enclosure,
+                            'size': size,
+                            'description': description,
+                            'link': link,
+                            'pubdate': pubdate}
+                ret_array.append(tmp_dict)
+                if known:
+                    known_count = known_count + 1 if known(tmp_dict) else 0
+                    if known_count >= RssHelper._known_stop_count:
+                        logger.debug(f"RSS中连续 {known_count} 个种子已处理过，不再解析后续的种子")
+                        break
+            except Exception as e1:
+                logger.debug(f"解析RSS失败：{str(e1)} - {traceback.format_exc()}")
+                continue
+            finally:
+                # 释放已处理的item
+                item.clear()
+                while item.getprevious() is not None:
+                    del item.getparent()[0]
         return ret_array
 
+    @staticmethod
+    def __tag_value(item, tag_name: str, attname: str = "",
+                    default: Union[str, int] = None) -> Union[str, int]:
+        """
+        解析item中第一个指定标签的值，标签与item在同一命名空间
+        """
+        namespace = item.tag[:item.tag.index("}") + 1] if item.tag.startswith("{") else ""
+        tag = next(item.iter(namespace + tag_name), None)
+        if tag is not None:
+            if attname:
+                attvalue = tag.get(attname)
+                if attvalue:
+                    return attvalue
+            elif tag.text:
+                return tag.text
+        return default
+
     def get_rss_link(self, url: str, cookie: str, ua: str, proxy: bool = False) -> Tuple[str, str]:
         """
         获取站点rss地址
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Dict, Optional, Tuple, Callable
+
+from app.core.config import settings
+from app.utils.singleton import Singleton
+
+
+class SearchFuture(Future):
+    """
+    站点搜索任务，记录任务开始执行的时间，超时从开始执行时计算，不包含排队等待的时间
+    """
+
+    def __init__(self):
+        super().__init__()
+        # 开始执行的时间（time.monotonic），未开始时为None
+        self.start_time: Optional[float] = None
+
+
+class SearchPoolHelper(metaclass=Singleton):
+    """
+    站点搜索线程池，所有搜索共用，限制全局及单个站点的并发数，
+    前台搜索（页面、消息交互）优先调度，后台搜索（订阅）按比例获得执行机会不会被饿死
+    """
+
+    # 前台搜索连续调度的次数，达到后让出一次给后台搜索
+    _foreground_weight = 3
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        # 等待执行的任务 {是否后台: 任务队列}
+        self._queues: Dict[bool, deque] = {
+            False: deque(),
+            True: deque()
+        }
+        # 各站点正在执行的任务数
+        self._running: Dict[str, int] = {}
+        # 前台搜索已连续调度的次数
+        self._foreground_count = 0
+        for i in range(max(settings.SEARCH_THREADS, 1)):
+            threading.Thread(target=self.__worker, name=f"search-{i}", daemon=True).start()
+
+    def submit(self, domain: str, background: bool, func: Callable, *args, **kwargs) -> SearchFuture:
+        """
+        提交站点搜索任务，未开始执行的任务可通过future.cancel()取消
+        :param domain: 站点域名，用于限制单个站点的并发数
+        :param background: 是否为后台搜索
+        :param func: 函数
+        :param args: 参数
+        :param kwargs: 参数
+        :return: future
+        """
+        future = SearchFuture()
+        with self._cond:
+            self._queues[background].append((domain, future, func, args, kwargs))
+            self._cond.notify()
+        return future
+
+    def __next_task(self) -> Optional[Tuple[str, SearchFuture, Callable, tuple, dict]]:
+        """
+        按调度顺序取出下一个可执行的任务，需在持有锁时调用
+        """
+        if self._foreground_count >= self._foreground_weight:
+            order = (True, False)
+        else:
+            order = (False, True)
+        site_limit = max(settings.SEARCH_SITE_THREADS, 1)
+        for background in order:
+            queue = self._queues[background]
+            for index, task in enumerate(queue):
+                domain, future = task[0], task[1]
+                if not future.cancelled() and self._running.get(domain, 0) >= site_limit:
+                    continue
+                del queue[index]
+                if background:
+                    self._foreground_count = 0
+                else:
+                    self._foreground_count += 1
+                return task
+        return None
+
+    def __worker(self):
+        """
+        工作线程
+        """
+        while True:
+            with self._cond:
+                task = self.__next_task()
+                while not task:
+                    self._cond.wait()
+                    task = self.__next_task()
+                domain, future, func, args, kwargs = task
+                # 已取消的任务直接丢弃
+                if not future.set_running_or_notify_cancel():
+                    continue
+                future.start_time = time.monotonic()
+                self._running[domain] = self._running.get(domain, 0) + 1
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as err:
+                future.set_exception(err)
+            finally:
+                with self._cond:
+                    self._running[domain] -= 1
+                    self._cond.notify_all()
@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+import zlib
+from typing import List, Optional, Any, Union
+
+from app.core.config import settings
+from app.core.context import Context
+from app.db.systemconfig_oper import SystemConfigOper
+from app.log import logger
+from app.schemas.types import SystemConfigKey
+from app.utils.singleton import Singleton
+from app.utils.sqlite import SqliteUtils
+
+
+class SearchResultHelper(metaclass=Singleton):
+    """
+    搜索结果存储，每个用户保留最近几次搜索，逐条压缩存储资源，支持分页读取
+    """
+
+    # 数据库文件
+    _db_file = "__search_results__.db"
+    # 每个用户保留的搜索次数
+    _keep_count = 5
+    # 搜索结果保留时间（秒）
+    _expire_seconds = 24 * 3600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS searches ("
+                           "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "userid TEXT NOT NULL, "
+                           "keyword TEXT, "
+                           "total INTEGER NOT NULL, "
+                           "medias BLOB, "
+                           "created INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_searches_userid ON searches (userid, id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                           "search_id INTEGER NOT NULL, "
+                           "idx INTEGER NOT NULL, "
+                           "data BLOB NOT NULL, "
+                           "PRIMARY KEY (search_id, idx))")
+        # 清理旧版保存在系统配置中的搜索结果
+        systemconfig = SystemConfigOper()
+        if systemconfig.get(SystemConfigKey.SearchResults):
+            systemconfig.delete(SystemConfigKey.SearchResults)
+
+    @staticmethod
+    def __dumps(obj: Any) -> bytes:
+        """
+        序列化并压缩
+        """
+        return zlib.compress(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"))
+
+    @staticmethod
+    def __loads(data: bytes) -> Any:
+        """
+        解压并反序列化
+        """
+        return json.loads(zlib.decompress(data).decode("utf-8"))
+
+    def save(self, contexts: List[Context], userid: Union[str, int] = None, keyword: str = None) -> int:
+        """
+        保存一次搜索的结果，同一次搜索中相同的媒体信息只保存一份
+        :param contexts: 搜索结果
+        :param userid: 用户ID
+        :param keyword: 搜索关键词
+        :return: 搜索记录ID
+        """
+        medias = []
+        media_indexes = {}
+        rows = []
+        for idx, context in enumerate(contexts or []):
+            media_index = None
+            if context.media_info:
+                media_index = media_indexes.get(id(context.media_info))
+                if media_index is None:
+                    media_index = len(medias)
+                    media_indexes[id(context.media_info)] = media_index
+                    medias.append(context.media_info.to_dict())
+            rows.append((idx, self.__dumps({
+                "meta_info": context.meta_info.to_dict() if context.meta_info else None,
+                "torrent_info": context.torrent_info.to_dict() if context.torrent_info else None,
+                "media_info": media_index
+            })))
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                search_id = self._conn.execute("INSERT INTO searches (userid, keyword, total, medias, created) "
+                                               "VALUES (?, ?, ?, ?, ?)",
+                                               (str(userid or ""), keyword, len(rows),
+                                                self.__dumps(medias), int(time.time()))).lastrowid
+                self._conn.executemany("INSERT INTO results (search_id, idx, data) VALUES (?, ?, ?)",
+                                       [(search_id, idx, data) for idx, data in rows])
+                self.__expire(userid=str(userid or ""))
+        return search_id
+
+    def get(self, userid: Union[str, int] = None, page: int = 1, count: int = 0) -> List[dict]:
+        """
+        读取用户最近一次搜索的结果
+        :param userid: 用户ID，为空时读取所有用户中最近一次的搜索
+        :param page: 页码，从1开始
+        :param count: 每页数量，为0时返回全部
+        :return: 与Context.to_dict()格式相同的字典列表
+        """
+        with self._lock:
+            if userid is None:
+                search = self._conn.execute("SELECT id, medias FROM searches "
+                                            "WHERE created > ? ORDER BY id DESC LIMIT 1",
+                                            (int(time.time()) - self._expire_seconds,)).fetchone()
+            else:
+                search = self._conn.execute("SELECT id, medias FROM searches "
+                                            "WHERE userid = ? AND created > ? ORDER BY id DESC LIMIT 1",
+                                            (str(userid), int(time.time()) - self._expire_seconds)).fetchone()
+            if not search:
+                return []
+            search_id, medias = search
+            sql = "SELECT data FROM results WHERE search_id = ? ORDER BY idx"
+            params = [search_id]
+            if count:
+                sql += " LIMIT ? OFFSET ?"
+                params.extend([count, (max(page, 1) - 1) * count])
+            rows = self._conn.execute(sql, params).fetchall()
+        try:
+            medias = self.__loads(medias) if medias else []
+            results = []
+            for (data,) in rows:
+                result = self.__loads(data)
+                media_index: Optional[int] = result.get("media_info")
+                result["media_info"] = medias[media_index] if media_index is not None else None
+                results.append(result)
+            return results
+        except Exception as err:
+            logger.error(f"加载搜索结果失败：{str(err)}")
+            return []
+
+    def __expire(self, userid: str):
+        """
+        清理过期的搜索以及用户超出保留次数的搜索，需在事务中调用
+        """
+        self._conn.execute("DELETE FROM searches WHERE created <= ? OR (userid = ? AND id NOT IN "
+                           "(SELECT id FROM searches WHERE userid = ? ORDER BY id DESC LIMIT ?))",
+                           (int(time.time()) - self._expire_seconds, userid, userid, self._keep_count))
+        self._conn.execute("DELETE FROM results WHERE search_id NOT IN (SELECT id FROM searches)")
+
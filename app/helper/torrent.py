@@ -10,7 +10,7 @@ from torrentool.api import Torrent
 
 from app.core.config import settings
 from app.core.context import Context, TorrentInfo, MediaInfo
-from app.core.metainfo import MetaInfo
+from app.core.metainfo import MetaInfo, MetaInfoBatch
 from app.db.systemconfig_oper import SystemConfigOper
 from app.log import logger
 from app.utils.http import RequestUtils
@@ -272,6 +272,7 @@ class TorrentHelper(metaclass=Singleton):
         从种子的文件清单中获取所有集数
         """
         episodes = []
+        file_stems = []
         for file in files:
             if not file:
                 continue
@@ -279,7 +280,8 @@ class TorrentHelper(metaclass=Singleton):
             if file_path.suffix not in settings.RMT_MEDIAEXT:
                 continue
             # 只使用文件名识别
-            meta = MetaInfo(file_path.stem)
+            file_stems.append(file_path.stem)
+        for meta in MetaInfoBatch(file_stems):
             if not meta.begin_episode:
                 continue
             episodes = list(set(episodes).union(set(meta.episode_list)))
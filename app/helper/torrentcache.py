@@ -0,0 +1,136 @@
+import pickle
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.context import Context, TorrentInfo
+from app.log import logger
+from app.utils.singleton import Singleton
+from app.utils.sqlite import SqliteUtils
+
+
+class TorrentCacheHelper(metaclass=Singleton):
+    """
+    站点种子缓存，按缓存类型、站点和种子标识逐条存储，刷新时只写入新增的种子
+    """
+
+    # 缓存数据库文件
+    _db_file = "__torrents_cache__.db"
+    # 旧版整体序列化的缓存文件 {缓存类型: 文件名}
+    _legacy_files = {
+        "spider": "__torrents_cache__",
+        "rss": "__rss_cache__"
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS torrents ("
+                           "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                           "stype TEXT NOT NULL, "
+                           "domain TEXT NOT NULL, "
+                           "key TEXT NOT NULL, "
+                           "enclosure TEXT, "
+                           "context BLOB NOT NULL, "
+                           "UNIQUE (stype, domain, key))")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_torrents_domain ON torrents (stype, domain, seq)")
+        self.__migrate()
+
+    @staticmethod
+    def get_key(torrent: TorrentInfo) -> str:
+        """
+        种子在站点缓存中的唯一标识
+        """
+        return f'{torrent.title}{torrent.description}'
+
+    def get(self, stype: str, domains: List[str] = None) -> Dict[str, List[Context]]:
+        """
+        读取缓存的种子，按加入缓存的先后排序
+        :param stype: 缓存类型，spider:爬虫缓存，rss:rss缓存
+        :param domains: 站点域名列表，为空则读取全部站点
+        """
+        sql = "SELECT domain, context FROM torrents WHERE stype = ?"
+        params = [stype]
+        if domains:
+            sql += f" AND domain IN ({','.join('?' * len(domains))})"
+            params.extend(domains)
+        sql += " ORDER BY seq"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        ret: Dict[str, List[Context]] = {}
+        for domain, data in rows:
+            try:
+                ret.setdefault(domain, []).append(pickle.loads(data))
+            except Exception as err:
+                logger.error(f"加载种子缓存 {domain} 出错：{str(err)}")
+        return ret
+
+    def keys(self, stype: str, domain: str) -> Dict[str, Optional[str]]:
+        """
+        读取站点已缓存种子的标识，不加载种子内容
+        :return: {种子标识: 种子链接}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT key, enclosure FROM torrents "
+                                      "WHERE stype = ? AND domain = ? ORDER BY seq",
+                                      (stype, domain)).fetchall()
+        return dict(rows)
+
+    def append(self, stype: str, domain: str, contexts: List[Context], limit: int = None):
+        """
+        追加站点新种子，已存在的种子移到最后
+        :param stype: 缓存类型
+        :param domain: 站点域名
+        :param contexts: 新种子上下文
+        :param limit: 站点最多保留的种子数，超过时移除最早缓存的
+        """
+        rows = [(stype, domain, self.get_key(context.torrent_info),
+                 context.torrent_info.enclosure, pickle.dumps(context))
+                for context in contexts]
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                self._conn.executemany("INSERT OR REPLACE INTO torrents (stype, domain, key, enclosure, context) "
+                                       "VALUES (?, ?, ?, ?, ?)", rows)
+                if limit:
+                    self._conn.execute("DELETE FROM torrents WHERE stype = ? AND domain = ? AND seq NOT IN "
+                                       "(SELECT seq FROM torrents WHERE stype = ? AND domain = ? "
+                                       "ORDER BY seq DESC LIMIT ?)",
+                                       (stype, domain, stype, domain, limit))
+
+    def delete(self, stype: str, domain: str, keys: Set[str]):
+        """
+        删除站点指定的种子
+        """
+        if not keys:
+            return
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                self._conn.executemany("DELETE FROM torrents WHERE stype = ? AND domain = ? AND key = ?",
+                                       [(stype, domain, key) for key in keys])
+
+    def clear(self):
+        """
+        清空所有种子缓存
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM torrents")
+            self._conn.execute("VACUUM")
+
+    def __migrate(self):
+        """
+        导入旧版整体序列化的缓存文件，导入后删除
+        """
+        for stype, filename in self._legacy_files.items():
+            cache_path: Path = settings.TEMP_PATH / filename
+            if not cache_path.exists():
+                continue
+            try:
+                with open(cache_path, 'rb') as f:
+                    cache: Dict[str, List[Context]] = pickle.load(f) or {}
+                for domain, contexts in cache.items():
+                    self.append(stype, domain, contexts)
+                logger.info(f"已导入旧版种子缓存 {filename}")
+            except Exception as err:
+                logger.error(f"导入旧版种子缓存 {filename} 出错：{str(err)}")
+            cache_path.unlink(missing_ok=True)
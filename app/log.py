@@ -1,8 +1,11 @@
-import inspect
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import sys
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict, Any
+from types import CodeType
+from typing import Dict, Any, Tuple, Optional
 
 import click
 
@@ -39,9 +42,43 @@ class LoggerManager:
     _loggers: Dict[str, Any] = {}
     # 默认日志文件
     _default_log_file = "moviepilot.log"
+    # 日志方法对应的级别
+    _levels: Dict[str, int] = {
+        "debug": logging.DEBUG,
+        "info": logging.INFO,
+        "warning": logging.WARNING,
+        "error": logging.ERROR,
+        "critical": logging.CRITICAL
+    }
+    # 代码对象所在文件的识别结果缓存 {代码对象: (文件名称, 插件名称, 是否继续向上查找)}
+    _code_cache: Dict[CodeType, Tuple[str, Optional[str], bool]] = {}
+    # 文件日志后台写入线程
+    _listeners: Dict[str, QueueListener] = {}
 
     @staticmethod
-    def __get_caller():
+    def __parse_code(code: CodeType) -> Tuple[str, Optional[str], bool]:
+        """
+        识别代码对象所在文件的文件名称、插件名称，以及是否需要继续向上层调用者查找
+        """
+        parts = Path(code.co_filename).parts
+        # 文件名称
+        if parts[-1] == "__init__.py":
+            caller_name = parts[-2]
+        else:
+            caller_name = parts[-1]
+        if "app" in parts:
+            if "plugins" in parts:
+                # 插件名称
+                plugin_name = parts[parts.index("plugins") + 1]
+                if plugin_name == "__init__.py":
+                    plugin_name = "plugin"
+                return caller_name, plugin_name, False
+            # 已经到达程序的入口时停止
+            return caller_name, None, "main.py" not in parts
+        # 已经超出程序范围时停止
+        return caller_name, None, len(parts) == 1
+
+    def __get_caller(self):
         """
         获取调用者的文件名称与插件名称(如果是插件调用内置的模块, 也能写入到插件日志文件中)
         """
@@ -49,32 +86,30 @@ class LoggerManager:
         caller_name = None
         # 调用者插件名称
         plugin_name = None
-        for i in inspect.stack()[3:]:
-            filepath = Path(i.filename)
-            parts = filepath.parts
+        # 跳过__get_caller、logger及info等日志方法本身
+        frame = sys._getframe(3)
+        while frame:
+            code = frame.f_code
+            code_info = self._code_cache.get(code)
+            if not code_info:
+                code_info = self.__parse_code(code)
+                self._code_cache[code] = code_info
+            file_name, plugin_name, go_on = code_info
             if not caller_name:
-                # 设定调用者文件名称
-                if parts[-1] == "__init__.py":
-                    caller_name = parts[-2]
-                else:
-                    caller_name = parts[-1]
-            if "app" in parts:
-                if not plugin_name and "plugins" in parts:
-                    # 设定调用者插件名称
-                    plugin_name = parts[parts.index("plugins") + 1]
-                    if plugin_name == "__init__.py":
-                        plugin_name = "plugin"
-                    break
-                if "main.py" in parts:
-                    # 已经到达程序的入口
-                    break
-            elif len(parts) != 1:
-                # 已经超出程序范围
+                caller_name = file_name
+            if not go_on:
                 break
+            frame = frame.f_back
         return caller_name or "log.py", plugin_name
 
     @staticmethod
-    def __setup_logger(log_file: str):
+    def __get_level() -> int:
+        """
+        当前的日志级别
+        """
+        return logging.DEBUG if settings.DEBUG else logging.INFO
+
+    def __setup_logger(self, log_file: str):
         """
         设置日志
         log_file：日志文件相对路径
@@ -87,10 +122,7 @@ class LoggerManager:
         _logger = logging.getLogger(log_file_path.stem)
 
         # DEBUG
-        if settings.DEBUG:
-            _logger.setLevel(logging.DEBUG)
-        else:
-            _logger.setLevel(logging.INFO)
+        _logger.setLevel(self.__get_level())
 
         # 移除已有的 handler，避免重复添加
         for handler in _logger.handlers:
@@ -102,7 +134,7 @@ class LoggerManager:
         console_handler.setFormatter(console_formatter)
         _logger.addHandler(console_handler)
 
-        # 文件日志
+        # 文件日志，通过队列由后台线程写入，避免阻塞调用方
         file_handler = RotatingFileHandler(filename=log_file_path,
                                            mode='w',
                                            maxBytes=5 * 1024 * 1024,
@@ -110,17 +142,35 @@ class LoggerManager:
                                            encoding='utf-8')
         file_formater = CustomFormatter(f"【%(levelname)s】%(asctime)s - %(message)s")
         file_handler.setFormatter(file_formater)
-        _logger.addHandler(file_handler)
+        log_queue = queue.SimpleQueue()
+        _logger.addHandler(QueueHandler(log_queue))
+        listener = self._listeners.pop(log_file, None)
+        if listener:
+            listener.stop()
+        listener = QueueListener(log_queue, file_handler)
+        listener.start()
+        self._listeners[log_file] = listener
 
         return _logger
 
+    @classmethod
+    def stop(cls):
+        """
+        停止后台写入线程，写完队列中剩余的日志
+        """
+        for listener in cls._listeners.values():
+            listener.stop()
+        cls._listeners.clear()
+
     def logger(self, method: str, msg: str, *args, **kwargs):
         """
         获取模块的logger
         :param method: 日志方法
         :param msg: 日志信息
         """
-
+        # 先判断级别，不会输出的日志不再查找调用者
+        if self._levels.get(method, logging.CRITICAL) < self.__get_level():
+            return
         # 获取调用者文件名和插件名
         caller_name, plugin_name = self.__get_caller()
         # 区分插件日志
@@ -180,3 +230,5 @@ class LoggerManager:
 
 # 初始化公共日志
 logger = LoggerManager()
+# 退出时写完队列中剩余的日志
+atexit.register(LoggerManager.stop)
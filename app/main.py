@@ -235,6 +235,8 @@ def start_module():
 
 
 if __name__ == '__main__':
+    # 打包的二进制文件支持多进程
+    multiprocessing.freeze_support()
     # 启动托盘
     start_tray()
     # 初始化数据库
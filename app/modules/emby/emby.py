@@ -596,28 +596,75 @@ class Emby:
 
     def get_items(self, parent: str) -> Generator:
         """
-        获取媒体服务器所有媒体库列表
+        分页获取媒体库中的全部电影和电视剧，条目详情及电视剧的季集信息随列表一并返回，
+        查询失败时抛出异常，避免同步时把未读取到的条目当作已删除
         """
         if not parent:
             yield None
+            return
         if not self._host or not self._apikey:
             yield None
-        req_url = "%semby/Users/%s/Items?ParentId=%s&api_key=%s" % (self._host, self.user, parent, self._apikey)
-        try:
-            res = RequestUtils().get_res(req_url)
-            if res and res.status_code == 200:
-                results = res.json().get("Items") or []
-                for result in results:
-                    if not result:
-                        continue
-                    if result.get("Type") in ["Movie", "Series"]:
-                        yield self.get_iteminfo(result.get("Id"))
-                    elif "Folder" in result.get("Type"):
-                        for item in self.get_items(parent=result.get('Id')):
-                            yield item
-        except Exception as e:
-            logger.error(f"连接Users/Items出错：" + str(e))
-        yield None
+            return
+        # 媒体库中所有剧集的季集信息
+        series_episodes: Dict[str, Dict[int, List[int]]] = {}
+        for episode in self.__get_items_paged(parent=parent, item_types="Episode",
+                                              fields="", extra="&IsMissing=false"):
+            series_id = episode.get("SeriesId")
+            season_index = episode.get("ParentIndexNumber")
+            episode_index = episode.get("IndexNumber")
+            if not series_id or not season_index or not episode_index:
+                continue
+            series_episodes.setdefault(series_id, {}).setdefault(season_index, []).append(episode_index)
+        for item in self.__get_items_paged(parent=parent, item_types="Movie,Series",
+                                           fields="ProviderIds,OriginalTitle,ProductionYear,Path,ParentId"):
+            provider_ids = item.get("ProviderIds") or {}
+            tmdbid = provider_ids.get("Tmdb")
+            seasoninfo = {}
+            if item.get("Type") == "Series":
+                seasoninfo = {season: sorted(episodes) for season, episodes
+                              in sorted(series_episodes.get(item.get("Id"), {}).items())}
+            yield schemas.MediaServerItem(
+                server="emby",
+                library=item.get("ParentId"),
+                item_id=item.get("Id"),
+                item_type=item.get("Type"),
+                title=item.get("Name"),
+                original_title=item.get("OriginalTitle"),
+                year=item.get("ProductionYear"),
+                tmdbid=int(tmdbid) if tmdbid and str(tmdbid).isdigit() else None,
+                imdbid=provider_ids.get("Imdb"),
+                tvdbid=provider_ids.get("Tvdb"),
+                path=item.get("Path"),
+                seasoninfo=seasoninfo
+            )
+
+    def __get_items_paged(self, parent: str, item_types: str, fields: str, extra: str = "",
+                          page_size: int = 500) -> Generator:
+        """
+        分页递归查询媒体库中指定类型的条目
+        :param parent: 媒体库ID
+        :param item_types: 条目类型，逗号分隔
+        :param fields: 需要额外返回的字段，逗号分隔
+        :param extra: 其它查询参数
+        :param page_size: 每页数量
+        """
+        start_index = 0
+        while True:
+            req_url = "%semby/Users/%s/Items?ParentId=%s&Recursive=true&IncludeItemTypes=%s" \
+                      "&Fields=%s&StartIndex=%s&Limit=%s%s&api_key=%s" % (
+                          self._host, self.user, parent, item_types,
+                          fields, start_index, page_size, extra, self._apikey)
+            res = RequestUtils().get_res(req_url, raise_exception=True)
+            if not res or res.status_code != 200:
+                raise Exception(f"查询媒体库 {parent} 失败，状态码：{res.status_code if res else None}")
+            result = res.json()
+            items = result.get("Items") or []
+            for item in items:
+                if item:
+                    yield item
+            start_index += len(items)
+            if not items or start_index >= (result.get("TotalRecordCount") or 0):
+                break
 
     def get_webhook_message(self, form: any, args: dict) -> Optional[schemas.WebhookEventInfo]:
         """
@@ -10,6 +10,7 @@ from app.core.context import MediaInfo
 from app.core.meta import MetaBase
 from app.core.metainfo import MetaInfo, MetaInfoPath
 from app.helper.directory import DirectoryHelper
+from app.helper.library import LibraryHelper
 from app.helper.message import MessageHelper
 from app.log import logger
 from app.modules import _ModuleBase
@@ -31,14 +32,15 @@ class FileTransferModule(_ModuleBase):
         self.messagehelper = MessageHelper()
 
     def init_module(self) -> None:
-        pass
+        # 启动媒体库索引监控
+        LibraryHelper().start()
 
     @staticmethod
     def get_name() -> str:
         return "文件整理"
 
     def stop(self):
-        pass
+        LibraryHelper().stop()
 
     def test(self) -> Tuple[bool, str]:
         """
@@ -759,8 +761,8 @@ class FileTransferModule(_ModuleBase):
             if not media_path.exists():
                 continue
 
-            # 检索媒体文件
-            media_files = SystemUtils.list_files(directory=media_path, extensions=settings.RMT_MEDIAEXT)
+            # 从媒体库索引检索媒体文件
+            media_files = LibraryHelper().list_files(directory=media_path)
             if not media_files:
                 continue
 
@@ -772,9 +774,8 @@ class FileTransferModule(_ModuleBase):
                 # 电视剧检索集数
                 seasons: Dict[int, list] = {}
                 for media_file in media_files:
-                    file_meta = MetaInfo(media_file.stem)
-                    season_index = file_meta.begin_season or 1
-                    episode_index = file_meta.begin_episode
+                    season_index = media_file.season or 1
+                    episode_index = media_file.episode
                     if not episode_index:
                         continue
                     if season_index not in seasons:
@@ -1,5 +1,8 @@
 import re
-from typing import List, Tuple, Union, Dict, Optional
+import threading
+from typing import List, Tuple, Union, Dict, Optional, Callable
+
+from cachetools import LRUCache
 
 from app.core.context import TorrentInfo, MediaInfo
 from app.core.metainfo import MetaInfo
@@ -8,11 +11,21 @@ from app.modules import _ModuleBase
 from app.modules.filter.RuleParser import RuleParser
 
 
+# 编译后的规则判断函数，参数为种子、匹配内容、媒体信息
+RulePredicate = Callable[[TorrentInfo, str, Optional[MediaInfo]], bool]
+
+
 class FilterModule(_ModuleBase):
     # 规则解析器
     parser: RuleParser = None
     # 媒体信息
     media: MediaInfo = None
+    # 已编译的规则字符串缓存
+    _compiled_rules: LRUCache = None
+    # 编译缓存对应的规则集
+    _compiled_rule_set: str = None
+    # 编译缓存锁
+    _compile_lock = threading.Lock()
 
     # 内置规则集
     rule_set: Dict[str, dict] = {
@@ -135,6 +148,8 @@ class FilterModule(_ModuleBase):
 
     def init_module(self) -> None:
         self.parser = RuleParser()
+        self._compiled_rules = LRUCache(maxsize=128)
+        self._compiled_rule_set = None
 
     @staticmethod
     def get_name() -> str:
@@ -164,6 +179,8 @@ class FilterModule(_ModuleBase):
         if not rule_string:
             return torrent_list
         self.media = mediainfo
+        # 编译规则，每个规则字符串只解析一次
+        rule_groups = self.__compile_rule_string(rule_string)
         # 返回种子列表
         ret_torrents = []
         for torrent in torrent_list:
@@ -172,7 +189,7 @@ class FilterModule(_ModuleBase):
                     and not self.__match_season_episodes(torrent, season_episodes):
                 continue
             # 能命中优先级的才返回
-            if not self.__get_order(torrent, rule_string):
+            if not self.__get_order(torrent, rule_groups, mediainfo):
                 logger.debug(f"种子 {torrent.site_name} - {torrent.title} {torrent.description} 不匹配优先级规则")
                 continue
             ret_torrents.append(torrent)
@@ -211,112 +228,140 @@ class FilterModule(_ModuleBase):
                 return False
         return True
 
-    def __get_order(self, torrent: TorrentInfo, rule_str: str) -> Optional[TorrentInfo]:
+    def __get_order(self, torrent: TorrentInfo, rule_groups: List[RulePredicate],
+                    mediainfo: MediaInfo = None) -> Optional[TorrentInfo]:
         """
         获取种子匹配的规则优先级，值越大越优先，未匹配时返回None
         """
-        # 多级规则
-        rule_groups = rule_str.split('>')
+        # 匹配项：标题、副标题、标签，每个种子只组装一次
+        content = f"{torrent.title} {torrent.description} {' '.join(torrent.labels or [])}"
         # 优先级
         res_order = 100
-        # 是否匹配
-        matched = False
 
         for rule_group in rule_groups:
-            # 解析规则组
-            parsed_group = self.parser.parse(rule_group.strip())
-            if self.__match_group(torrent, parsed_group.as_list()[0]):
+            if rule_group(torrent, content, mediainfo):
                 # 出现匹配时中断
-                matched = True
                 logger.debug(f"种子 {torrent.site_name} - {torrent.title} 优先级为 {100 - res_order + 1}")
                 torrent.pri_order = res_order
-                break
+                return torrent
             # 优先级降低，继续匹配
             res_order -= 1
 
-        return None if not matched else torrent
+        return None
+
+    def __compile_rule_string(self, rule_str: str) -> List[RulePredicate]:
+        """
+        将多级规则字符串编译为规则组判断函数列表，按规则字符串缓存，规则集变化时缓存失效
+        """
+        rule_set_key = repr(self.rule_set)
+        with self._compile_lock:
+            if rule_set_key != self._compiled_rule_set:
+                self._compiled_rules.clear()
+                self._compiled_rule_set = rule_set_key
+            rule_groups = self._compiled_rules.get(rule_str)
+            if rule_groups is None:
+                rule_groups = [self.__compile_group(self.parser.parse(rule_group.strip()).as_list()[0])
+                               for rule_group in rule_str.split('>')]
+                self._compiled_rules[rule_str] = rule_groups
+        return rule_groups
 
-    def __match_group(self, torrent: TorrentInfo, rule_group: Union[list, str]) -> bool:
+    def __compile_group(self, rule_group: Union[list, str]) -> RulePredicate:
         """
-        判断种子是否匹配规则组
+        将解析后的规则组编译为判断函数
         """
         if not isinstance(rule_group, list):
             # 不是列表，说明是规则名称
-            return self.__match_rule(torrent, rule_group)
-        elif isinstance(rule_group, list) and len(rule_group) == 1:
+            return self.__compile_rule(rule_group)
+        elif len(rule_group) == 1:
             # 只有一个规则项
-            return self.__match_group(torrent, rule_group[0])
+            return self.__compile_group(rule_group[0])
         elif rule_group[0] == "not":
             # 非操作
-            return not self.__match_group(torrent, rule_group[1:])
+            operand = self.__compile_group(rule_group[1:])
+            return lambda torrent, content, media: not operand(torrent, content, media)
         elif rule_group[1] == "and":
             # 与操作
-            return self.__match_group(torrent, rule_group[0]) and self.__match_group(torrent, rule_group[2:])
+            left, right = self.__compile_group(rule_group[0]), self.__compile_group(rule_group[2:])
+            return lambda torrent, content, media: left(torrent, content, media) and right(torrent, content, media)
         elif rule_group[1] == "or":
             # 或操作
-            return self.__match_group(torrent, rule_group[0]) or self.__match_group(torrent, rule_group[2:])
+            left, right = self.__compile_group(rule_group[0]), self.__compile_group(rule_group[2:])
+            return lambda torrent, content, media: left(torrent, content, media) or right(torrent, content, media)
+        return lambda torrent, content, media: False
 
-    def __match_rule(self, torrent: TorrentInfo, rule_name: str) -> bool:
+    def __compile_rule(self, rule_name: str) -> RulePredicate:
         """
-        判断种子是否匹配规则项
+        将规则项编译为判断函数，正则表达式预先编译
         """
-        if not self.rule_set.get(rule_name):
+        rule = self.rule_set.get(rule_name)
+        if not rule:
             # 规则不存在
-            return False
+            return lambda torrent, content, media: False
         # TMDB规则
-        tmdb = self.rule_set[rule_name].get("tmdb")
-        # 符合TMDB规则的直接返回True，即不过滤
-        if tmdb and self.__match_tmdb(tmdb):
-            return True
-        # 匹配项：标题、副标题、标签
-        content = f"{torrent.title} {torrent.description} {' '.join(torrent.labels or [])}"
+        tmdb = rule.get("tmdb")
         # 只匹配指定关键字
-        match_content = []
-        matchs = self.rule_set[rule_name].get("match") or []
-        if matchs:
-            for match in matchs:
-                if not hasattr(torrent, match):
-                    continue
-                match_value = getattr(torrent, match)
-                if not match_value:
-                    continue
-                if isinstance(match_value, list):
-                    match_content.extend(match_value)
-                else:
-                    match_content.append(match_value)
-        if match_content:
-            content = " ".join(match_content)
+        matchs = rule.get("match") or []
         # 包含规则项
-        includes = self.rule_set[rule_name].get("include") or []
+        includes = [re.compile(r"%s" % include, re.IGNORECASE) for include in rule.get("include") or []]
         # 排除规则项
-        excludes = self.rule_set[rule_name].get("exclude") or []
+        excludes = [re.compile(r"%s" % exclude, re.IGNORECASE) for exclude in rule.get("exclude") or []]
         # FREE规则
-        downloadvolumefactor = self.rule_set[rule_name].get("downloadvolumefactor")
-        for include in includes:
-            if not re.search(r"%s" % include, content, re.IGNORECASE):
-                # 未发现包含项
-                return False
-        for exclude in excludes:
-            if re.search(r"%s" % exclude, content, re.IGNORECASE):
-                # 发现排除项
-                return False
-        if downloadvolumefactor is not None:
-            if torrent.downloadvolumefactor != downloadvolumefactor:
-                # FREE规则不匹配
-                return False
-        return True
+        downloadvolumefactor = rule.get("downloadvolumefactor")
+
+        def __match(torrent: TorrentInfo, content: str, media: Optional[MediaInfo]) -> bool:
+            # 符合TMDB规则的直接返回True，即不过滤
+            if tmdb and self.__match_tmdb(tmdb, media):
+                return True
+            if matchs:
+                match_content = self.__get_match_content(torrent, matchs)
+                if match_content:
+                    content = match_content
+            for include in includes:
+                if not include.search(content):
+                    # 未发现包含项
+                    return False
+            for exclude in excludes:
+                if exclude.search(content):
+                    # 发现排除项
+                    return False
+            if downloadvolumefactor is not None:
+                if torrent.downloadvolumefactor != downloadvolumefactor:
+                    # FREE规则不匹配
+                    return False
+            return True
+
+        return __match
+
+    @staticmethod
+    def __get_match_content(torrent: TorrentInfo, matchs: List[str]) -> str:
+        """
+        获取种子指定关键字的匹配内容
+        """
+        match_content = []
+        for match in matchs:
+            if not hasattr(torrent, match):
+                continue
+            match_value = getattr(torrent, match)
+            if not match_value:
+                continue
+            if isinstance(match_value, list):
+                match_content.extend(match_value)
+            else:
+                match_content.append(match_value)
+        return " ".join(match_content)
 
-    def __match_tmdb(self, tmdb: dict) -> bool:
+    @staticmethod
+    def __match_tmdb(tmdb: dict, media: MediaInfo) -> bool:
         """
         判断种子是否匹配TMDB规则
         """
         def __get_media_value(key: str):
             try:
-                return getattr(self.media, key)
+                return getattr(media, key)
             except ValueError:
                 return ""
 
-        if not self.media:
+        if not media:
             return False
 
         for attr, value in tmdb.items():
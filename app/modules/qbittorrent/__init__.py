@@ -111,7 +111,7 @@ class QbittorrentModule(_ModuleBase):
             if not torrent_name:
                 return None, f"添加种子任务失败：无法读取种子文件"
             # 查询所有下载器的种子
-            torrents, error = self.qbittorrent.get_torrents()
+            torrents, error = self.qbittorrent.get_mirror_torrents()
             if error:
                 return None, "无法连接qbittorrent下载器"
             if torrents:
@@ -186,7 +186,7 @@ class QbittorrentModule(_ModuleBase):
         ret_torrents = []
         if hashs:
             # 按Hash获取
-            torrents, _ = self.qbittorrent.get_torrents(ids=hashs, tags=settings.TORRENT_TAG)
+            torrents, _ = self.qbittorrent.get_mirror_torrents(ids=hashs, tags=settings.TORRENT_TAG)
             for torrent in torrents or []:
                 content_path = torrent.get("content_path")
                 if content_path:
@@ -313,8 +313,8 @@ class QbittorrentModule(_ModuleBase):
         """
         下载器信息
         """
-        # 调用Qbittorrent API查询实时信息
-        info = self.qbittorrent.transfer_info()
+        # 从种子镜像同步的服务器状态获取实时信息
+        info = self.qbittorrent.get_mirror_transfer_info()
         if not info:
             return [schemas.DownloaderInfo()]
         return [schemas.DownloaderInfo(
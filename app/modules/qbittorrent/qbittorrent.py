@@ -1,5 +1,6 @@
+import threading
 import time
-from typing import Optional, Union, Tuple, List
+from typing import Optional, Union, Tuple, List, Dict
 
 import qbittorrentapi
 from qbittorrentapi import TorrentDictionary, TorrentFilesList
@@ -19,6 +20,15 @@ class Qbittorrent:
 
     qbc: Client = None
 
+    # 种子镜像两次同步的最小间隔（秒）
+    _sync_interval = 1
+    # 种子镜像支持的状态过滤，与qbittorrent的status_filter含义一致
+    _mirror_status = {
+        "seeding": {"uploading", "stalledUP", "checkingUP", "queuedUP", "forcedUP"},
+        "downloading": {"downloading", "metaDL", "forcedMetaDL", "stalledDL", "checkingDL",
+                        "pausedDL", "stoppedDL", "queuedDL", "forcedDL"}
+    }
+
     def __init__(self, host: str = None, port: int = None, username: str = None, password: str = None):
         """
         若不设置参数，则创建配置文件设置的下载器
@@ -29,6 +39,16 @@ class Qbittorrent:
             self._host, self._port = StringUtils.get_domain_address(address=settings.QB_HOST, prefix=True)
         self._username = username if username else settings.QB_USER
         self._password = password if password else settings.QB_PASSWORD
+        # 种子镜像 {种子Hash: 种子信息}，通过sync/maindata按rid增量同步，避免每次查询都获取全部种子
+        self._mirror: Dict[str, dict] = {}
+        self._mirror_rid = 0
+        self._mirror_lock = threading.Lock()
+        # 服务器状态，包含传输速度等信息
+        self._server_state: dict = {}
+        # 上次同步的时间
+        self._mirror_synced = 0
+        # 下载器中的种子发生了变化，下次查询时立即同步
+        self._mirror_expired = False
         if self._host and self._port:
             self.qbc = self.__login_qbittorrent()
 
@@ -45,6 +65,7 @@ class Qbittorrent:
         重连
         """
         self.qbc = self.__login_qbittorrent()
+        self._mirror_rid = 0
 
     def __login_qbittorrent(self) -> Optional[Client]:
         """
@@ -94,6 +115,80 @@ class Qbittorrent:
             logger.error(f"获取种子列表出错：{str(err)}")
             return [], True
 
+    def __sync_torrents(self) -> bool:
+        """
+        同步种子镜像，首次全量获取，之后只获取上次同步以来变化的字段及删除的种子
+        :return: 是否同步成功
+        """
+        with self._mirror_lock:
+            now = time.time()
+            if not self._mirror_expired and now - self._mirror_synced < self._sync_interval:
+                return True
+            try:
+                maindata = self.qbc.sync_maindata(rid=self._mirror_rid)
+                if maindata.get("full_update"):
+                    self._mirror = {}
+                    self._server_state = {}
+                for torrent_hash, torrent in (maindata.get("torrents") or {}).items():
+                    self._mirror.setdefault(torrent_hash, {"hash": torrent_hash}).update(torrent)
+                for torrent_hash in maindata.get("torrents_removed") or []:
+                    self._mirror.pop(torrent_hash, None)
+                self._server_state.update(maindata.get("server_state") or {})
+                self._mirror_rid = maindata.get("rid") or 0
+                self._mirror_synced = now
+                self._mirror_expired = False
+                return True
+            except Exception as err:
+                logger.error(f"同步种子列表出错：{str(err)}")
+                # 下次重新全量获取
+                self._mirror_rid = 0
+                return False
+
+    def get_mirror_torrents(self, ids: Union[str, list] = None,
+                            status: Union[str, list] = None,
+                            tags: Union[str, list] = None) -> Tuple[List[TorrentDictionary], bool]:
+        """
+        从种子镜像获取种子列表，参数同get_torrents，镜像不支持的状态直接查询下载器
+        return: 种子列表, 是否发生异常
+        """
+        if not self.qbc:
+            return [], True
+        if status and not isinstance(status, list):
+            status = [status]
+        if status and not all(s in self._mirror_status for s in status):
+            return self.get_torrents(ids=ids, status=status, tags=tags)
+        if not self.__sync_torrents():
+            return [], True
+        states = set().union(*(self._mirror_status[s] for s in status)) if status else None
+        if ids and not isinstance(ids, list):
+            ids = str(ids).split("|")
+        if tags and not isinstance(tags, list):
+            tags = [tags]
+        with self._mirror_lock:
+            torrents = [self._mirror[torrent_hash] for torrent_hash in ids
+                        if torrent_hash in self._mirror] if ids else list(self._mirror.values())
+            results = []
+            for torrent in torrents:
+                if states and torrent.get("state") not in states:
+                    continue
+                if tags:
+                    torrent_tags = [str(tag).strip() for tag in (torrent.get("tags") or "").split(',')]
+                    if not set(tags).issubset(set(torrent_tags)):
+                        continue
+                results.append(dict(torrent))
+        return [TorrentDictionary(data=torrent, client=self.qbc) for torrent in results], False
+
+    def get_mirror_transfer_info(self) -> Optional[dict]:
+        """
+        从种子镜像同步的服务器状态获取传输信息，字段同transfer_info
+        """
+        if not self.qbc:
+            return None
+        if not self.__sync_torrents():
+            return None
+        with self._mirror_lock:
+            return dict(self._server_state)
+
     def get_completed_torrents(self, ids: Union[str, list] = None,
                                tags: Union[str, list] = None) -> Optional[List[TorrentDictionary]]:
         """
@@ -103,7 +198,7 @@ class Qbittorrent:
         if not self.qbc:
             return None
         # completed会包含移动状态 改为获取seeding状态 包含活动上传, 正在做种, 及强制做种
-        torrents, error = self.get_torrents(status=["seeding"], ids=ids, tags=tags)
+        torrents, error = self.get_mirror_torrents(status=["seeding"], ids=ids, tags=tags)
         return None if error else torrents or []
 
     def get_downloading_torrents(self, ids: Union[str, list] = None,
@@ -114,9 +209,9 @@ class Qbittorrent:
         """
         if not self.qbc:
             return None
-        torrents, error = self.get_torrents(ids=ids,
-                                            status=["downloading"],
-                                            tags=tags)
+        torrents, error = self.get_mirror_torrents(ids=ids,
+                                                   status=["downloading"],
+                                                   tags=tags)
         return None if error else torrents or []
 
     def delete_torrents_tag(self, ids: Union[str, list], tag: Union[str, list]) -> bool:
@@ -129,6 +224,7 @@ class Qbittorrent:
             return False
         try:
             self.qbc.torrents_delete_tags(torrent_hashes=ids, tags=tag)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"删除种子Tag出错：{str(err)}")
@@ -144,6 +240,7 @@ class Qbittorrent:
             return False
         try:
             self.qbc.torrents_remove_tags(torrent_hashes=ids, tags=tag)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"移除种子Tag出错：{str(err)}")
@@ -158,6 +255,7 @@ class Qbittorrent:
         try:
             # 打标签
             self.qbc.torrents_add_tags(tags=tags, torrent_hashes=ids)
+            self._mirror_expired = True
         except Exception as err:
             logger.error(f"设置种子Tag出错：{str(err)}")
 
@@ -179,7 +277,7 @@ class Qbittorrent:
         :return: 种子ID
         """
         try:
-            torrents, _ = self.get_torrents(status=status, tags=tags)
+            torrents, _ = self.get_mirror_torrents(status=status, tags=tags)
         except Exception as err:
             logger.error(f"获取种子列表出错：{str(err)}")
             return None
@@ -267,6 +365,7 @@ class Qbittorrent:
                                             cookie=cookie,
                                             category=category,
                                             **kwargs)
+            self._mirror_expired = True
             return True if qbc_ret and str(qbc_ret).find("Ok") != -1 else False
         except Exception as err:
             logger.error(f"添加种子出错：{str(err)}")
@@ -280,6 +379,7 @@ class Qbittorrent:
             return False
         try:
             self.qbc.torrents_resume(torrent_hashes=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"启动种子出错：{str(err)}")
@@ -293,6 +393,7 @@ class Qbittorrent:
             return False
         try:
             self.qbc.torrents_pause(torrent_hashes=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"暂停种子出错：{str(err)}")
@@ -308,6 +409,7 @@ class Qbittorrent:
             return False
         try:
             self.qbc.torrents_delete(delete_files=delete_file, torrent_hashes=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"删除种子出错：{str(err)}")
@@ -1,18 +1,15 @@
 import pickle
-import random
+import threading
 import time
 import traceback
-from pathlib import Path
-from threading import RLock
-from typing import Optional
+from typing import Optional, Dict, Set
 
 from app.core.config import settings
 from app.core.meta import MetaBase
 from app.log import logger
 from app.utils.singleton import Singleton
 from app.schemas.types import MediaType
-
-lock = RLock()
+from app.utils.sqlite import SqliteUtils
 
 CACHE_EXPIRE_TIMESTAMP_STR = "cache_expire_timestamp"
 EXPIRE_TIMESTAMP = settings.CACHE_CONF.get('meta')
@@ -20,7 +17,8 @@ EXPIRE_TIMESTAMP = settings.CACHE_CONF.get('meta')
 
 class TmdbCache(metaclass=Singleton):
     """
-    TMDB缓存数据
+    TMDB缓存数据，逐条持久化到数据库，内存中只保留本次运行读取过的条目，
+    读取时不加锁，保存时只写入有变化的条目并批量清理过期条目
     {
         "id": '',
         "title": '',
@@ -28,22 +26,41 @@ class TmdbCache(metaclass=Singleton):
         "type": MediaType
     }
     """
-    _meta_data: dict = {}
-    # 缓存文件路径
-    _meta_path: Path = None
+    # 缓存数据库文件
+    _db_file = "__tmdb_cache__.db"
+    # 旧版缓存文件
+    _legacy_file = "__tmdb_cache__"
     # TMDB缓存过期
     _tmdb_cache_expire: bool = True
+    # 内存中最多保留的已保存条目数
+    _memory_limit = 10000
 
     def __init__(self):
-        self._meta_path = settings.TEMP_PATH / "__tmdb_cache__"
-        self._meta_data = self.__load(self._meta_path)
+        self._lock = threading.Lock()
+        # 内存中的条目，值为None表示数据库中也不存在
+        self._meta_data: Dict[str, Optional[dict]] = {}
+        # 待写入和待删除的KEY
+        self._dirty: Set[str] = set()
+        self._deleted: Set[str] = set()
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache ("
+                           "key TEXT PRIMARY KEY, "
+                           "tmdbid INTEGER, "
+                           "expire INTEGER, "
+                           "data BLOB NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_tmdbid ON cache (tmdbid)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_expire ON cache (expire)")
+        self.__migrate()
 
     def clear(self):
         """
         清空所有TMDB缓存
         """
-        with lock:
+        with self._lock:
             self._meta_data = {}
+            self._dirty.clear()
+            self._deleted.clear()
+            self._conn.execute("DELETE FROM cache")
 
     @staticmethod
     def __get_key(meta: MetaBase) -> str:
@@ -52,21 +69,57 @@ class TmdbCache(metaclass=Singleton):
         """
         return f"[{meta.type.value if meta.type else '未知'}]{meta.name or meta.tmdbid}-{meta.year}-{meta.begin_season}"
 
+    def __get_data(self, key: str) -> Optional[dict]:
+        """
+        读取条目，内存中没有时从数据库加载
+        """
+        if key in self._meta_data:
+            return self._meta_data[key]
+        with self._lock:
+            if key in self._meta_data:
+                return self._meta_data[key]
+            row = self._conn.execute("SELECT data FROM cache WHERE key = ?", (key,)).fetchone()
+            info = None
+            if row:
+                try:
+                    info = pickle.loads(row[0])
+                except Exception as err:
+                    logger.error(f"加载TMDB缓存 {key} 失败：{str(err)}")
+            self._meta_data[key] = info
+            return info
+
+    def __set_data(self, key: str, info: dict):
+        """
+        写入条目并标记待保存，未识别的条目只保存在内存中
+        """
+        self._meta_data[key] = info
+        if info.get("id"):
+            self._dirty.add(key)
+            self._deleted.discard(key)
+        else:
+            self._dirty.discard(key)
+            self._deleted.add(key)
+
     def get(self, meta: MetaBase):
         """
         根据KEY值获取缓存值
         """
         key = self.__get_key(meta)
-        with lock:
-            info: dict = self._meta_data.get(key)
-            if info:
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire or int(time.time()) < expire:
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                    self._meta_data[key] = info
-                elif expire and self._tmdb_cache_expire:
-                    self.delete(key)
-            return info or {}
+        info = self.__get_data(key)
+        if info:
+            now = int(time.time())
+            expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
+            if not expire or now < expire:
+                # 延长有效期，距上次延长超过十分之一有效期时才需要保存
+                new_expire = now + EXPIRE_TIMESTAMP
+                if not expire or new_expire - expire > EXPIRE_TIMESTAMP // 10:
+                    with self._lock:
+                        info[CACHE_EXPIRE_TIMESTAMP_STR] = new_expire
+                        if info.get("id"):
+                            self._dirty.add(key)
+            elif expire and self._tmdb_cache_expire:
+                self.delete(key)
+        return info or {}
 
     def delete(self, key: str) -> dict:
         """
@@ -74,26 +127,33 @@ class TmdbCache(metaclass=Singleton):
         @param key: 缓存key
         @return: 被删除的缓存内容
         """
-        with lock:
-            return self._meta_data.pop(key, None)
+        info = self.__get_data(key)
+        with self._lock:
+            self._meta_data[key] = None
+            self._dirty.discard(key)
+            self._deleted.add(key)
+        return info
 
     def delete_by_tmdbid(self, tmdbid: int) -> None:
         """
         清空对应TMDBID的所有缓存记录，以强制更新TMDB中最新的数据
         """
-        for key in list(self._meta_data):
-            if self._meta_data.get(key, {}).get("id") == tmdbid:
-                with lock:
-                    self._meta_data.pop(key)
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute("SELECT key FROM cache WHERE tmdbid = ?", (tmdbid,))]
+            keys.extend(key for key, info in list(self._meta_data.items()) if info and info.get("id") == tmdbid)
+            for key in keys:
+                self._meta_data[key] = None
+                self._dirty.discard(key)
+                self._deleted.add(key)
 
     def delete_unknown(self) -> None:
         """
         清除未识别的缓存记录，以便重新搜索TMDB
         """
-        for key in list(self._meta_data):
-            if self._meta_data.get(key, {}).get("id") == 0:
-                with lock:
-                    self._meta_data.pop(key)
+        with self._lock:
+            for key, info in list(self._meta_data.items()):
+                if info and info.get("id") == 0:
+                    self._meta_data.pop(key, None)
 
     def modify(self, key: str, title: str) -> dict:
         """
@@ -102,32 +162,19 @@ class TmdbCache(metaclass=Singleton):
         @param title: 标题
         @return: 被修改后缓存内容
         """
-        with lock:
-            if self._meta_data.get(key):
-                self._meta_data[key]['title'] = title
-                self._meta_data[key][CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-            return self._meta_data.get(key)
-
-    @staticmethod
-    def __load(path: Path) -> dict:
-        """
-        从文件中加载缓存
-        """
-        try:
-            if path.exists():
-                with open(path, 'rb') as f:
-                    data = pickle.load(f)
-                return data
-            return {}
-        except Exception as e:
-            logger.error(f'加载缓存失败：{str(e)} - {traceback.format_exc()}')
-            return {}
+        info = self.__get_data(key)
+        with self._lock:
+            if info:
+                info['title'] = title
+                info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
+                self.__set_data(key, info)
+            return info
 
     def update(self, meta: MetaBase, info: dict) -> None:
         """
         新增或更新缓存条目
         """
-        with lock:
+        with self._lock:
             if info:
                 # 缓存标题
                 cache_title = info.get("title") \
@@ -137,75 +184,55 @@ class TmdbCache(metaclass=Singleton):
                     if info.get("media_type") == MediaType.MOVIE else info.get('first_air_date')
                 if cache_year:
                     cache_year = cache_year[:4]
-                self._meta_data[self.__get_key(meta)] = {
-                        "id": info.get("id"),
-                        "type": info.get("media_type"),
-                        "year": cache_year,
-                        "title": cache_title,
-                        "poster_path": info.get("poster_path"),
-                        "backdrop_path": info.get("backdrop_path"),
-                        CACHE_EXPIRE_TIMESTAMP_STR: int(time.time()) + EXPIRE_TIMESTAMP
-                    }
+                self.__set_data(self.__get_key(meta), {
+                    "id": info.get("id"),
+                    "type": info.get("media_type"),
+                    "year": cache_year,
+                    "title": cache_title,
+                    "poster_path": info.get("poster_path"),
+                    "backdrop_path": info.get("backdrop_path"),
+                    CACHE_EXPIRE_TIMESTAMP_STR: int(time.time()) + EXPIRE_TIMESTAMP
+                })
             elif info is not None:
                 # None时不缓存，此时代表网络错误，允许重复请求
-                self._meta_data[self.__get_key(meta)] = {'id': 0}
+                self.__set_data(self.__get_key(meta), {'id': 0})
 
     def save(self, force: bool = False) -> None:
         """
-        保存缓存数据到文件
+        保存有变化的条目到数据库，并清理过期条目
+        :param force: 是否同时整理数据库文件
         """
-
-        meta_data = self.__load(self._meta_path)
-        new_meta_data = {k: v for k, v in self._meta_data.items() if v.get("id")}
-
-        if not force \
-                and not self._random_sample(new_meta_data) \
-                and meta_data.keys() == new_meta_data.keys():
-            return
-
-        with open(self._meta_path, 'wb') as f:
-            pickle.dump(new_meta_data, f, pickle.HIGHEST_PROTOCOL)
-
-    def _random_sample(self, new_meta_data: dict) -> bool:
-        """
-        采样分析是否需要保存
-        """
-        ret = False
-        if len(new_meta_data) < 25:
-            keys = list(new_meta_data.keys())
-            for k in keys:
-                info = new_meta_data.get(k)
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire:
-                    ret = True
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                elif int(time.time()) >= expire:
-                    ret = True
-                    if self._tmdb_cache_expire:
-                        new_meta_data.pop(k)
-        else:
-            count = 0
-            keys = random.sample(sorted(new_meta_data.keys()), 25)
-            for k in keys:
-                info = new_meta_data.get(k)
-                expire = info.get(CACHE_EXPIRE_TIMESTAMP_STR)
-                if not expire:
-                    ret = True
-                    info[CACHE_EXPIRE_TIMESTAMP_STR] = int(time.time()) + EXPIRE_TIMESTAMP
-                elif int(time.time()) >= expire:
-                    ret = True
-                    if self._tmdb_cache_expire:
-                        new_meta_data.pop(k)
-                        count += 1
-            if count >= 5:
-                ret |= self._random_sample(new_meta_data)
-        return ret
+        now = int(time.time())
+        with self._lock:
+            rows = []
+            for key in self._dirty:
+                info = self._meta_data.get(key)
+                if info and info.get("id"):
+                    rows.append((key, info.get("id"), info.get(CACHE_EXPIRE_TIMESTAMP_STR),
+                                 pickle.dumps(info, pickle.HIGHEST_PROTOCOL)))
+            deleted = [(key,) for key in self._deleted]
+            with SqliteUtils.transaction(self._conn):
+                if rows:
+                    self._conn.executemany("INSERT OR REPLACE INTO cache (key, tmdbid, expire, data) "
+                                           "VALUES (?, ?, ?, ?)", rows)
+                if deleted:
+                    self._conn.executemany("DELETE FROM cache WHERE key = ?", deleted)
+                if self._tmdb_cache_expire:
+                    self._conn.execute("DELETE FROM cache WHERE expire IS NOT NULL AND expire <= ?", (now,))
+            self._dirty.clear()
+            self._deleted.clear()
+            # 内存中条目过多时只保留未识别的条目，其余需要时再从数据库加载
+            if len(self._meta_data) > self._memory_limit:
+                self._meta_data = {key: info for key, info in self._meta_data.items()
+                                   if info and not info.get("id")}
+            if force:
+                self._conn.execute("VACUUM")
 
     def get_title(self, key: str) -> Optional[str]:
         """
         获取缓存的标题
         """
-        cache_media_info = self._meta_data.get(key)
+        cache_media_info = self.__get_data(key)
         if not cache_media_info or not cache_media_info.get("id"):
             return None
         return cache_media_info.get("title")
@@ -214,7 +241,32 @@ class TmdbCache(metaclass=Singleton):
         """
         重新设置缓存标题
         """
-        cache_media_info = self._meta_data.get(key)
+        cache_media_info = self.__get_data(key)
         if not cache_media_info:
             return
-        self._meta_data[key]['title'] = cn_title
+        with self._lock:
+            cache_media_info['title'] = cn_title
+            self.__set_data(key, cache_media_info)
+
+    def __migrate(self):
+        """
+        导入旧版整体序列化的缓存文件，导入后删除
+        """
+        cache_path = settings.TEMP_PATH / self._legacy_file
+        if not cache_path.exists():
+            return
+        try:
+            with open(cache_path, 'rb') as f:
+                data: dict = pickle.load(f)
+            rows = [(key, info.get("id"), info.get(CACHE_EXPIRE_TIMESTAMP_STR),
+                     pickle.dumps(info, pickle.HIGHEST_PROTOCOL))
+                    for key, info in (data or {}).items() if info and info.get("id")]
+            with self._lock:
+                with SqliteUtils.transaction(self._conn):
+                    self._conn.executemany("INSERT OR IGNORE INTO cache (key, tmdbid, expire, data) "
+                                           "VALUES (?, ?, ?, ?)", rows)
+            logger.info(f"已导入旧版TMDB缓存 {len(rows)} 条")
+        except Exception as e:
+            logger.error(f'导入旧版TMDB缓存失败：{str(e)} - {traceback.format_exc()}')
+        cache_path.unlink(missing_ok=True)
+
@@ -0,0 +1,124 @@
+import json
+import re
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+from cachetools import LRUCache
+
+from app.core.config import settings
+from app.utils.singleton import Singleton
+from app.utils.sqlite import SqliteUtils
+
+
+class TmdbDetailCache(metaclass=Singleton):
+    """
+    TMDB详情持久化缓存，保存电影、电视剧、季的详情及图片接口的返回数据，
+    重启后仍然有效，过期后携带ETag向TMDB确认数据未变化时继续使用，
+    最近访问的数据同时保存在内存中，命中时不再读库和解压
+    """
+
+    # 数据库文件
+    _db_file = "__tmdb_detail_cache__.db"
+    # 缓存有效期（秒），过期后需重新确认
+    _ttl = 24 * 3600
+    # 访问时间的更新间隔（秒），避免每次读取都写库
+    _touch_interval = 3600
+    # 可缓存的接口
+    _cacheable_pattern = re.compile(r"^/(movie|tv)/\d+(/season/\d+)?(/images)?$")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = SqliteUtils.connect(settings.TEMP_PATH / self._db_file)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS details ("
+                           "key TEXT PRIMARY KEY, "
+                           "data BLOB NOT NULL, "
+                           "etag TEXT, "
+                           "updated INTEGER NOT NULL, "
+                           "accessed INTEGER NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_details_accessed ON details (accessed)")
+        # 当前缓存数量
+        self._count = self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+        # 内存缓存 {KEY: (JSON文本, ETag, 更新时间, 访问时间)}，调用方会修改返回的数据，因此保存文本每次重新解析
+        self._memory = LRUCache(maxsize=settings.CACHE_CONF.get("tmdb") or 256)
+
+    @classmethod
+    def cacheable(cls, action: str) -> bool:
+        """
+        接口返回数据是否可缓存
+        :param action: 接口路径，如/movie/550
+        """
+        return True if cls._cacheable_pattern.match(action) else False
+
+    def get(self, key: str) -> Tuple[Optional[dict], Optional[str], bool]:
+        """
+        读取缓存
+        :param key: 缓存KEY
+        :return: 数据、ETag、是否在有效期内，无缓存时数据为None
+        """
+        now = int(time.time())
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached:
+                text, etag, updated, accessed = cached
+                if now - accessed > self._touch_interval:
+                    self._conn.execute("UPDATE details SET accessed = ? WHERE key = ?", (now, key))
+                    self._memory[key] = (text, etag, updated, now)
+            else:
+                row = self._conn.execute("SELECT data, etag, updated, accessed FROM details WHERE key = ?",
+                                         (key,)).fetchone()
+                if not row:
+                    return None, None, False
+                data, etag, updated, accessed = row
+                if now - accessed > self._touch_interval:
+                    self._conn.execute("UPDATE details SET accessed = ? WHERE key = ?", (now, key))
+                    accessed = now
+                try:
+                    text = zlib.decompress(data).decode("utf-8")
+                except Exception:
+                    return None, None, False
+                self._memory[key] = (text, etag, updated, accessed)
+        try:
+            return json.loads(text), etag, now - updated < self._ttl
+        except Exception:
+            return None, None, False
+
+    def set(self, key: str, data: dict, etag: str = None):
+        """
+        写入缓存，超出数量时删除最久未访问的缓存
+        :param key: 缓存KEY
+        :param data: 数据
+        :param etag: ETag
+        """
+        now = int(time.time())
+        text = json.dumps(data, ensure_ascii=False)
+        blob = zlib.compress(text.encode("utf-8"))
+        limit = settings.CACHE_CONF.get("tmdb_detail") or 0
+        with self._lock:
+            with SqliteUtils.transaction(self._conn):
+                exists = self._conn.execute("SELECT 1 FROM details WHERE key = ?", (key,)).fetchone()
+                self._conn.execute("INSERT OR REPLACE INTO details (key, data, etag, updated, accessed) "
+                                   "VALUES (?, ?, ?, ?, ?)", (key, blob, etag, now, now))
+                if not exists:
+                    self._count += 1
+                self._memory[key] = (text, etag, now, now)
+                # 超出数量时一次多删除一部分，避免频繁清理
+                if limit and self._count > limit:
+                    self._conn.execute("DELETE FROM details WHERE key IN "
+                                       "(SELECT key FROM details ORDER BY accessed LIMIT ?)",
+                                       (self._count - int(limit * 0.9),))
+                    self._memory.clear()
+                    self._count = self._conn.execute("SELECT COUNT(*) FROM details").fetchone()[0]
+
+    def touch(self, key: str):
+        """
+        TMDB确认数据未变化，重新开始计算有效期
+        :param key: 缓存KEY
+        """
+        now = int(time.time())
+        with self._lock:
+            self._conn.execute("UPDATE details SET updated = ?, accessed = ? WHERE key = ?", (now, now, key))
+            cached = self._memory.get(key)
+            if cached:
+                self._memory[key] = (cached[0], cached[1], now, now)
@@ -11,6 +11,7 @@ import requests.exceptions
 
 from app.utils.http import RequestUtils
 from .exceptions import TMDbException
+from ..tmdb_detail_cache import TmdbDetailCache
 
 logger = logging.getLogger(__name__)
 
@@ -145,9 +146,12 @@ class TMDb(object):
         """
         return self.request(method, url, data, json)
 
-    def request(self, method, url, data, json):
+    def request(self, method, url, data, json, headers=None):
         if method == "GET":
-            req = self._req.get_res(url, params=data, json=json)
+            if headers:
+                req = self._req.get_res(url, params=data, json=json, headers=headers)
+            else:
+                req = self._req.get_res(url, params=data, json=json)
         else:
             req = self._req.post_res(url, data=data, json=json)
         if req is None:
@@ -155,29 +159,45 @@ class TMDb(object):
         return req
 
     def cache_clear(self):
+        # 详情持久化缓存按有效期和数量淘汰，不随定时清理缓存清空
         return self.cached_request.cache_clear()
 
-    def _request_obj(self, action, params="", call_cached=True,
-                     method="GET", data=None, json=None, key=None):
-        if self.api_key is None or self.api_key == "":
-            raise TMDbException("TheMovieDb API Key 未设置！")
-
-        url = "https://%s/3%s?api_key=%s&%s&language=%s" % (
-            self.domain,
-            action,
-            self.api_key,
-            params,
-            self.language,
-        )
-
-        if self.cache and self.obj_cached and call_cached and method != "POST":
-            req = self.cached_request(method, url, data, json)
-        else:
-            req = self.request(method, url, data, json)
-
-        if req is None:
-            return None
+    def _request_detail(self, action, params, url):
+        """
+        详情类请求，使用持久化缓存，过期后携带ETag确认数据是否变化
+        """
+        detail_cache = TmdbDetailCache()
+        cache_key = "%s?%s&language=%s" % (action, params, self.language)
+        cache_data, etag, fresh = detail_cache.get(cache_key)
+        if cache_data is not None and fresh:
+            return cache_data
+        try:
+            req = self.request("GET", url, None, None,
+                               headers={"If-None-Match": etag} if cache_data is not None and etag else None)
+            if self._rate_limited(req):
+                return self._request_detail(action, params, url)
+        except TMDbException as err:
+            # 无法确认时继续使用过期的缓存
+            if cache_data is None:
+                raise
+            logger.warning("%s 缓存确认失败，继续使用过期的缓存：%s" % (action, str(err)))
+            return cache_data
+        if cache_data is not None and req.status_code == 304:
+            detail_cache.touch(cache_key)
+            return cache_data
+        if cache_data is not None and req.status_code >= 500:
+            # TMDB服务异常时继续使用过期的缓存
+            return cache_data
+        json = req.json()
+        if req.status_code == 200 and isinstance(json, dict) \
+                and "errors" not in json and json.get("success") is not False:
+            detail_cache.set(cache_key, json, req.headers.get("ETag"))
+        return json
 
+    def _rate_limited(self, req):
+        """
+        记录请求频率限制，达到限制时休眠后返回True以便重试
+        """
         headers = req.headers
 
         if "X-RateLimit-Remaining" in headers:
@@ -193,11 +213,40 @@ class TMDb(object):
             if self.wait_on_rate_limit:
                 logger.warning("达到请求频率限制，休眠：%d 秒..." % sleep_time)
                 time.sleep(abs(sleep_time))
-                return self._request_obj(action, params, call_cached, method, data, json, key)
+                return True
             else:
                 raise TMDbException("达到请求频率限制，将在 %d 秒后重试..." % sleep_time)
+        return False
 
-        json = req.json()
+    def _request_obj(self, action, params="", call_cached=True,
+                     method="GET", data=None, json=None, key=None):
+        if self.api_key is None or self.api_key == "":
+            raise TMDbException("TheMovieDb API Key 未设置！")
+
+        url = "https://%s/3%s?api_key=%s&%s&language=%s" % (
+            self.domain,
+            action,
+            self.api_key,
+            params,
+            self.language,
+        )
+
+        if self.cache and self.obj_cached and call_cached and method == "GET" \
+                and data is None and json is None and TmdbDetailCache.cacheable(action):
+            json = self._request_detail(action, params, url)
+        else:
+            if self.cache and self.obj_cached and call_cached and method != "POST":
+                req = self.cached_request(method, url, data, json)
+            else:
+                req = self.request(method, url, data, json)
+
+            if req is None:
+                return None
+
+            if self._rate_limited(req):
+                return self._request_obj(action, params, call_cached, method, data, json, key)
+
+            json = req.json()
 
         if "page" in json:
             os.environ["page"] = str(json["page"])
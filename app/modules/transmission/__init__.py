@@ -21,14 +21,18 @@ class TransmissionModule(_ModuleBase):
     transmission: Transmission = None
 
     def init_module(self) -> None:
+        if self.transmission:
+            self.transmission.stop_sync()
         self.transmission = Transmission()
+        self.transmission.start_sync()
 
     @staticmethod
     def get_name() -> str:
         return "Transmission"
 
     def stop(self):
-        pass
+        if self.transmission:
+            self.transmission.stop_sync()
 
     def test(self) -> Tuple[bool, str]:
         """
@@ -109,7 +113,7 @@ class TransmissionModule(_ModuleBase):
             if not torrent_name:
                 return None, f"添加种子任务失败：无法读取种子文件"
             # 查询所有下载器的种子
-            torrents, error = self.transmission.get_torrents()
+            torrents, error = self.transmission.get_mirror_torrents()
             if error:
                 return None, "无法连接transmission下载器"
             if torrents:
@@ -179,7 +183,7 @@ class TransmissionModule(_ModuleBase):
         ret_torrents = []
         if hashs:
             # 按Hash获取
-            torrents, _ = self.transmission.get_torrents(ids=hashs, tags=settings.TORRENT_TAG)
+            torrents, _ = self.transmission.get_mirror_torrents(ids=hashs, tags=settings.TORRENT_TAG)
             for torrent in torrents or []:
                 ret_torrents.append(TransferTorrent(
                     title=torrent.name,
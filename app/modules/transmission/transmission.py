@@ -1,3 +1,5 @@
+import threading
+import time
 from typing import Optional, Union, Tuple, List, Dict
 
 import transmission_rpc
@@ -24,6 +26,15 @@ class Transmission:
               "peersGettingFromUs", "peersSendingToUs", "uploadRatio", "uploadedEver", "downloadedEver", "downloadDir",
               "error", "errorString", "doneDate", "queuePosition", "activityDate", "trackers"]
 
+    # 种子镜像两次同步的最小间隔（秒）
+    _sync_interval = 1
+    # transmission只返回最近60秒内有活动的种子，超过该时间（秒）未同步时全量获取
+    _active_window = 50
+    # 定期全量获取的间隔（秒），修正增量同步无法感知的变化
+    _refresh_interval = 600
+    # 后台同步的间隔（秒），小于最近活动的时间范围，使查询时只需增量同步
+    _keepalive_interval = 30
+
     def __init__(self, host: str = None, port: int = None, username: str = None, password: str = None):
         """
         若不设置参数，则创建配置文件设置的下载器
@@ -34,6 +45,17 @@ class Transmission:
             self._host, self._port = StringUtils.get_domain_address(address=settings.TR_HOST, prefix=False)
         self._username = username if username else settings.TR_USER
         self._password = password if password else settings.TR_PASSWORD
+        # 种子镜像 {种子ID: 种子}，从下载器增量同步，避免每次查询都获取全部种子
+        self._mirror: Dict[int, Torrent] = {}
+        self._mirror_lock = threading.Lock()
+        # 上次同步及上次全量获取的时间
+        self._mirror_synced = 0
+        self._mirror_refreshed = 0
+        # 下载器中的种子发生了变化，下次查询时立即同步
+        self._mirror_expired = False
+        # 后台同步线程
+        self._keepalive_event = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
         if self._host and self._port:
             self.trc = self.__login_transmission()
 
@@ -67,6 +89,33 @@ class Transmission:
         重连
         """
         self.trc = self.__login_transmission()
+        self._mirror_refreshed = 0
+
+    def start_sync(self):
+        """
+        启动后台同步，定期获取最近有活动的种子，保持种子镜像可以增量同步
+        """
+        if self._keepalive_thread:
+            return
+        self._keepalive_event.clear()
+        self._keepalive_thread = threading.Thread(target=self.__keepalive, daemon=True)
+        self._keepalive_thread.start()
+
+    def stop_sync(self):
+        """
+        停止后台同步
+        """
+        if not self._keepalive_thread:
+            return
+        self._keepalive_event.set()
+        self._keepalive_thread.join()
+        self._keepalive_thread = None
+
+    def __keepalive(self):
+        while not self._keepalive_event.wait(self._keepalive_interval):
+            # 尚未全量获取或上次同步出错时不在后台同步，由下次查询全量获取，避免下载器不可用时反复报错
+            if self.trc and self._mirror_refreshed:
+                self.__sync_torrents()
 
     def get_torrents(self, ids: Union[str, list] = None, status: Union[str, list] = None,
                      tags: Union[str, list] = None) -> Tuple[List[Torrent], bool]:
@@ -81,6 +130,14 @@ class Transmission:
         except Exception as err:
             logger.error(f"获取种子列表出错：{str(err)}")
             return [], True
+        return self.__filter_torrents(torrents, status=status, tags=tags), False
+
+    @staticmethod
+    def __filter_torrents(torrents: List[Torrent], status: Union[str, list] = None,
+                          tags: Union[str, list] = None) -> List[Torrent]:
+        """
+        按状态及标签过滤种子
+        """
         if status and not isinstance(status, list):
             status = [status]
         if tags and not isinstance(tags, list):
@@ -96,7 +153,56 @@ class Transmission:
             if tags and not set(tags).issubset(set(labels)):
                 continue
             ret_torrents.append(torrent)
-        return ret_torrents, False
+        return ret_torrents
+
+    def __sync_torrents(self) -> bool:
+        """
+        同步种子镜像，首次、长时间未同步及定期全量获取，其余只获取最近有活动及已删除的种子
+        :return: 是否同步成功
+        """
+        with self._mirror_lock:
+            now = time.time()
+            if not self._mirror_expired and now - self._mirror_synced < self._sync_interval:
+                return True
+            try:
+                if now - self._mirror_synced > self._active_window \
+                        or now - self._mirror_refreshed > self._refresh_interval:
+                    torrents = self.trc.get_torrents(arguments=self._trarg)
+                    self._mirror = {torrent.id: torrent for torrent in torrents}
+                    self._mirror_refreshed = now
+                else:
+                    torrents, removed = self.trc.get_recently_active_torrents(arguments=self._trarg)
+                    for tid in removed:
+                        self._mirror.pop(tid, None)
+                    for torrent in torrents:
+                        self._mirror[torrent.id] = torrent
+                self._mirror_synced = now
+                self._mirror_expired = False
+                return True
+            except Exception as err:
+                logger.error(f"同步种子列表出错：{str(err)}")
+                # 下次重新全量获取
+                self._mirror_refreshed = 0
+                return False
+
+    def get_mirror_torrents(self, ids: Union[str, list] = None, status: Union[str, list] = None,
+                            tags: Union[str, list] = None) -> Tuple[List[Torrent], bool]:
+        """
+        从种子镜像获取种子列表，参数同get_torrents
+        返回结果 种子列表, 是否有错误
+        """
+        if not self.trc:
+            return [], True
+        if not self.__sync_torrents():
+            return [], True
+        with self._mirror_lock:
+            torrents = list(self._mirror.values())
+        if ids:
+            if not isinstance(ids, list):
+                ids = [ids]
+            ids = set(ids)
+            torrents = [torrent for torrent in torrents if torrent.hashString in ids or torrent.id in ids]
+        return self.__filter_torrents(torrents, status=status, tags=tags), False
 
     def get_completed_torrents(self, ids: Union[str, list] = None,
                                tags: Union[str, list] = None) -> Optional[List[Torrent]]:
@@ -107,7 +213,7 @@ class Transmission:
         if not self.trc:
             return None
         try:
-            torrents, error = self.get_torrents(status=["seeding", "seed_pending"], ids=ids, tags=tags)
+            torrents, error = self.get_mirror_torrents(status=["seeding", "seed_pending"], ids=ids, tags=tags)
             return None if error else torrents or []
         except Exception as err:
             logger.error(f"获取已完成的种子列表出错：{str(err)}")
@@ -122,9 +228,9 @@ class Transmission:
         if not self.trc:
             return None
         try:
-            torrents, error = self.get_torrents(ids=ids,
-                                                status=["downloading", "download_pending", "stopped"],
-                                                tags=tags)
+            torrents, error = self.get_mirror_torrents(ids=ids,
+                                                       status=["downloading", "download_pending", "stopped"],
+                                                       tags=tags)
             return None if error else torrents or []
         except Exception as err:
             logger.error(f"获取正在下载的种子列表出错：{str(err)}")
@@ -140,6 +246,8 @@ class Transmission:
             return False
         try:
             self.trc.change_torrent(labels=list(set((org_tags or []) + tags)), ids=ids)
+            # 修改标签不一定计入种子活动，下次查询时全量获取
+            self._mirror_refreshed = 0
             return True
         except Exception as err:
             logger.error(f"设置种子标签出错：{str(err)}")
@@ -179,11 +287,13 @@ class Transmission:
         if not self.trc:
             return None
         try:
-            return self.trc.add_torrent(torrent=content,
-                                        download_dir=download_dir,
-                                        paused=is_paused,
-                                        labels=labels,
-                                        cookies=cookie)
+            torrent = self.trc.add_torrent(torrent=content,
+                                           download_dir=download_dir,
+                                           paused=is_paused,
+                                           labels=labels,
+                                           cookies=cookie)
+            self._mirror_expired = True
+            return torrent
         except Exception as err:
             logger.error(f"添加种子出错：{str(err)}")
             return None
@@ -196,6 +306,7 @@ class Transmission:
             return False
         try:
             self.trc.start_torrent(ids=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"启动种子出错：{str(err)}")
@@ -209,6 +320,7 @@ class Transmission:
             return False
         try:
             self.trc.stop_torrent(ids=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"停止种子出错：{str(err)}")
@@ -224,6 +336,7 @@ class Transmission:
             return False
         try:
             self.trc.remove_torrent(delete_data=delete_file, ids=ids)
+            self._mirror_expired = True
             return True
         except Exception as err:
             logger.error(f"删除种子出错：{str(err)}")
@@ -20,6 +20,7 @@ from app.chain.transfer import TransferChain
 from app.core.config import settings
 from app.core.event import EventManager
 from app.core.plugin import PluginManager
+from app.helper.library import LibraryHelper
 from app.helper.sites import SitesHelper
 from app.log import logger
 from app.schemas import Notification, NotificationType
@@ -166,6 +167,11 @@ class Scheduler(metaclass=Singleton):
                 "name": "壁纸缓存",
                 "func": TmdbChain().get_trending_wallpapers,
                 "running": False,
+            },
+            "library_index": {
+                "name": "媒体库索引比对",
+                "func": LibraryHelper().reconcile,
+                "running": False,
             }
         }
 
@@ -331,6 +337,18 @@ class Scheduler(metaclass=Singleton):
             }
         )
 
+        # 媒体库索引比对，每隔6小时
+        self._scheduler.add_job(
+            self.start,
+            "interval",
+            id="library_index",
+            name="媒体库索引比对",
+            hours=6,
+            kwargs={
+                'job_id': 'library_index'
+            }
+        )
+
         # 定时检查用户认证，每隔10分钟
         self._scheduler.add_job(
             self.start,
@@ -0,0 +1,129 @@
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Generator, List, Optional, Set
+
+
+class Subscription:
+    """
+    广播订阅，在订阅时的事件循环中等待新数据
+    """
+
+    def __init__(self, maxlen: int = None):
+        """
+        :param maxlen: 未取走的数据最多保留的数量，超出时丢弃最早的，为1时只保留最新的数据
+        """
+        self._loop = asyncio.get_running_loop()
+        self._items: Deque[Any] = deque(maxlen=maxlen)
+        self._event = asyncio.Event()
+
+    def put(self, data: Any):
+        """
+        放入数据，可在任意线程中调用
+        """
+        self._loop.call_soon_threadsafe(self.__put, data)
+
+    def __put(self, data: Any):
+        self._items.append(data)
+        self._event.set()
+
+    async def get(self, timeout: float = None) -> List[Any]:
+        """
+        等待新数据
+        :param timeout: 超时时间（秒）
+        :return: 上次取走后收到的全部数据，超时返回空列表
+        """
+        if not self._items:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._event.clear()
+        items = list(self._items)
+        self._items.clear()
+        return items
+
+
+class BroadcastHub:
+    """
+    广播中心，同步代码发布数据，异步订阅者各自收到全部数据，无需轮询
+    没有订阅者时发布的数据可暂存，由之后的第一个订阅者接收
+    """
+
+    def __init__(self, backlog: int = 0):
+        """
+        :param backlog: 没有订阅者时每个频道暂存的数据数量，为0时不暂存
+        """
+        self._lock = threading.Lock()
+        # 订阅者 {频道: 订阅}
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        # 暂存的数据 {频道: 数据}
+        self._backlog_size = backlog
+        self._backlog: Dict[str, Deque[Any]] = {}
+
+    def publish(self, channel: str, data: Any) -> int:
+        """
+        发布数据
+        :param channel: 频道
+        :param data: 数据
+        :return: 接收的订阅者数量
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            if not subscribers:
+                if self._backlog_size:
+                    self._backlog.setdefault(channel, deque(maxlen=self._backlog_size)).append(data)
+                return 0
+        count = 0
+        for subscriber in subscribers:
+            try:
+                subscriber.put(data)
+                count += 1
+            except RuntimeError:
+                # 事件循环已关闭
+                self.__remove(channel, subscriber)
+        return count
+
+    @contextmanager
+    def subscribe(self, channel: str, maxlen: int = 100) -> Generator[Subscription, None, None]:
+        """
+        订阅频道，需在事件循环中调用，退出时取消订阅
+        :param channel: 频道
+        :param maxlen: 未取走的数据最多保留的数量
+        """
+        subscription = Subscription(maxlen=maxlen)
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            backlog = self._backlog.pop(channel, None)
+        for data in backlog or ():
+            subscription.put(data)
+        try:
+            yield subscription
+        finally:
+            self.__remove(channel, subscription)
+
+    def pop(self, channel: str) -> Optional[Any]:
+        """
+        取出一条暂存的数据
+        """
+        with self._lock:
+            backlog = self._backlog.get(channel)
+            if backlog:
+                return backlog.popleft()
+        return None
+
+    def count(self, channel: str) -> int:
+        """
+        频道的订阅者数量
+        """
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def __remove(self, channel: str, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    self._subscribers.pop(channel, None)
@@ -1,16 +1,147 @@
-from typing import Union, Any, Optional
-from urllib.parse import urljoin
+import threading
+import time
+from collections import OrderedDict
+from typing import Union, Any, Optional, Tuple
+from urllib.parse import urljoin, urlparse
 
 import requests
 import urllib3
 from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
 from urllib3.exceptions import InsecureRequestWarning
 
 from app.log import logger
+from app.utils.singleton import Singleton
 
 urllib3.disable_warnings(InsecureRequestWarning)
 
 
+class SessionPool(metaclass=Singleton):
+    """
+    进程内共享的HTTP连接池，按协议、主机和代理区分，保持长连接复用，空闲超时后关闭。
+    共享的只是连接，每次请求仍使用新的Session，Cookie等会话状态不会在请求间传递
+    """
+
+    # 每个主机保持的最大连接数
+    _pool_maxsize = 10
+    # 最多保留连接池的主机数
+    _max_hosts = 256
+    # 连接池空闲多久后关闭（秒）
+    _idle_seconds = 300
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {(协议, 主机, 代理): (适配器, 最后使用时间)}，按使用顺序排列
+        self._adapters: OrderedDict[Tuple[str, str, Optional[str]], Tuple[HTTPAdapter, float]] = OrderedDict()
+        # 命中已有连接池的次数
+        self._hits = 0
+        # 新建连接池的次数
+        self._misses = 0
+        # 因空闲或超出数量关闭的连接池数
+        self._evictions = 0
+        # 已关闭的连接池累计的请求数和新建连接数
+        self._closed_requests = 0
+        self._closed_connections = 0
+
+    def session(self, url: str, proxies: dict = None) -> Session:
+        """
+        获取挂载了该主机共享连接池的Session
+        :param url: 请求的URL
+        :param proxies: 代理
+        :return: Session，使用后无需关闭
+        """
+        session = Session()
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.netloc:
+            return session
+        key = (parsed.scheme, parsed.netloc.lower(), select_proxy(url, proxies) if proxies else None)
+        now = time.time()
+        with self._lock:
+            entry = self._adapters.pop(key, None)
+            if entry:
+                self._hits += 1
+                adapter = entry[0]
+            else:
+                self._misses += 1
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_maxsize)
+            self.__evict(now)
+            self._adapters[key] = (adapter, now)
+        # 替换默认的适配器，跳转到其它主机时同样复用该连接池
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def stats(self) -> dict:
+        """
+        连接池统计
+        :return: hosts：当前保留的主机数，hits/misses：命中/新建连接池的次数，evictions：关闭的连接池数，
+                 requests：请求数，connections：新建连接数，reused：复用连接的请求数
+        """
+        with self._lock:
+            requests_count, connections_count = self._closed_requests, self._closed_connections
+            for adapter, _ in self._adapters.values():
+                adapter_requests, adapter_connections = self.__count(adapter)
+                requests_count += adapter_requests
+                connections_count += adapter_connections
+            return {
+                "hosts": len(self._adapters),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "requests": requests_count,
+                "connections": connections_count,
+                "reused": max(requests_count - connections_count, 0)
+            }
+
+    def clear(self):
+        """
+        关闭所有连接池
+        """
+        with self._lock:
+            while self._adapters:
+                _, (adapter, _) = self._adapters.popitem(last=False)
+                self.__close(adapter)
+
+    def __evict(self, now: float):
+        """
+        关闭空闲超时以及超出数量的连接池，需在持有锁时调用
+        """
+        while self._adapters:
+            key, (adapter, last_used) = next(iter(self._adapters.items()))
+            if len(self._adapters) < self._max_hosts and now - last_used < self._idle_seconds:
+                break
+            del self._adapters[key]
+            self._evictions += 1
+            self.__close(adapter)
+
+    def __close(self, adapter: HTTPAdapter):
+        """
+        关闭连接池并保留其统计数据，需在持有锁时调用
+        """
+        adapter_requests, adapter_connections = self.__count(adapter)
+        self._closed_requests += adapter_requests
+        self._closed_connections += adapter_connections
+        adapter.close()
+
+    @staticmethod
+    def __count(adapter: HTTPAdapter) -> Tuple[int, int]:
+        """
+        统计适配器中各连接池的请求数和新建连接数
+        """
+        requests_count = connections_count = 0
+        managers = [adapter.poolmanager] + list(adapter.proxy_manager.values())
+        for manager in managers:
+            if not manager:
+                continue
+            for pool_key in list(manager.pools.keys()):
+                pool = manager.pools.get(pool_key)
+                if pool:
+                    requests_count += pool.num_requests
+                    connections_count += pool.num_connections
+        return requests_count, connections_count
+
+
 class RequestUtils:
     _headers: dict = None
     _cookies: Union[str, dict] = None
@@ -61,10 +192,6 @@ class RequestUtils:
         :return: HTTP响应对象
         :raises: requests.exceptions.RequestException 仅raise_exception为True时会抛出
         """
-        if self._session is None:
-            req_method = requests.request
-        else:
-            req_method = self._session.request
         kwargs.setdefault("headers", self._headers)
         kwargs.setdefault("cookies", self._cookies)
         kwargs.setdefault("proxies", self._proxies)
@@ -72,7 +199,12 @@ class RequestUtils:
         kwargs.setdefault("verify", False)
         kwargs.setdefault("stream", False)
         try:
-            return req_method(method, url, **kwargs)
+            if self._session is None:
+                # 未指定Session时使用共享连接池，复用到同一主机的连接
+                session = SessionPool().session(url=url, proxies=kwargs.get("proxies"))
+            else:
+                session = self._session
+            return session.request(method, url, **kwargs)
         except requests.exceptions.RequestException as e:
             logger.debug(f"请求失败: {e}")
             if raise_exception:
@@ -206,6 +338,13 @@ class RequestUtils:
                             raise_exception=raise_exception,
                             **kwargs)
 
+    @staticmethod
+    def pool_stats() -> dict:
+        """
+        共享连接池的命中及连接复用统计
+        """
+        return SessionPool().stats()
+
     @staticmethod
     def cookie_parse(cookies_str: str, array: bool = False) -> Union[list, dict]:
         """
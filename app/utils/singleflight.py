@@ -0,0 +1,76 @@
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    合并并发的相同调用，同一KEY同时只执行一次，其余调用等待并共享其结果。
+    有等待者时结果会保存一份快照，等待者各自获得快照的深拷贝，互不影响
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 执行中的调用 {KEY: future}
+        self._calls: Dict[Hashable, Future] = {}
+        # 执行中调用的等待者数量
+        self._waiters: Dict[Hashable, int] = {}
+        # 调用总数
+        self._total = 0
+        # 被合并的调用数
+        self._coalesced = 0
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+        """
+        执行调用，相同KEY的调用正在执行时等待其结果
+        :param key: 调用KEY
+        :param func: 函数
+        :param args: 参数
+        :param kwargs: 参数
+        :return: 结果、是否为共享其它调用的结果
+        """
+        leader = False
+        with self._lock:
+            self._total += 1
+            future = self._calls.get(key)
+            if future:
+                self._coalesced += 1
+                self._waiters[key] += 1
+            else:
+                future = Future()
+                self._calls[key] = future
+                self._waiters[key] = 0
+                leader = True
+        if not leader:
+            return copy.deepcopy(future.result()), True
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as err:
+            self.__finish(key)
+            future.set_exception(err)
+            raise
+        waiters = self.__finish(key)
+        future.set_result(copy.deepcopy(result) if waiters else None)
+        return result, False
+
+    def __finish(self, key: Hashable) -> int:
+        """
+        结束调用，之后相同KEY的调用将重新执行
+        :return: 等待者数量
+        """
+        with self._lock:
+            self._calls.pop(key, None)
+            return self._waiters.pop(key, 0)
+
+    def stats(self) -> dict:
+        """
+        调用统计
+        :return: total：调用总数，coalesced：被合并的调用数，inflight：执行中的调用数
+        """
+        with self._lock:
+            return {
+                "total": self._total,
+                "coalesced": self._coalesced,
+                "inflight": len(self._calls)
+            }
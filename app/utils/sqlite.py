@@ -0,0 +1,35 @@
+import sqlite3
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator
+
+
+class SqliteUtils:
+    """
+    本地SQLite缓存库，多个线程共用一个连接，由调用方加锁串行访问
+    """
+
+    @staticmethod
+    def connect(path: Path) -> sqlite3.Connection:
+        """
+        打开数据库，使用WAL模式，未显式开启事务时每条语句自动提交
+        :param path: 数据库文件路径
+        """
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    @contextmanager
+    def transaction(conn: sqlite3.Connection) -> Generator[sqlite3.Connection, None, None]:
+        """
+        显式事务，批量写入只提交一次，出错时回滚
+        """
+        conn.execute("BEGIN")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
@@ -384,6 +384,28 @@ class SystemUtils:
             return 0.0
         return psutil.disk_usage(str(path)).total
 
+    @staticmethod
+    def is_network_fs(path: Path) -> bool:
+        """
+        路径或其下挂载的目录是否为网络或FUSE文件系统，这些文件系统上的变化无法通过inotify监控
+        """
+        network_types = ("nfs", "nfs4", "cifs", "smb", "smb2", "smb3", "smbfs", "9p", "afs", "ceph",
+                         "glusterfs", "davfs", "sshfs", "fuse")
+        try:
+            partitions = psutil.disk_partitions(all=True)
+        except Exception:
+            return False
+        path = Path(path).resolve()
+        mounts = [(Path(part.mountpoint), part.fstype) for part in partitions]
+        # 路径所在的挂载点
+        mount = max(((mountpoint, fstype) for mountpoint, fstype in mounts if path.is_relative_to(mountpoint)),
+                    key=lambda item: len(item[0].parts), default=None)
+        # 路径下的挂载点
+        fstypes = [fstype for mountpoint, fstype in mounts if mountpoint != path and mountpoint.is_relative_to(path)]
+        if mount:
+            fstypes.append(mount[1])
+        return any(fstype in network_types or fstype.startswith("fuse.") for fstype in fstypes)
+
     @staticmethod
     def processes() -> List[schemas.ProcessInfo]:
         """
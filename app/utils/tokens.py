@@ -1,5 +1,7 @@
 import re
 
+_split_pattern = re.compile(r"\.|\s+|\(|\)|\[|]|-|\+|【|】|/|～|;|&|\||#|_|「|」|~")
+
 
 class Tokens:
     _text: str = ""
@@ -12,7 +14,7 @@ class Tokens:
         self.load_text(text)
 
     def load_text(self, text):
-        splitted_text = re.split(r"\.|\s+|\(|\)|\[|]|-|\+|【|】|/|～|;|&|\||#|_|「|」|~", text)
+        splitted_text = _split_pattern.split(text)
         for sub_text in splitted_text:
             if sub_text:
                 self._tokens.append(sub_text)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+日志性能测试，分别统计被丢弃的DEBUG日志和实际输出的INFO日志每秒可调用的次数
+运行：python -m tests.benchmark_log [次数]
+"""
+import os
+import sys
+import time
+
+from app.log import logger
+
+
+def benchmark(method: str, count: int = 20000) -> float:
+    """
+    重复调用日志方法
+    :param method: 日志方法
+    :param count: 调用次数
+    :return: 每秒调用次数
+    """
+    log_method = getattr(logger, method)
+    # 预热，同时完成日志初始化
+    log_method("benchmark")
+    start = time.perf_counter()
+    for i in range(count):
+        log_method("benchmark %s", i)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    _count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    # 屏蔽终端日志输出
+    _stderr = sys.stderr
+    sys.stderr = open(os.devnull, "w")
+    try:
+        _results = {_method: benchmark(_method, _count) for _method in ("debug", "info")}
+    finally:
+        sys.stderr = _stderr
+    for _method, _rate in _results.items():
+        print(f"{_method}: {_rate:.0f} calls/s")
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+名称识别性能测试，绕过识别结果缓存，统计每秒识别的标题数
+运行：python -m tests.benchmark_meta [轮数]
+"""
+import sys
+import time
+
+from app.core.metainfo import _parse_metainfo
+from tests.cases.meta import meta_cases
+
+
+def benchmark(rounds: int = 50) -> float:
+    """
+    重复识别测试用例中的全部标题
+    :param rounds: 轮数
+    :return: 每秒识别的标题数
+    """
+    titles = [(info.get("title"), info.get("subtitle")) for info in meta_cases if not info.get("path")]
+    # 预热
+    for title, subtitle in titles:
+        _parse_metainfo(title, subtitle)
+    count = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for title, subtitle in titles:
+            _parse_metainfo(title, subtitle)
+        count += len(titles)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    _rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print(f"{benchmark(_rounds):.0f} titles/s")
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+制作组识别性能测试，在内置组基础上增加指定数量的自定义组，统计每秒识别的标题数
+运行：python -m tests.benchmark_releasegroup [自定义组数量] [轮数]
+"""
+import sys
+import time
+
+import regex as re
+
+from app.core.meta.releasegroup import ReleaseGroupsMatcher, _GroupsPattern, _GROUP_PATTERN
+from tests.cases.meta import meta_cases
+
+
+def release_groups(count: int) -> list:
+    """
+    内置组加上模拟的自定义组
+    :param count: 自定义组数量
+    """
+    groups = [group for site_groups in ReleaseGroupsMatcher.RELEASE_GROUPS.values() for group in site_groups]
+    return groups + [f"Team{i:04d}(?:WEB|HD)?" if i % 3 else f"Group{i:04d}" for i in range(count)]
+
+
+def titles() -> list:
+    """
+    测试用例中的标题，另外模拟一部分带自定义组的标题
+    """
+    names = [info.get("title") or info.get("path") for info in meta_cases]
+    return names + [f"Movie.{i}.2023.1080p.WEB-DL.H264.AAC-Team{i:04d}WEB" for i in range(1, 100, 7)]
+
+
+def benchmark(groups: list, rounds: int, cached: bool) -> float:
+    """
+    重复识别全部标题的制作组
+    :param groups: 制作组
+    :param rounds: 轮数
+    :param cached: 是否使用编译缓存，否则每次都编译完整正则
+    :return: 每秒识别的标题数
+    """
+    names = [f"{name} " for name in titles()]
+    pattern = _GroupsPattern(groups)
+    count = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for name in names:
+            if cached:
+                pattern.findall(name)
+            else:
+                re.compile(_GROUP_PATTERN % "|".join(groups), re.I).findall(name)
+        count += len(names)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    _count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    _rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    _groups = release_groups(_count)
+    print(f"groups: {len(_groups)}")
+    print(f"compile every title: {benchmark(_groups, _rounds, False):.0f} titles/s")
+    print(f"cached with prefilter: {benchmark(_groups, _rounds, True):.0f} titles/s")
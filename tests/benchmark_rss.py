@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+RSS解析性能测试，使用模拟的大型RSS报文（带HTML描述），
+对比原DOM解析方式、流式解析以及读取到已处理种子时提前结束的每秒解析次数，
+并检查两种方式对RSS 2.0及使用默认命名空间的RSS 1.0（RDF）报文解析结果一致
+运行：python -m tests.benchmark_rss [种子数量] [轮数]
+"""
+import sys
+import time
+import xml.dom.minidom
+
+import chardet
+
+from app.helper.rss import RssHelper
+from app.utils.dom import DomUtils
+
+
+def rss_content(count: int) -> bytes:
+    """
+    生成RSS报文
+    :param count: 种子数量
+    """
+    items = []
+    for i in range(count):
+        items.append(f"""<item>
+<title>电影.Movie.{i}.2023.1080p.BluRay.x264.DTS-HD.MA.5.1-GROUP</title>
+<link>https://pt.example.com/details.php?id={i}</link>
+<description><![CDATA[<p><img src="https://img.example.com/{i}.jpg"/></p>
+<p>◎译　　名　电影{i}<br/>◎片　　名　Movie {i}<br/>◎年　　代　2023<br/>◎产　　地　美国</p>
+<p>{"简介内容，" * 40}</p>]]></description>
+<author>anonymous</author>
+<category domain="https://pt.example.com/torrents.php?cat=401">Movies</category>
+<enclosure url="https://pt.example.com/download.php?id={i}&amp;passkey=0123456789abcdef" length="{i * 1048576}" type="application/x-bittorrent"/>
+<guid isPermaLink="false">{i}</guid>
+<pubDate>Mon, 02 Oct 2023 12:00:00 +0800</pubDate>
+</item>""")
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<rss version="2.0"><channel><title>站点</title>'
+            + "".join(items) + "</channel></rss>").encode("utf-8")
+
+
+def rdf_content(count: int) -> bytes:
+    """
+    生成使用默认命名空间的RSS 1.0（RDF）报文
+    :param count: 种子数量
+    """
+    items = []
+    for i in range(count):
+        items.append(f"""<item rdf:about="https://pt.example.com/details.php?id={i}">
+<title>电影.Movie.{i}.2023.1080p.WEB-DL.H264.AAC-GROUP</title>
+<link>https://pt.example.com/download.php?id={i}</link>
+<description>电影{i}</description>
+<dc:date>2023-10-02T12:00:00+08:00</dc:date>
+</item>""")
+    return ('<?xml version="1.0" encoding="utf-8"?>\n'
+            '<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#" '
+            'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns="http://purl.org/rss/1.0/">'
+            '<channel rdf:about="https://pt.example.com"><title>站点</title></channel>'
+            + "".join(items) + "</rdf:RDF>").encode("utf-8")
+
+
+def check(content: bytes):
+    """
+    检查流式解析与DOM解析的结果一致
+    """
+    fields = ("title", "description", "link", "enclosure")
+    expected = [tuple(item[field] for field in fields) for item in dom_parse(content)]
+    actual = [tuple(item[field] for field in fields) for item in RssHelper.parse_xml(content)]
+    assert expected and actual == expected, "流式解析结果与DOM解析不一致"
+
+
+def dom_parse(content: bytes) -> list:
+    """
+    原解析方式：全文检测编码后构建完整DOM
+    """
+    ret_xml = content.decode(chardet.detect(content)["encoding"])
+    items = []
+    for item in xml.dom.minidom.parseString(ret_xml).documentElement.getElementsByTagName("item"):
+        items.append({
+            "title": DomUtils.tag_value(item, "title", default=""),
+            "description": DomUtils.tag_value(item, "description", default=""),
+            "link": DomUtils.tag_value(item, "link", default=""),
+            "enclosure": DomUtils.tag_value(item, "enclosure", "url", default="")
+            or DomUtils.tag_value(item, "link", default=""),
+            "size": DomUtils.tag_value(item, "enclosure", "length", default=0),
+            "pubdate": DomUtils.tag_value(item, "pubDate", default="")
+        })
+    return items
+
+
+def benchmark(func, content: bytes, rounds: int) -> float:
+    """
+    重复解析RSS报文
+    :return: 每秒解析次数
+    """
+    func(content)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func(content)
+    return rounds / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    _count = int(sys.argv[1]) if len(sys.argv) > 1 else 600
+    _rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    _content = rss_content(_count)
+    # 模拟只有最新的50个种子未处理过
+    _known = {f"电影.Movie.{i}.2023.1080p.BluRay.x264.DTS-HD.MA.5.1-GROUP" for i in range(50, _count)}
+    check(_content)
+    check(rdf_content(10))
+    print(f"items: {_count}, size: {len(_content) / 1024:.0f} KB")
+    print(f"dom: {benchmark(dom_parse, _content, _rounds):.2f} feeds/s")
+    print(f"stream: {benchmark(RssHelper.parse_xml, _content, _rounds):.2f} feeds/s")
+    print(f"stream with early stop: "
+          f"{benchmark(lambda c: RssHelper.parse_xml(c, known=lambda x: x['title'] in _known), _content, _rounds):.2f}"
+          f" feeds/s")
@@ -1,5 +1,7 @@
 import unittest
 
+from tests.test_downloader import DownloaderTest
+from tests.test_library import LibraryTest
 from tests.test_metainfo import MetaInfoTest
 
 if __name__ == '__main__':
@@ -7,6 +9,17 @@ if __name__ == '__main__':
 
     # 测试名称识别
     suite.addTest(MetaInfoTest('test_metainfo'))
+    suite.addTest(MetaInfoTest('test_metainfo_cache'))
+    suite.addTest(MetaInfoTest('test_words_matcher'))
+
+    # 测试下载器种子镜像
+    suite.addTest(DownloaderTest('test_qbittorrent_mirror'))
+    suite.addTest(DownloaderTest('test_transmission_mirror'))
+    suite.addTest(DownloaderTest('test_transmission_keepalive'))
+
+    # 测试媒体库索引
+    suite.addTest(LibraryTest('test_library_index'))
+    suite.addTest(LibraryTest('test_library_fingerprint'))
 
     # 运行测试
     runner = unittest.TextTestRunner()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import time
+from unittest import TestCase
+
+from transmission_rpc import Torrent
+
+from app.modules.qbittorrent.qbittorrent import Qbittorrent
+from app.modules.transmission.transmission import Transmission
+
+
+class FakeQbittorrentClient:
+    """
+    模拟qBittorrent，按顺序返回增量同步数据
+    """
+
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.rids = []
+
+    def sync_maindata(self, rid: int = 0):
+        self.rids.append(rid)
+        return self.responses.pop(0)
+
+
+class FakeTransmissionClient:
+    """
+    模拟Transmission，记录全量及最近活动查询
+    """
+
+    def __init__(self, torrents: list, active: list, removed: list):
+        self.torrents = torrents
+        self.active = active
+        self.removed = removed
+        self.calls = []
+
+    def get_torrents(self, ids=None, arguments=None):
+        self.calls.append("full")
+        return [Torrent(fields=fields) for fields in self.torrents]
+
+    def get_recently_active_torrents(self, arguments=None):
+        self.calls.append("active")
+        return [Torrent(fields=fields) for fields in self.active], self.removed
+
+
+class DownloaderTest(TestCase):
+    def setUp(self) -> None:
+        pass
+
+    def tearDown(self) -> None:
+        pass
+
+    def test_qbittorrent_mirror(self):
+        qbittorrent = Qbittorrent(host=None, port=None)
+        qbittorrent.qbc = FakeQbittorrentClient([
+            {"rid": 1, "full_update": True,
+             "torrents": {"a": {"name": "A", "state": "uploading", "tags": "MOVIEPILOT, x"},
+                          "b": {"name": "B", "state": "downloading", "tags": ""},
+                          "c": {"name": "C", "state": "pausedDL", "tags": "MOVIEPILOT"}},
+             "server_state": {"dl_info_speed": 5, "up_info_speed": 7}},
+            {"rid": 2, "torrents": {"b": {"state": "stalledUP"}}, "torrents_removed": ["c"],
+             "server_state": {"dl_info_speed": 9}}
+        ])
+        # 首次全量同步，按状态及标签过滤
+        torrents, error = qbittorrent.get_mirror_torrents(status=["seeding"], tags="MOVIEPILOT")
+        self.assertFalse(error)
+        self.assertEqual([torrent.hash for torrent in torrents], ["a"])
+        self.assertEqual(torrents[0].name, "A")
+        self.assertEqual([torrent.hash for torrent in qbittorrent.get_mirror_torrents(status=["downloading"])[0]],
+                         ["b", "c"])
+        self.assertEqual(qbittorrent.get_mirror_transfer_info().get("up_info_speed"), 7)
+        # 增量合并变化的字段及删除的种子
+        qbittorrent._mirror_expired = True
+        self.assertEqual(sorted(torrent.hash for torrent in qbittorrent.get_mirror_torrents(status=["seeding"])[0]),
+                         ["a", "b"])
+        self.assertEqual([torrent.hash for torrent in qbittorrent.get_mirror_torrents(ids="a|c")[0]], ["a"])
+        self.assertEqual(qbittorrent.get_mirror_torrents(ids="b")[0][0].name, "B")
+        self.assertEqual(qbittorrent.get_mirror_transfer_info(), {"dl_info_speed": 9, "up_info_speed": 7})
+        self.assertEqual(qbittorrent.qbc.rids, [0, 1])
+
+    def test_transmission_mirror(self):
+        transmission = Transmission(host=None, port=None)
+        transmission.trc = FakeTransmissionClient(
+            torrents=[{"id": 1, "hashString": "h1", "status": 6, "labels": ["MOVIEPILOT"], "name": "one"},
+                      {"id": 2, "hashString": "h2", "status": 4, "labels": [], "name": "two"}],
+            active=[{"id": 2, "hashString": "h2", "status": 6, "labels": ["MOVIEPILOT"], "name": "two"}],
+            removed=[1])
+        # 首次全量获取，按状态及标签过滤
+        self.assertEqual([torrent.name for torrent in transmission.get_completed_torrents(tags="MOVIEPILOT")],
+                         ["one"])
+        self.assertEqual([torrent.name for torrent in transmission.get_downloading_torrents()], ["two"])
+        # 最近活动的时间范围内只获取有活动及已删除的种子
+        transmission._mirror_expired = True
+        self.assertEqual([torrent.name for torrent in transmission.get_completed_torrents(tags="MOVIEPILOT")],
+                         ["two"])
+        self.assertEqual([torrent.name for torrent in transmission.get_mirror_torrents(ids="h2")[0]], ["two"])
+        self.assertEqual(transmission.get_mirror_torrents(ids="h1")[0], [])
+        self.assertEqual(transmission.trc.calls, ["full", "active"])
+        # 超出最近活动的时间范围时重新全量获取
+        transmission._mirror_synced = time.time() - transmission._active_window - 1
+        self.assertEqual(len(transmission.get_mirror_torrents()[0]), 2)
+        self.assertEqual(transmission.trc.calls, ["full", "active", "full"])
+
+    def test_transmission_keepalive(self):
+        transmission = Transmission(host=None, port=None)
+        transmission.trc = FakeTransmissionClient(torrents=[{"id": 1, "hashString": "h1", "status": 6,
+                                                            "labels": [], "name": "one"}],
+                                                  active=[], removed=[])
+        transmission._keepalive_interval = 0.05
+        transmission._sync_interval = 0
+        transmission.start_sync()
+        try:
+            # 未全量获取前不在后台同步
+            time.sleep(0.2)
+            self.assertEqual(transmission.trc.calls, [])
+            transmission.get_mirror_torrents()
+            time.sleep(0.2)
+            self.assertIn("active", transmission.trc.calls)
+            self.assertEqual(transmission.trc.calls.count("full"), 1)
+        finally:
+            transmission.stop_sync()
+        self.assertIsNone(transmission._keepalive_thread)
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+
+from app.db.systemconfig_oper import SystemConfigOper
+from app.helper.library import LibraryHelper
+from app.schemas.types import SystemConfigKey
+
+
+class LibraryTest(TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        self.root = self.tmp / "library"
+        self.show = self.root / "Show (2020)"
+        (self.show / "Season 1").mkdir(parents=True)
+        for episode in (1, 2, 3):
+            (self.show / "Season 1" / f"Show - S01E0{episode}.mkv").write_bytes(b"")
+        (self.show / "Season 1" / "poster.jpg").write_bytes(b"")
+        self.systemconfig = SystemConfigOper()
+        self.library_dirs = self.systemconfig.get(SystemConfigKey.LibraryDirectories)
+        self.identifiers = self.systemconfig.get(SystemConfigKey.CustomIdentifiers)
+        self.systemconfig.set(SystemConfigKey.LibraryDirectories, [{"type": "library", "path": str(self.root)}])
+        self.helper = LibraryHelper()
+        self.helper.start()
+        self.assertTrue(self.__wait(lambda: str(self.root) in self.helper._ready and not self.helper._recognizing))
+
+    def tearDown(self) -> None:
+        self.helper.stop()
+        self.helper.remove(str(self.root))
+        self.systemconfig.set(SystemConfigKey.LibraryDirectories, self.library_dirs)
+        self.systemconfig.set(SystemConfigKey.CustomIdentifiers, self.identifiers)
+        shutil.rmtree(self.tmp)
+
+    @staticmethod
+    def __wait(condition, timeout: float = 5) -> bool:
+        """
+        等待目录监控事件处理完成
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return condition()
+
+    def __episodes(self, directory: Path = None):
+        return sorted((file.season, file.episode) for file in self.helper.list_files(directory or self.show))
+
+    def test_library_index(self):
+        self.assertEqual(self.__episodes(), [(1, 1), (1, 2), (1, 3)])
+        # 新建文件
+        (self.show / "Season 1" / "Show - S01E04.mkv").write_bytes(b"")
+        self.assertTrue(self.__wait(lambda: (1, 4) in self.__episodes()))
+        # 移入目录
+        season2 = self.tmp / "Season 2"
+        season2.mkdir()
+        (season2 / "Show - S02E01.mkv").write_bytes(b"")
+        shutil.move(str(season2), str(self.show / "Season 2"))
+        self.assertTrue(self.__wait(lambda: (2, 1) in self.__episodes()))
+        # 移出目录
+        shutil.move(str(self.show / "Season 2"), str(self.tmp / "Season 2"))
+        self.assertTrue(self.__wait(lambda: (2, 1) not in self.__episodes()))
+        # 删除文件
+        (self.show / "Season 1" / "Show - S01E01.mkv").unlink()
+        self.assertTrue(self.__wait(lambda: self.__episodes() == [(1, 2), (1, 3), (1, 4)]))
+        # 单个文件
+        self.assertEqual(self.__episodes(self.show / "Season 1" / "Show - S01E02.mkv"), [(1, 2)])
+        # 定期比对修正遗漏的变化
+        self.helper.remove(str(self.show / "Season 1" / "Show - S01E03.mkv"))
+        self.assertEqual(self.__episodes(), [(1, 2), (1, 4)])
+        self.helper.reconcile()
+        self.assertEqual(self.__episodes(), [(1, 2), (1, 3), (1, 4)])
+
+    def test_library_fingerprint(self):
+        # 识别词变化后重新识别，期间直接检索文件
+        self.systemconfig.set(SystemConfigKey.CustomIdentifiers, ["S01E02 => S01E12"])
+        self.assertEqual(self.__episodes(), [(1, 1), (1, 3), (1, 12)])
+        self.assertTrue(self.__wait(lambda: not self.helper._recognizing))
+        self.assertEqual(self.__episodes(), [(1, 1), (1, 3), (1, 12)])
+        self.systemconfig.set(SystemConfigKey.CustomIdentifiers, [])
+        self.assertEqual(self.__episodes(), [(1, 1), (1, 2), (1, 3)])
+        self.assertTrue(self.__wait(lambda: not self.helper._recognizing))
+        self.assertEqual(self.__episodes(), [(1, 1), (1, 2), (1, 3)])
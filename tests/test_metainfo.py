@@ -2,7 +2,10 @@
 from pathlib import Path
 from unittest import TestCase
 
+from app.core.meta.words import WordsMatcher
 from app.core.metainfo import MetaInfo, MetaInfoPath
+from app.db.systemconfig_oper import SystemConfigOper
+from app.schemas.types import SystemConfigKey
 from tests.cases.meta import meta_cases
 
 
@@ -33,3 +36,48 @@ class MetaInfoTest(TestCase):
                 "audio_codec": meta_info.audio_encode or ""
             }
             self.assertEqual(target, info.get("target"))
+
+    def test_metainfo_cache(self):
+        title = "The.Long.Season.2017.2160p.WEB-DL.H265.AAC-XXX"
+        # 返回的是副本，修改不影响缓存
+        meta_info = MetaInfo(title=title)
+        meta_info.cn_name = "测试"
+        self.assertNotEqual(MetaInfo(title=title).cn_name, "测试")
+        # 识别词变更后缓存失效
+        systemconfig = SystemConfigOper()
+        identifiers = systemconfig.get(SystemConfigKey.CustomIdentifiers)
+        try:
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, ["The.Long.Season => 漫长的季节"])
+            self.assertEqual(MetaInfo(title=title).cn_name, "漫长的季节")
+        finally:
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, identifiers)
+        self.assertEqual(MetaInfo(title=title).en_name, "The Long Season")
+
+    def test_words_matcher(self):
+        systemconfig = SystemConfigOper()
+        identifiers = systemconfig.get(SystemConfigKey.CustomIdentifiers)
+        try:
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, [
+                "HHWEB",
+                "The.Long.Season => 漫长的季节",
+                "第 <> 集 >> EP+1",
+                "Kimetsu => 鬼灭之刃 && 鬼灭之刃.E <> .1080p >> EP-10",
+                "(bad => x"
+            ])
+            self.assertEqual(WordsMatcher().prepare("The.Long.Season.S01 第五集 HHWEB"),
+                             ("漫长的季节.S01 第六集 ", ["HHWEB", "The.Long.Season => 漫长的季节", "第 <> 集 >> EP+1"]))
+            self.assertEqual(WordsMatcher().prepare("Kimetsu.E15.1080p"),
+                             ("鬼灭之刃.E5.1080p", ["Kimetsu => 鬼灭之刃 && 鬼灭之刃.E <> .1080p >> EP-10"]))
+            # 转义字符不作为字面量
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, [
+                r"\x41BC => X",
+                r"\101Y => Y",
+                r"\u7b2c集 => EP",
+                r"(Z)\1W => Z"
+            ])
+            self.assertEqual(WordsMatcher().prepare("ABC.AY.第集.ZZW")[0], "X.Y.EP.Z")
+            # 识别词变更后重新编译
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, ["HHWEB => MP"])
+            self.assertEqual(WordsMatcher().prepare("Kimetsu.E15.HHWEB"), ("Kimetsu.E15.MP", ["HHWEB => MP"]))
+        finally:
+            systemconfig.set(SystemConfigKey.CustomIdentifiers, identifiers)